@@ -1,9 +1,234 @@
 import os
-import re
+import queue
+import sys
+import threading
+import time
 import tkinter as tk
+from array import array
 from tkinter import filedialog, ttk, messagebox
-from datetime import datetime
-from typing import List, Tuple, Optional, Union
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from renamer import engine, export, ingest, journal, verify
+from renamer.cache import FolderScan, ScanCache, load_metadata, scan_folder
+from renamer.template import TemplateError, TemplateStore, compile_template
+from renamer.stats import RunStats
+from renamer.walker import scan_base, scan_tree
+from renamer.watch import FolderWatcher
+
+# Minimum seconds between progress updates sent from the rename worker (10 Hz)
+PROGRESS_INTERVAL = 0.1
+
+# Seconds between checks of a watched folder
+WATCH_INTERVAL = 1.0
+
+# Preview filters: every row, rows whose target was suffixed or clashed, rows with an unparsed name
+FILTER_ALL, FILTER_CONFLICTS, FILTER_UNPARSED = "All rows", "Conflicts", "Unparsed"
+
+class VirtualTable:
+    """A Treeview that only holds widgets for the rows currently on screen.
+
+    The data stays in the caller's model and is read through a row getter, so
+    filling, clearing and sorting cost nothing per row in Tk. The table owns
+    its scrollbar and maps scroll positions to offsets into the row order.
+    A view limits the table to some of the model's rows, for filters.
+    """
+
+    def __init__(self, parent: ttk.Frame, columns: Sequence[Tuple[str, str, int]]):
+        """Create the table inside parent.
+
+        Args:
+            parent: The frame to pack the table into
+            columns: (column id, heading text, width) for each column
+        """
+        self._column_ids = [column_id for column_id, _, _ in columns]
+        self._row_count = 0
+        self._get_row: Callable[[int], Tuple] = lambda i: ()
+        self._view: Optional[Sequence[int]] = None
+        # The model rows on screen, in display order: the view, sorted if a column is
+        self._order: Sequence[int] = range(0)
+        self._top = 0
+        self._visible = 10
+        self._selected: Optional[int] = None
+        self._sort_column: Optional[int] = None
+        self._sort_reverse = False
+
+        self.tree = ttk.Treeview(parent, columns=self._column_ids, show="headings",
+                                 height=10, selectmode="browse")
+        for i, (column_id, text, width) in enumerate(columns):
+            self.tree.heading(column_id, text=text, command=lambda i=i: self.sort_by(i))
+            self.tree.column(column_id, width=width, anchor=tk.W)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<Configure>", lambda event: self._resize())
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self._on_wheel_step(-3))
+        self.tree.bind("<Button-5>", lambda event: self._on_wheel_step(3))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Up>", lambda event: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self._move_selection(-self._visible))
+        self.tree.bind("<Next>", lambda event: self._move_selection(self._visible))
+
+    def __len__(self) -> int:
+        return self._row_count
+
+    def set_rows(self, row_count: int, get_row: Callable[[int], Tuple],
+                 view: Optional[Sequence[int]] = None) -> None:
+        """Show a new set of rows.
+
+        Args:
+            row_count: The number of rows in the model
+            get_row: Returns the column values for a model row index
+            view: The model rows to show, in model order; all of them when None
+        """
+        self._row_count = row_count
+        self._get_row = get_row
+        self._view = view
+        self._top = 0
+        self._selected = None
+        self._apply_sort()
+        self._refresh()
+        self.tree.after_idle(self._resize)
+
+    def set_view(self, view: Optional[Sequence[int]]) -> None:
+        """Show only some of the model's rows, or all of them for None, from the top."""
+        self._view = view
+        self._top = 0
+        self._selected = None
+        self._apply_sort()
+        self._refresh()
+
+    @property
+    def shown(self) -> int:
+        """The number of rows the view shows."""
+        return len(self._order)
+
+    def clear(self) -> None:
+        """Remove all rows in one operation."""
+        self.set_rows(0, lambda i: ())
+
+    def sort_by(self, column: int) -> None:
+        """Sort by a column, toggling the direction on repeated clicks."""
+        if self._sort_column == column:
+            self._sort_reverse = not self._sort_reverse
+        else:
+            self._sort_column = column
+            self._sort_reverse = False
+        self._apply_sort()
+        self._top = 0
+        self._refresh()
+
+    def _apply_sort(self) -> None:
+        rows = range(self._row_count) if self._view is None else self._view
+        column = self._sort_column
+        if column is None:
+            self._order = rows
+            return
+        get_row = self._get_row
+        # Kept as an array: a list of a million row numbers costs four times as much
+        self._order = array("Q", sorted(rows, key=lambda i: get_row(i)[column],
+                                        reverse=self._sort_reverse))
+
+    def set_row_count(self, row_count: int, view: Optional[Sequence[int]] = None) -> None:
+        """Grow the model without moving the view, for rows that stream in.
+
+        Args:
+            row_count: The number of rows in the model
+            view: The model rows to show, in model order; all of them when None
+        """
+        self._row_count = row_count
+        self._view = view
+        self._apply_sort()
+        self._refresh()
+
+    def scroll(self, rows: int) -> None:
+        """Scroll the window by a number of rows."""
+        self._scroll_to(self._top + rows)
+
+    def _scroll_to(self, top: int) -> None:
+        top = max(0, min(top, len(self._order) - self._visible))
+        if top != self._top:
+            self._top = top
+            self._refresh()
+
+    def _on_scrollbar(self, *args: str) -> None:
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * len(self._order)))
+        elif args[0] == "scroll":
+            step = self._visible if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def _on_mousewheel(self, event: tk.Event) -> str:
+        # Windows reports multiples of 120, macOS reports small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._on_wheel_step(-delta * 3)
+
+    def _on_wheel_step(self, rows: int) -> str:
+        # Stop the Treeview's own binding from scrolling the on-screen items
+        self.scroll(rows)
+        return "break"
+
+    def _on_select(self, event: tk.Event) -> None:
+        selection = self.tree.selection()
+        if selection:
+            self._selected = self._top + self.tree.index(selection[0])
+
+    def _move_selection(self, rows: int) -> str:
+        if not self._order:
+            return "break"
+        current = self._top if self._selected is None else self._selected
+        self._selected = max(0, min(current + rows, len(self._order) - 1))
+        if self._selected < self._top:
+            self._scroll_to(self._selected)
+        elif self._selected >= self._top + self._visible:
+            self._scroll_to(self._selected - self._visible + 1)
+        self._refresh()
+        return "break"
+
+    def _resize(self) -> None:
+        # Measure the row height from the first row once one is on screen
+        items = self.tree.get_children()
+        bbox = self.tree.bbox(items[0]) if items else ""
+        if not bbox:
+            return
+        _, first_y, _, row_height = bbox
+        visible = max(1, (self.tree.winfo_height() - first_y) // max(1, row_height))
+        if visible != self._visible:
+            self._visible = visible
+            self._scroll_to(self._top)
+            self._refresh()
+
+    def _refresh(self) -> None:
+        """Fill the on-screen rows from the model."""
+        shown = len(self._order)
+        end = min(self._top + self._visible, shown)
+        wanted = end - self._top
+        items = list(self.tree.get_children())
+
+        # Keep exactly one Treeview item per visible row
+        if len(items) > wanted:
+            self.tree.delete(*items[wanted:])
+            items = items[:wanted]
+        while len(items) < wanted:
+            items.append(self.tree.insert("", tk.END))
+
+        for item, position in zip(items, range(self._top, end)):
+            self.tree.item(item, values=self._get_row(self._order[position]))
+
+        selected = self._selected
+        if selected is not None and self._top <= selected < end:
+            self.tree.selection_set(items[selected - self._top])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if shown:
+            self.scrollbar.set(self._top / shown, end / shown)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
 
 class FootageRenamer:
     """A tool for batch renaming footage files according to Netflix recommended naming conventions."""
@@ -12,8 +237,8 @@ class FootageRenamer:
         """Initialize the FootageRenamer application with the main window."""
         self.root = root
         self.root.title("Footage Renamer")
-        self.root.geometry("650x500")
-        self.root.minsize(600, 450)
+        self.root.geometry("650x560")
+        self.root.minsize(600, 510)
         self.root.resizable(True, True)
         
         # Center the window on the screen
@@ -23,17 +248,52 @@ class FootageRenamer:
         self._setup_styles()
 
         # Variables
+        defaults = engine.NamingOptions()
         self.folder_path = tk.StringVar()
-        self.camera_roll_var = tk.StringVar(value="J001")
-        self.clip_prefix_var = tk.StringVar(value="Clip")
-        self.date_var = tk.StringVar(value=datetime.now().strftime("%y%m%d"))
+        self.camera_roll_var = tk.StringVar(value=defaults.camera_roll)
+        self.clip_prefix_var = tk.StringVar(value=defaults.clip_prefix)
+        self.date_var = tk.StringVar(value=defaults.date)
+        self.use_metadata_var = tk.BooleanVar(value=defaults.use_metadata)
+        self.sync_audio_var = tk.BooleanVar(value=defaults.sync_audio)
+        self.verify_var = tk.BooleanVar(value=False)
+        self.recursive_var = tk.BooleanVar(value=False)
+        self.watch_var = tk.BooleanVar(value=False)
+        self.auto_rename_var = tk.BooleanVar(value=False)
+        self.project_var = tk.StringVar()
+        self.template_var = tk.StringVar(value=defaults.template)
+        self.templates = TemplateStore()
+        self.filter_var = tk.StringVar(value=FILTER_ALL)
+        self.search_var = tk.StringVar()
         
         # Data storage
         self.files: List[str] = []
-        self.preview_data: List[Tuple[str, str]] = []
+        self.scan: Optional[FolderScan] = None
+        self.plan: Optional[engine.RenamePlan] = None
+        # Conflict, unparsed and name lookups into the plan shown, for the preview filters
+        self._plan_index: Optional[export.PlanIndex] = None
+        self._scan_cancel: Optional[threading.Event] = None
+        # Timings and counts of the current folder's scan, plan and rename
+        self.run_stats: Optional[RunStats] = None
+
+        # Watch mode: the plan grows as files settle; renamed up to _watch_applied
+        self._watcher: Optional[FolderWatcher] = None
+        self._watch_builder: Optional[engine.PlanBuilder] = None
+        self._watch_positions: Dict[str, int] = {}
+        self._watch_applied = 0
+        self._watch_results: "queue.Queue[engine.RenameResult]" = queue.Queue()
+        self._watch_busy = False
+
+        # Header metadata survives between sessions; without the cache every scan reads headers
+        try:
+            self.cache: Optional[ScanCache] = ScanCache()
+        except Exception:
+            self.cache = None
 
         # Create UI
         self._create_widgets()
+
+        # Offer to recover batches cut short by a crash once the window is up
+        self.root.after_idle(self._check_interrupted_batches)
     
     def _center_window(self) -> None:
         """Center the application window on the screen."""
@@ -76,15 +336,23 @@ class FootageRenamer:
 
         ttk.Entry(folder_frame, textvariable=self.folder_path, width=50).pack(
             side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        recursive_check = ttk.Checkbutton(folder_frame, text="Include subfolders",
+                                          variable=self.recursive_var, command=self.load_files)
+        recursive_check.pack(side=tk.RIGHT, padx=5)
+        add_btn = ttk.Button(folder_frame, text="Add Card", command=self.add_folder)
+        add_btn.pack(side=tk.RIGHT, padx=5)
         browse_btn = ttk.Button(folder_frame, text="Browse", command=self.browse_folder)
         browse_btn.pack(side=tk.RIGHT, padx=5)
         
         # Add tooltip
         self._create_tooltip(browse_btn, "Select the folder containing footage files to rename")
+        self._create_tooltip(add_btn, "Add another card or folder; several folders are scanned with their subfolders")
+        self._create_tooltip(recursive_check,
+                             "Rename files in subfolders too, following ARRI, RED, Sony and Sound Devices card layouts")
     
     def _create_naming_options(self, parent: ttk.Frame) -> None:
         """Create the naming options UI elements."""
-        options_frame = ttk.LabelFrame(parent, text="Netflix Default Naming Options", padding="10")
+        options_frame = ttk.LabelFrame(parent, text="Naming Options", padding="10")
         options_frame.pack(fill=tk.X, pady=10)
 
         # Grid layout for naming options
@@ -99,6 +367,37 @@ class FootageRenamer:
         ttk.Label(options_frame, text="Date (YYMMDD):").grid(row=0, column=4, sticky=tk.W, pady=2)
         ttk.Entry(options_frame, textvariable=self.date_var, width=10).grid(
             row=0, column=5, padx=5, pady=2)
+
+        metadata_check = ttk.Checkbutton(
+            options_frame, text="Use shoot date and camera roll from file headers",
+            variable=self.use_metadata_var)
+        metadata_check.grid(row=1, column=0, columnspan=4, sticky=tk.W, pady=2)
+        self._create_tooltip(metadata_check,
+                             "Read each clip's creation date and reel from its QuickTime or BWF header; "
+                             "the fields above are used where a header has none")
+        sync_check = ttk.Checkbutton(options_frame, text="Match sound to picture",
+                                     variable=self.sync_audio_var)
+        sync_check.grid(row=1, column=4, columnspan=2, sticky=tk.W, pady=2)
+        self._create_tooltip(sync_check,
+                             "Give each sound take the clip name of the camera clip whose timecode "
+                             "it overlaps on the same shoot date")
+
+        ttk.Label(options_frame, text="Template:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        template_entry = ttk.Entry(options_frame, textvariable=self.template_var)
+        template_entry.grid(row=2, column=1, columnspan=5, padx=5, pady=2, sticky=tk.EW)
+        self._create_tooltip(template_entry,
+                             "Tokens: [cameraRoll] [clipName] [clipPrefix] [originalClipName] "
+                             "[shootDate-YYMMDD] [counter-3] [scene] [take] [ext] [ext-lower] [ext-upper]")
+
+        ttk.Label(options_frame, text="Project:").grid(row=3, column=0, sticky=tk.W, pady=2)
+        self.project_combo = ttk.Combobox(options_frame, textvariable=self.project_var,
+                                          values=self.templates.projects(), width=20)
+        self.project_combo.grid(row=3, column=1, columnspan=3, padx=5, pady=2, sticky=tk.EW)
+        self.project_combo.bind("<<ComboboxSelected>>", self._load_project_template)
+        save_btn = ttk.Button(options_frame, text="Save Template", command=self.save_project_template)
+        save_btn.grid(row=3, column=4, columnspan=2, padx=5, pady=2, sticky=tk.E)
+        self._create_tooltip(save_btn, "Remember this template for the project")
+        options_frame.columnconfigure(5, weight=1)
     
     def _create_action_buttons(self, parent: ttk.Frame) -> None:
         """Create the action buttons UI elements."""
@@ -107,34 +406,69 @@ class FootageRenamer:
 
         preview_btn = ttk.Button(action_frame, text="Preview", command=self.preview_renaming)
         preview_btn.pack(side=tk.LEFT, padx=5)
+
+        watch_check = ttk.Checkbutton(action_frame, text="Watch", variable=self.watch_var,
+                                      command=self.toggle_watch)
+        watch_check.pack(side=tk.LEFT, padx=5)
+        auto_check = ttk.Checkbutton(action_frame, text="Auto-rename", variable=self.auto_rename_var)
+        auto_check.pack(side=tk.LEFT, padx=5)
         
         rename_btn = ttk.Button(action_frame, text="Rename Files", command=self.rename_files)
         rename_btn.pack(side=tk.RIGHT, padx=5)
+
+        copy_btn = ttk.Button(action_frame, text="Copy To...", command=self.copy_files)
+        copy_btn.pack(side=tk.RIGHT, padx=5)
+
+        undo_btn = ttk.Button(action_frame, text="Undo Last Batch", command=self.undo_last_batch)
+        undo_btn.pack(side=tk.RIGHT, padx=5)
+
+        verify_check = ttk.Checkbutton(action_frame, text="Verify checksums", variable=self.verify_var)
+        verify_check.pack(side=tk.RIGHT, padx=5)
         
         # Add tooltips
         self._create_tooltip(preview_btn, "Preview how files will be renamed")
+        self._create_tooltip(watch_check, "Keep adding files to the preview as an offload finishes writing them")
+        self._create_tooltip(auto_check, "While watching, rename each file as soon as it has finished writing")
         self._create_tooltip(rename_btn, "Apply the renaming to all files")
+        self._create_tooltip(copy_btn, "Copy the files to another volume under their new names, "
+                                       "leaving the originals untouched")
+        self._create_tooltip(undo_btn, "Restore the original names of the last renamed batch")
+        self._create_tooltip(verify_check, "Hash files before renaming, check them against the offload's "
+                                           "MHL and write an ASC-MHL manifest of the batch")
     
     def _create_preview_table(self, parent: ttk.Frame) -> None:
         """Create the preview table UI elements."""
         preview_frame = ttk.LabelFrame(parent, text="Preview", padding="10")
         preview_frame.pack(fill=tk.BOTH, expand=True, pady=10)
 
-        columns = ("original", "new")
-        self.preview_tree = ttk.Treeview(preview_frame, columns=columns, show="headings", height=10)
-        
-        # Configure columns
-        self.preview_tree.heading("original", text="Original Name")
-        self.preview_tree.heading("new", text="New Name")
-        self.preview_tree.column("original", width=250, anchor=tk.W)
-        self.preview_tree.column("new", width=250, anchor=tk.W)
-        
-        # Pack with scrollbar
-        self.preview_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        scrollbar = ttk.Scrollbar(preview_frame, orient=tk.VERTICAL, command=self.preview_tree.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.preview_tree.configure(yscrollcommand=scrollbar.set)
+        # Filters look rows up in the plan's indexes instead of scanning the table
+        filter_frame = ttk.Frame(preview_frame)
+        filter_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
+        ttk.Label(filter_frame, text="Show:").pack(side=tk.LEFT)
+        filter_combo = ttk.Combobox(filter_frame, textvariable=self.filter_var, state="readonly", width=10,
+                                    values=(FILTER_ALL, FILTER_CONFLICTS, FILTER_UNPARSED))
+        filter_combo.pack(side=tk.LEFT, padx=5)
+        filter_combo.bind("<<ComboboxSelected>>", lambda event: self._apply_filter())
+        ttk.Label(filter_frame, text="Find:").pack(side=tk.LEFT, padx=(10, 0))
+        search_entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=20)
+        search_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        self.search_var.trace_add("write", lambda *args: self._apply_filter())
+        export_btn = ttk.Button(filter_frame, text="Export...", command=self.export_plan)
+        export_btn.pack(side=tk.RIGHT, padx=5)
+        self.filter_label = ttk.Label(filter_frame, text="")
+        self.filter_label.pack(side=tk.RIGHT, padx=5)
+        self._create_tooltip(filter_combo, "Show only rows whose new name was suffixed or clashed with "
+                                           "another file, or whose clip number was not read from the name")
+        self._create_tooltip(search_entry, "Show only rows whose original or new name starts with this text")
+        self._create_tooltip(export_btn, "Write the plan, with each file's flags, to a CSV or JSON file")
+
+        # Only on-screen rows exist as Treeview items, so large folders stay responsive
+        self.preview_table = VirtualTable(preview_frame, (
+            ("original", "Original Name", 250),
+            ("new", "New Name", 250),
+            ("status", "Status", 80),
+        ))
+        self.preview_tree = self.preview_table.tree
     
     def _create_tooltip(self, widget: ttk.Widget, text: str) -> None:
         """Create a tooltip for a widget."""
@@ -169,57 +503,274 @@ class FootageRenamer:
             self.folder_path.set(folder_selected)
             self.load_files()
     
+    def add_folder(self) -> None:
+        """Add another folder to scan alongside the ones already selected."""
+        folder_selected = filedialog.askdirectory()
+        if folder_selected:
+            roots = self._roots()
+            if folder_selected not in roots:
+                roots.append(folder_selected)
+            self.folder_path.set("; ".join(roots))
+            if len(roots) > 1:
+                self.recursive_var.set(True)
+            self.load_files()
+
+    def _roots(self) -> List[str]:
+        """Return the folders in the folder field, where several are separated by semicolons."""
+        return [root.strip() for root in self.folder_path.get().split(";") if root.strip()]
+    
     def load_files(self) -> None:
         """Load files from the selected folder."""
-        folder = self.folder_path.get()
-        if not folder:
+        roots = self._roots()
+        if not roots:
+            return
+        if self._watcher is not None:
+            self.watch_var.set(False)
+            self._stop_watch()
+
+        # A new scan replaces one still running
+        if self._scan_cancel is not None:
+            self._scan_cancel.set()
+            self._scan_cancel = None
+        if self.recursive_var.get() or len(roots) > 1:
+            self._scan_tree(roots)
             return
 
         try:
-            # Get all files in the directory (excluding subdirectories)
-            self.files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
+            stats = RunStats(roots[0])
+            headers = self.use_metadata_var.get() or self.sync_audio_var.get()
+            with stats.phase("scan") as phase:
+                # The same stat count as the command line's report
+                self.scan = scan_folder(roots[0], headers, self.cache,
+                                        phase.call("stat") if headers and self.cache is not None else None)
+                phase.files = len(self.scan.files)
+                phase.call("scandir").count()
+                if headers:
+                    phase.add("headers_read", self.scan.changed)
+            self.run_stats = stats
+            self.files = self.scan.files
             messagebox.showinfo("Success", f"Loaded {len(self.files)} files")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load files: {str(e)}")
+            self.scan = None
             self.files = []
     
-    def extract_numbers(self, filename: str) -> str:
-        """Extract all numbers from a filename and return them as a string.
-        
-        Args:
-            filename: The filename to extract numbers from
-        
-        Returns:
-            A string containing all extracted numbers joined by underscores
-        """
-        # Extract all numbers from filename using regex
-        numbers = re.findall(r'\d+', filename)
-        return '_'.join(numbers) if numbers else ""
+    def _scan_tree(self, roots: List[str]) -> None:
+        """Walk the roots on a worker thread, streaming the files found into the preview."""
+        self.scan = None
+        self.files = []
+        self.plan = None
+        self._plan_index = None
+        self.filter_label.configure(text="")
+        found: List[str] = []
+        updates: "queue.Queue[object]" = queue.Queue()
+        cancel_event = threading.Event()
+        self._scan_cancel = cancel_event
+
+        def worker() -> None:
+            try:
+                stats = RunStats(scan_base(roots)[0])
+                with stats.phase("scan") as phase:
+                    scandir = phase.call("scandir")
+
+                    def on_listing(listing) -> None:
+                        scandir.count()
+                        updates.put(listing.files)
+
+                    scan = scan_tree(roots, on_listing, cancel_event)
+                    phase.files = len(scan.files)
+            except (OSError, ValueError) as e:
+                updates.put(e)
+                return
+            self.run_stats = stats
+            updates.put(scan)
+
+        def poll() -> None:
+            if cancel_event.is_set():
+                return
+            result = None
+            try:
+                while True:
+                    message = updates.get_nowait()
+                    if isinstance(message, list):
+                        found.extend(message)
+                    else:
+                        result = message
+            except queue.Empty:
+                pass
+
+            if result is None:
+                self.preview_table.set_row_count(len(found))
+                self.root.after(int(PROGRESS_INTERVAL * 1000), poll)
+                return
+
+            self._scan_cancel = None
+            if isinstance(result, Exception):
+                self.preview_table.clear()
+                messagebox.showerror("Error", f"Failed to load files: {str(result)}")
+                return
+            self.scan = result
+            self.files = files = result.files
+            self.preview_table.set_rows(len(files), lambda i: (files[i], "", ""))
+            messagebox.showinfo("Success", f"Loaded {len(self.files)} files")
+
+        self.preview_table.set_rows(0, lambda i: (found[i], "", "scanning"))
+        threading.Thread(target=worker, name="scan-worker", daemon=True).start()
+        self.root.after(int(PROGRESS_INTERVAL * 1000), poll)
+    
+    def toggle_watch(self) -> None:
+        """Start or stop watching the selected folder for files that finished writing."""
+        self._stop_watch()
+        if not self.watch_var.get():
+            return
+        roots = self._roots()
+        if len(roots) != 1:
+            messagebox.showwarning("Warning", "Select a single folder to watch.")
+            self.watch_var.set(False)
+            return
+        options = self._naming_options()
+        try:
+            compile_template(options.template)
+        except TemplateError as e:
+            messagebox.showerror("Invalid Template", str(e))
+            self.watch_var.set(False)
+            return
+        try:
+            watcher = FolderWatcher(roots[0])
+            names = os.listdir(watcher.folder)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to watch folder: {str(e)}")
+            self.watch_var.set(False)
+            return
+
+        # Files already present arrive through the first poll like new ones
+        self._watcher = watcher
+        self.run_stats = RunStats(watcher.folder, "watch")
+        self._watch_builder = engine.PlanBuilder(
+            watcher.folder, options, names,
+            [name for name in names if os.path.isfile(os.path.join(watcher.folder, name))],
+            self.run_stats)
+        self._watch_positions = {}
+        self._watch_applied = 0
+        self.scan = None
+        self.files = []
+        self.plan = self._watch_builder.plan
+        self._show_plan()
+        self.root.after(int(WATCH_INTERVAL * 1000), self._poll_watch)
+
+    def _stop_watch(self) -> None:
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+            self._watch_builder = None
+            # One report for the whole watch, once something was renamed
+            if self._watch_applied and self.run_stats is not None:
+                try:
+                    self.run_stats.write_report()
+                except OSError:
+                    pass
+
+    def _poll_watch(self) -> None:
+        """Add newly settled files to the plan; each tick costs O(files that changed)."""
+        watcher = self._watcher
+        if watcher is None:
+            return
+        try:
+            while True:
+                result = self._watch_results.get_nowait()
+                self._watch_busy = False
+                self._apply_rename_results(result)
+                if result.errors:
+                    self._show_rename_results(result)
+        except queue.Empty:
+            pass
+
+        try:
+            ready, _ = watcher.poll()
+        except OSError as e:
+            self.watch_var.set(False)
+            self._stop_watch()
+            messagebox.showerror("Error", f"Stopped watching the folder: {str(e)}")
+            return
+        if ready:
+            builder = self._watch_builder
+            options = builder.options
+            headers = options.use_metadata or options.sync_audio
+            metadata = None
+            if headers:
+                with self.run_stats.phase("headers", len(ready)):
+                    metadata = engine.read_metadata(watcher.folder, ready)
+            builder.add(ready, metadata)
+            for name in ready:
+                self._watch_positions[name] = len(self.files)
+                self.files.append(name)
+            if builder.retargeted:
+                # Earlier rows changed name and status, so the filters index them again
+                self._plan_index = export.PlanIndex(self.plan)
+            self._plan_grew()
+
+        if self.auto_rename_var.get() and not self._watch_busy:
+            plan = self._unapplied_plan()
+            if plan is not None:
+                self._watch_busy = True
+                stats = self.run_stats
+                threading.Thread(target=lambda: self._watch_results.put(engine.execute_plan(plan, stats=stats)),
+                                 name="watch-rename", daemon=True).start()
+        self.root.after(int(WATCH_INTERVAL * 1000), self._poll_watch)
+
+    def _unapplied_plan(self) -> Optional[engine.RenamePlan]:
+        """Take the part of a watched plan not yet renamed, or None if there is none."""
+        if self._watch_applied >= len(self.plan):
+            return None
+        plan = self.plan.slice(self._watch_applied)
+        self._watch_applied = len(self.plan)
+        # The new names are this app's own renames, not files arriving
+        self._watcher.ignore(plan.new_names)
+        return plan
+
+    def _naming_options(self) -> engine.NamingOptions:
+        """Read the naming parameters from the option fields."""
+        return engine.NamingOptions(
+            camera_roll=self.camera_roll_var.get(),
+            clip_prefix=self.clip_prefix_var.get(),
+            date=self.date_var.get(),
+            use_metadata=self.use_metadata_var.get(),
+            template=self.template_var.get(),
+            sync_audio=self.sync_audio_var.get())
+
+    def _load_project_template(self, event: Optional[tk.Event] = None) -> None:
+        """Switch to the template saved for the selected project."""
+        self.template_var.set(self.templates.get(self.project_var.get().strip()))
+        if self.plan is not None:
+            self.preview_renaming()
+
+    def save_project_template(self) -> None:
+        """Save the current template under the project name."""
+        project = self.project_var.get().strip()
+        if not project:
+            messagebox.showwarning("Warning", "Enter a project name to save the template under.")
+            return
+        try:
+            self.templates.save(project, self.template_var.get())
+        except TemplateError as e:
+            messagebox.showerror("Invalid Template", str(e))
+            return
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save the template: {str(e)}")
+            return
+        self.project_combo.configure(values=self.templates.projects())
     
     def generate_new_name(self, filename: str, index: int) -> str:
-        """Generate a new filename according to the Netflix naming convention.
+        """Generate a new filename from the current naming template.
         
         Args:
             filename: The original filename
             index: The index of the file in the list (used if no numbers are found)
         
         Returns:
-            The new filename in the format [cameraRoll]_[clipName]_[date]
+            The new filename, by default in the format [cameraRoll]_[clipName]_[date]
         """
-        name, ext = os.path.splitext(filename)
-
-        camera_roll = self.camera_roll_var.get()
-        clip_prefix = self.clip_prefix_var.get()
-        date = self.date_var.get()
-
-        # Extract numbers from original filename
-        numbers = self.extract_numbers(filename)
-        if numbers:
-            clip_name = f"{clip_prefix}{numbers}"
-        else:
-            clip_name = f"{clip_prefix}{index:03d}"
-
-        return f"{camera_roll}_{clip_name}_{date}{ext}"
+        return engine.generate_new_name(filename, index, self._naming_options())
     
     def preview_renaming(self) -> None:
         """Generate a preview of how files will be renamed."""
@@ -227,21 +778,124 @@ class FootageRenamer:
             messagebox.showwarning("Warning", "No files loaded. Please select a folder first.")
             return
 
-        # Clear previous preview
-        for item in self.preview_tree.get_children():
-            self.preview_tree.delete(item)
+        options = self._naming_options()
+        try:
+            compile_template(options.template)
+        except TemplateError as e:
+            messagebox.showerror("Invalid Template", str(e))
+            return
+        scan = self.scan
+        if self._watcher is not None:
+            # Re-plan the files not renamed yet; later files are added to the same builder
+            folder = self._watcher.folder
+            originals = self.plan.originals
+            pending = [originals[i] for i in range(self._watch_applied, len(self.plan))]
+            self.run_stats.discard("headers", "plan", "collisions")
+            builder = engine.PlanBuilder(folder, options, os.listdir(folder), pending, self.run_stats)
+            metadata = None
+            if options.use_metadata or options.sync_audio:
+                with self.run_stats.phase("headers", len(pending)):
+                    metadata = engine.read_metadata(folder, pending)
+            builder.add(pending, metadata)
+            self._watch_builder = builder
+            self._watch_applied = 0
+            self.plan = builder.plan
+        elif scan is None:
+            self.run_stats = RunStats(self._roots()[0])
+            self.plan = engine.plan_renames(self._roots()[0], self.files, options, stats=self.run_stats)
+        else:
+            # A new preview replaces the previous plan's figures
+            stats = self.run_stats or RunStats(scan.folder)
+            stats.discard("plan", "collisions")
+            # Headers are only read once the option is first used for this folder
+            if (options.use_metadata or options.sync_audio) and scan.metadata is None:
+                with stats.phase("headers", len(scan.files)) as phase:
+                    load_metadata(scan, self.cache, phase.call("stat") if self.cache is not None else None)
+                    phase.add("headers_read", scan.changed)
+            self.run_stats = stats
+            self.plan = engine.plan_renames(scan.folder, self.files, options,
+                                            existing=scan.names, metadata=scan.metadata, stats=stats)
+
+        # The table reads rows on demand, so this is O(1) regardless of plan size
+        self._show_plan()
+
+    def _show_plan(self) -> None:
+        """Show the current plan in the preview, through the filters."""
+        self._plan_index = export.PlanIndex(self.plan)
+        self.preview_table.set_rows(self.plan.row_count, self._preview_row, self._filtered_rows())
+        self._update_filter_label()
+
+    def _plan_grew(self) -> None:
+        """Show rows added to the plan without moving the preview."""
+        self.preview_table.set_row_count(self.plan.row_count, self._filtered_rows())
+        self._update_filter_label()
+
+    def _apply_filter(self) -> None:
+        """Narrow the preview to the rows the filter and search select."""
+        if self._plan_index is None:
+            return
+        self.preview_table.set_view(self._filtered_rows())
+        self._update_filter_label()
 
-        self.preview_data = []
+    def _filtered_rows(self) -> Optional[Sequence[int]]:
+        """Return the plan rows the filter and search select, or None for every row."""
+        index = self._plan_index
+        choice = self.filter_var.get()
+        prefix = self.search_var.get().strip()
+        if index is None or (choice == FILTER_ALL and not prefix):
+            return None
+        rows: Optional[Sequence[int]] = None
+        if choice == FILTER_CONFLICTS:
+            rows = index.conflicts()
+        elif choice == FILTER_UNPARSED:
+            rows = index.unparsed()
+        if prefix:
+            found = index.search(prefix)
+            if rows is not None:
+                # Both lists are in plan order; keep the rows of the longer one found in the shorter
+                shorter, longer = sorted((rows, found), key=len)
+                keep = set(shorter)
+                found = array("Q", (row for row in longer if row in keep))
+            rows = found
+        return rows
 
-        # Generate new names and populate the preview table
-        for i, filename in enumerate(self.files, 1):
-            new_name = self.generate_new_name(filename, i)
-            self.preview_data.append((filename, new_name))
-            self.preview_tree.insert("", tk.END, values=(filename, new_name))
+    def _update_filter_label(self) -> None:
+        shown, total = self.preview_table.shown, len(self.preview_table)
+        self.filter_label.configure(text=f"{shown} of {total} rows" if shown != total else "")
+
+    def export_plan(self) -> None:
+        """Write the previewed plan, with each file's flags, to a CSV or JSON file."""
+        if not self.plan:
+            messagebox.showwarning("Warning", "No preview available. Please generate a preview first.")
+            return
+        path = filedialog.asksaveasfilename(title="Export plan", defaultextension=".csv",
+                                            filetypes=(("CSV", "*.csv"), ("JSON", "*.json")))
+        if not path:
+            return
+        try:
+            count = export.export_plan(self.plan, path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export the plan: {str(e)}")
+            return
+        messagebox.showinfo("Export", f"Exported {count} entries to {path}")
+    
+    def _preview_row(self, index: int) -> Tuple[str, str, str]:
+        """Return the preview table values for a plan row, flagging suffixed targets and guessed clip numbers."""
+        row = self.plan.row(index)
+        status = "" if row.status == engine.STATUS_OK else row.status
+        if row.is_sequence:
+            frames = f"{row.stop - row.start} frames"
+            status = f"{frames}, {status}" if status else frames
+        elif row.original in self.plan.matches:
+            status = f"synced, {status}" if status else "synced"
+        if not row.parsed:
+            # No vendor parser recognised the name, so the clip number is a guess
+            status = f"{status}, unparsed" if status else "unparsed"
+        return row.original, row.new_name, status
     
     def rename_files(self) -> None:
         """Rename files according to the generated preview."""
-        if not self.preview_data:
+        if not self.plan:
             messagebox.showwarning("Warning", "No preview available. Please generate a preview first.")
             return
 
@@ -250,14 +904,123 @@ class FootageRenamer:
             messagebox.showwarning("Warning", "No folder selected. Please select a folder first.")
             return
 
-        success_count = 0
-        error_count = 0
-        errors: List[str] = []
+        plan = self.plan
+        if self._watcher is not None:
+            if self._watch_busy:
+                messagebox.showinfo("Rename", "Files are being renamed; try again in a moment.")
+                return
+            plan = self._unapplied_plan()
+            if plan is None:
+                messagebox.showinfo("Rename", "Every file found so far has been renamed.")
+                return
+        stats = self.run_stats or RunStats(plan.folder)
+        stats.discard("hash", "journal", "rename")
+        self.run_stats = stats
+        # A watched folder gets one report when watching stops
+        report = self._watcher is None
+        if self.verify_var.get():
+            # The preferred algorithm; each file is still checked with one its offload MHL recorded
+            algorithm = verify.available_algorithms()[0]
+            self._run_batch("Verifying and Renaming Files", self._reported(stats, report, (
+                lambda progress, cancel: verify.execute_verified(plan, algorithm, progress, cancel, stats=stats))))
+        else:
+            self._run_batch("Renaming Files", self._reported(stats, report, (
+                lambda progress, cancel: engine.execute_plan(plan, progress, cancel, stats=stats))))
+
+    @staticmethod
+    def _reported(stats: RunStats, report: bool,
+                  task: Callable[[Callable[[int, int], None], threading.Event], engine.RenameResult]
+                  ) -> Callable[[Callable[[int, int], None], threading.Event], engine.RenameResult]:
+        """Wrap a batch task so the run report is written beside the folder when it ends."""
+        def run(progress: Callable[[int, int], None], cancel: threading.Event) -> engine.RenameResult:
+            result = task(progress, cancel)
+            if report:
+                try:
+                    result.report = stats.write_report()
+                except OSError as e:
+                    result.errors.append(f"Failed to write the run report: {str(e)}")
+            return result
+        return run
+    
+    def copy_files(self) -> None:
+        """Copy the previewed files to a destination folder under their new names."""
+        if not self.plan:
+            messagebox.showwarning("Warning", "No preview available. Please generate a preview first.")
+            return
+
+        destination = filedialog.askdirectory(title="Copy renamed files to")
+        if not destination:
+            return
+        if os.path.abspath(destination) == os.path.abspath(self.plan.folder):
+            messagebox.showwarning("Warning", "Choose a destination other than the source folder.")
+            return
 
+        plan = self.plan
+        stats = self.run_stats or RunStats(plan.folder)
+        stats.discard("copy")
+        self.run_stats = stats
+
+        def copy(progress: Callable[[int, int], None], cancel: threading.Event) -> engine.RenameResult:
+            with stats.phase("copy", len(plan)):
+                return ingest.copy_plan(plan, [destination], progress, cancel)
+
+        self._run_batch("Copying Files", self._reported(stats, True, copy))
+    
+    def undo_last_batch(self) -> None:
+        """Restore the original names of the most recently renamed batch."""
+        batch = journal.last_batch()
+        if batch is None:
+            messagebox.showinfo("Undo", "There is no rename batch to undo.")
+            return
+        if not messagebox.askyesno(
+                "Undo", f"Restore the original names of {len(batch.undoable)} files in {batch.folder}?"):
+            return
+
+        self._run_batch("Undoing Last Batch",
+                        lambda progress, cancel: engine.undo_last_batch(progress, cancel))
+    
+    def _check_interrupted_batches(self) -> None:
+        """Finish or roll back rename batches that a crash left half done."""
+        try:
+            batches = journal.interrupted_batches()
+        except OSError:
+            return
+        if not batches:
+            return
+
+        folders = "\n".join(sorted({batch.folder for batch in batches}))
+        answer = messagebox.askyesnocancel(
+            "Interrupted Rename",
+            f"{len(batches)} rename batch(es) did not finish:\n{folders}\n\n"
+            "Yes: finish renaming\nNo: restore the original names\nCancel: decide later")
+        if answer is None:
+            return
+
+        results = engine.recover_interrupted(finish=answer)
+        errors = [error for result in results for error in result.errors]
+        result_msg = f"Recovered {len(results)} batch(es)."
+        if errors:
+            result_msg += "\n\nErrors:\n" + "\n".join(errors)
+            messagebox.showerror("Recovery Results", result_msg)
+        else:
+            messagebox.showinfo("Recovery Results", result_msg)
+    
+    def _run_batch(self, title: str,
+                   task: Callable[[Callable[[int, int], None], threading.Event],
+                                  Optional[engine.RenameResult]]) -> None:
+        """Run a rename task on a worker thread behind a modal progress window.
+
+        The worker reports back through a queue at most every PROGRESS_INTERVAL
+        seconds, so the window stays responsive and the batch can be cancelled.
+
+        Args:
+            title: The progress window title
+            task: Called on the worker with (progress callback, cancel event)
+        """
         # Create a progress window
         progress_window = tk.Toplevel(self.root)
-        progress_window.title("Renaming Files")
-        progress_window.geometry("300x100")
+        progress_window.title(title)
+        progress_window.geometry("300x130")
         progress_window.resizable(False, False)
         
         # Center progress window
@@ -275,56 +1038,128 @@ class FootageRenamer:
         progress_var = tk.DoubleVar()
         progress_bar = ttk.Progressbar(progress_window, variable=progress_var, maximum=100)
         progress_bar.pack(padx=20, pady=5, fill=tk.X)
+
+        # Cancelling lets the worker finish the current file, then stop
+        cancel_event = threading.Event()
+
+        def cancel() -> None:
+            cancel_event.set()
+            cancel_btn.config(state=tk.DISABLED)
+            progress_label.config(text="Cancelling...")
+
+        cancel_btn = ttk.Button(progress_window, text="Cancel", command=cancel)
+        cancel_btn.pack(pady=5)
+        progress_window.protocol("WM_DELETE_WINDOW", cancel)
         
         # Make progress window modal
         progress_window.transient(self.root)
         progress_window.grab_set()
-        self.root.update_idletasks()
 
-        try:
-            # Rename files with progress updates
-            total_files = len(self.preview_data)
-            for i, (original, new_name) in enumerate(self.preview_data):
-                original_path = os.path.join(folder, original)
-                new_path = os.path.join(folder, new_name)
+        updates: "queue.Queue[tuple]" = queue.Queue()
+
+        def worker() -> None:
+            last_report = 0.0
+
+            def report(done: int, total_files: int) -> None:
+                nonlocal last_report
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_INTERVAL or done == total_files:
+                    last_report = now
+                    updates.put(("progress", done, total_files))
+
+            try:
+                result = task(report, cancel_event)
+            except Exception as e:
+                result = engine.RenameResult(errors=[f"Renaming stopped: {str(e)}"])
+            updates.put(("done", result))
+
+        def poll() -> None:
+            # Drain everything queued since the last tick; only the newest progress matters
+            progress = None
+            finished = False
+            result = None
+            try:
+                while True:
+                    message = updates.get_nowait()
+                    if message[0] == "progress":
+                        progress = message
+                    else:
+                        finished = True
+                        result = message[1]
+            except queue.Empty:
+                pass
+
+            if progress is not None and not cancel_event.is_set():
+                _, done, total_files = progress
+                progress_var.set(done / total_files * 100)
+                progress_label.config(text=f"Renaming file {done} of {total_files}")
+
+            if not finished:
+                self.root.after(int(PROGRESS_INTERVAL * 1000), poll)
+                return
 
-                try:
-                    # Check if new name already exists and make it unique if necessary
-                    if os.path.exists(new_path):
-                        name, ext = os.path.splitext(new_name)
-                        unique_suffix = 1
-                        while os.path.exists(os.path.join(folder, f"{name}_{unique_suffix}{ext}")):
-                            unique_suffix += 1
-                        new_path = os.path.join(folder, f"{name}_{unique_suffix}{ext}")
-
-                    os.rename(original_path, new_path)
-                    success_count += 1
-                except Exception as e:
-                    error_count += 1
-                    errors.append(f"Failed to rename '{original}' to '{new_name}': {str(e)}")
-                
-                # Update progress
-                progress = (i + 1) / total_files * 100
-                progress_var.set(progress)
-                progress_label.config(text=f"Renaming file {i + 1} of {total_files}")
-                progress_window.update_idletasks()
-        finally:
-            # Close progress window
             progress_window.destroy()
+            if result is not None:
+                self._show_rename_results(result)
+                self._apply_rename_results(result)
 
-        # Show results
-        result_msg = f"Renaming completed. {success_count} files successfully renamed, {error_count} errors."
-        if errors:
-            result_msg += "\n\nErrors:\n" + "\n".join(errors)
+        threading.Thread(target=worker, name="rename-worker", daemon=True).start()
+        self.root.after(int(PROGRESS_INTERVAL * 1000), poll)
+    
+    def _apply_rename_results(self, result: engine.RenameResult) -> None:
+        """Patch the loaded listing and cache with a finished batch, then refresh the preview.
+
+        The batch reports exactly which names changed, so the folder is not rescanned.
+        """
+        if self.cache is not None:
+            try:
+                self.cache.record_renames(result.folder, result.renamed)
+            except Exception:
+                pass
+
+        watcher = self._watcher
+        if watcher is not None and os.path.abspath(result.folder) == watcher.folder:
+            # Only the names in this batch change; the growing plan stays as it is
+            positions = self._watch_positions
+            for old, new in result.renamed:
+                position = positions.pop(old, None)
+                if position is not None:
+                    self.files[position] = new
+                    positions[new] = position
+            self._plan_grew()
+            return
+
+        scan = self.scan
+        if scan is not None and os.path.abspath(result.folder) == scan.folder:
+            scan.apply_renames(result.renamed)
+            self.files = scan.files
+        if self.files:
+            self.preview_renaming()
+    
+    def _show_rename_results(self, result: engine.RenameResult) -> None:
+        """Report the outcome of a rename batch."""
+        result_msg = result.summary()
+        if result.manifest:
+            result_msg += f"\n\nChecksum manifest: {result.manifest}"
+        if result.report and self.run_stats is not None:
+            result_msg += f"\n\n{self.run_stats.summary()}\n\nRun report: {result.report}"
+        if result.not_renamed:
+            shown = result.not_renamed[:20]
+            result_msg += "\n\nNot renamed:\n" + "\n".join(shown)
+            if len(result.not_renamed) > len(shown):
+                result_msg += f"\n... and {len(result.not_renamed) - len(shown)} more"
+        if result.errors:
+            result_msg += "\n\nErrors:\n" + "\n".join(result.errors)
             messagebox.showerror("Rename Results", result_msg)
         else:
             messagebox.showinfo("Rename Results", result_msg)
 
-        # Refresh file list and preview
-        self.load_files()
-        self.preview_renaming()
-
 if __name__ == "__main__":
+    # Any command-line arguments select the headless tool; no window is built
+    if len(sys.argv) > 1:
+        from renamer.cli import main
+        sys.exit(main())
+
     root = tk.Tk()
     app = FootageRenamer(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""Throughput benchmarks for the rename engine.
+
+Run from the repository root with ``python -m benchmarks.run``; see
+``benchmarks.run`` for the options and the output format.
+"""
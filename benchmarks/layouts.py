@@ -0,0 +1,85 @@
+"""Synthetic card layouts for the benchmarks.
+
+Each layout creates empty files under a root folder and returns the folder
+to scan and whether it needs a recursive scan. File contents never matter to
+listing, planning or renaming, so nothing is written into the files.
+"""
+import os
+from typing import Callable, Dict, Iterator, Tuple
+
+# Files per leaf folder of the deep tree, about one camera reel
+TREE_FILES_PER_FOLDER = 100
+
+# Frames per clip in the sequence layout
+SEQUENCE_FRAMES = 1000
+
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _touch(path: str) -> None:
+    os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def _letters(number: int) -> str:
+    """Spell a number in base 26 letters, so names differ without any digits."""
+    text = ""
+    while True:
+        number, digit = divmod(number, 26)
+        text = _LETTERS[digit] + text
+        if not number:
+            return text
+
+
+def flat_names(count: int) -> Iterator[str]:
+    # One folder of camera clips, as on a single card
+    for i in range(count):
+        yield f"A{i // 1000 + 1:03d}C{i % 1000 + 1:03d}_240821_R1AB.mov"
+
+
+def collision_names(count: int) -> Iterator[str]:
+    # Every name holds the same number, so every file wants the same target
+    for i in range(count):
+        yield f"{_letters(i)}_0001.mov"
+
+
+def sequence_names(count: int) -> Iterator[str]:
+    # DPX scans: SEQUENCE_FRAMES frames per clip
+    for i in range(count):
+        clip, frame = divmod(i, SEQUENCE_FRAMES)
+        yield f"A001C{clip + 1:03d}_{86400 + frame:07d}.dpx"
+
+
+def build_flat(root: str, count: int, names: Callable[[int], Iterator[str]] = flat_names) -> Tuple[str, bool]:
+    for name in names(count):
+        _touch(os.path.join(root, name))
+    return root, False
+
+
+def build_collisions(root: str, count: int) -> Tuple[str, bool]:
+    return build_flat(root, count, collision_names)
+
+
+def build_sequences(root: str, count: int) -> Tuple[str, bool]:
+    return build_flat(root, count, sequence_names)
+
+
+def build_tree(root: str, count: int) -> Tuple[str, bool]:
+    """Cards of ARRI reel folders three levels down, with a proxy folder next to each reel."""
+    for i in range(0, count, TREE_FILES_PER_FOLDER):
+        folder_index = i // TREE_FILES_PER_FOLDER
+        card, reel = divmod(folder_index, 10)
+        reel_name = f"A{card + 1:03d}R{reel + 1:X}AB"
+        folder = os.path.join(root, f"Day{card // 10 + 1:02d}", f"Card{card + 1:03d}", reel_name)
+        os.makedirs(folder, exist_ok=True)
+        os.makedirs(os.path.join(folder, "Proxy"), exist_ok=True)
+        for j in range(i, min(i + TREE_FILES_PER_FOLDER, count)):
+            _touch(os.path.join(folder, f"A{card + 1:03d}C{j % TREE_FILES_PER_FOLDER + 1:03d}_240821_R1AB.mxf"))
+    return root, True
+
+
+LAYOUTS: Dict[str, Callable[[str, int], Tuple[str, bool]]] = {
+    "flat": build_flat,
+    "tree": build_tree,
+    "collisions": build_collisions,
+    "sequences": build_sequences,
+}
@@ -0,0 +1,278 @@
+"""Measure listing, planning, preview and rename throughput on synthetic cards.
+
+Run from the repository root::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 1000,1000000 --layouts flat,sequences
+    python -m benchmarks.run --output baseline.jsonl
+    python -m benchmarks.run --compare baseline.jsonl
+    python -m benchmarks.run --sizes 1000000 --layouts flat --memory
+
+Every layout and size runs in a fresh child process on a temporary folder,
+on tmpfs (``/dev/shm``) when available so the disk does not dominate, which
+also makes the peak memory of each case its own. One JSON record is written
+per measurement::
+
+    {"layout": "flat", "files": 10000, "phase": "plan", "seconds": 0.031,
+     "per_second": 322580.6, "peak_rss_kb": 51234, "commit": "b1477d5", ...}
+
+``--compare`` reads the records of an earlier run and exits with status 1
+when a phase got slower than the tolerance allows. ``--memory`` plans each
+case once more under ``tracemalloc`` and adds a "plan-memory" record with
+the size of the plan kept (``plan_kb``) and the traced peak on the way
+(``traced_peak_kb``); tracing makes that plan several times slower.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from renamer import engine
+from renamer.cache import FolderScan, scan_folder
+from renamer.walker import scan_tree
+
+from .layouts import LAYOUTS
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Allowed slowdown against a baseline before --compare reports a regression
+DEFAULT_TOLERANCE = 0.10
+
+# Phases faster than this are timer noise and never count as regressions
+_NOISE_SECONDS = 0.01
+
+_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _peak_rss_kb() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _preview_row(plan: engine.RenamePlan, index: int) -> Tuple[str, str, str]:
+    # What the preview table computes per row; sorting the table reads every row
+    row = plan.row(index)
+    status = "" if row.status == engine.STATUS_OK else row.status
+    if row.is_sequence:
+        frames = f"{row.stop - row.start} frames"
+        status = f"{frames}, {status}" if status else frames
+    return row.original, row.new_name, status
+
+
+def _plan_memory(layout: str, count: int, scan: FolderScan, options: engine.NamingOptions) -> dict:
+    """Plan a scan under tracemalloc: what the plan keeps, and the peak while it is built."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        plan = engine.plan_renames(scan.folder, scan.files, options, existing=scan.names)
+        seconds = time.perf_counter() - start
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "layout": layout, "files": count, "phase": "plan-memory", "items": len(plan),
+        "seconds": round(seconds, 6),
+        "per_second": round(len(plan) / seconds, 1) if seconds else None,
+        "plan_kb": held // 1024, "traced_peak_kb": peak // 1024,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def run_case(layout: str, count: int, base: str, memory: bool = False) -> List[dict]:
+    """Build one layout and time each phase on it.
+
+    Args:
+        layout: A name from ``LAYOUTS``
+        count: Files to create
+        base: The folder to build the layout in
+        memory: Also trace the memory of planning it
+
+    Returns:
+        One record per phase
+    """
+    root = tempfile.mkdtemp(prefix=f"bench-{layout}-{count}-", dir=base)
+    try:
+        media = os.path.join(root, "media")
+        journal_dir = os.path.join(root, "journal")
+        os.makedirs(media)
+        os.makedirs(journal_dir)
+        # Keep templates, caches and journals out of the user's state folder
+        os.environ["FOOTAGE_RENAMER_HOME"] = os.path.join(root, "state")
+        folder, recursive = LAYOUTS[layout](media, count)
+        options = engine.NamingOptions(camera_roll="A001", date="240821")
+        records = []
+
+        def measure(phase: str, items: int, task: Callable[[], object]) -> object:
+            start = time.perf_counter()
+            result = task()
+            seconds = time.perf_counter() - start
+            records.append({
+                "layout": layout, "files": count, "phase": phase, "items": items,
+                "seconds": round(seconds, 6),
+                "per_second": round(items / seconds, 1) if seconds else None,
+                "peak_rss_kb": _peak_rss_kb(),
+            })
+            return result
+
+        scan = measure("list", count, lambda: scan_tree([folder]) if recursive else scan_folder(folder))
+        plan = measure("plan", len(scan.files), lambda: engine.plan_renames(
+            scan.folder, scan.files, options, existing=scan.names))
+        if memory:
+            # After the timed plan, so tracing does not slow the phases that are compared
+            records.append(_plan_memory(layout, count, scan, options))
+        measure("preview", plan.row_count,
+                lambda: [_preview_row(plan, i) for i in range(plan.row_count)])
+        result = measure("rename", len(plan), lambda: engine.execute_plan(plan, journal_dir=journal_dir))
+        if result.errors:
+            raise RuntimeError(f"{len(result.errors)} renames failed, e.g. {result.errors[0]}")
+        return records
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _default_dir() -> str:
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return tempfile.gettempdir()
+
+
+def _environment() -> Dict[str, Optional[str]]:
+    """Describe the code and machine the results came from."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_REPO,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def _load(path: str) -> Dict[Tuple[str, int, str], float]:
+    with open(path, encoding="utf-8") as fh:
+        records = [json.loads(line) for line in fh if line.strip()]
+    return {(record["layout"], record["files"], record["phase"]): record["seconds"] for record in records}
+
+
+def compare(records: List[dict], baseline: Dict[Tuple[str, int, str], float],
+            tolerance: float) -> List[str]:
+    """List the phases that got slower than a baseline allows.
+
+    Args:
+        records: This run's records
+        baseline: Seconds by (layout, files, phase) from an earlier run
+        tolerance: Allowed slowdown, e.g. 0.1 for 10%
+
+    Returns:
+        One line per regression
+    """
+    regressions = []
+    for record in records:
+        before = baseline.get((record["layout"], record["files"], record["phase"]))
+        after = record["seconds"]
+        if before is None or after < _NOISE_SECONDS:
+            continue
+        if after > before * (1 + tolerance):
+            regressions.append(f"{record['layout']} {record['files']} {record['phase']}: "
+                               f"{before:.3f}s -> {after:.3f}s ({after / before - 1:+.0%})")
+    return regressions
+
+
+def _parse_list(text: str, convert: Callable[[str], object]) -> list:
+    return [convert(item) for item in text.split(",") if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks.
+
+    Args:
+        argv: Arguments to parse, defaulting to ``sys.argv[1:]``
+
+    Returns:
+        The process exit status
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated file counts (default: %(default)s)")
+    parser.add_argument("--layouts", default=",".join(LAYOUTS),
+                        help="comma-separated layouts (default: %(default)s)")
+    parser.add_argument("--dir", default=_default_dir(),
+                        help="where to build the layouts (default: %(default)s)")
+    parser.add_argument("--output", help="append the records to this file instead of printing them")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="report phases slower than in this earlier output")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown against the baseline (default: %(default)s)")
+    parser.add_argument("--memory", action="store_true",
+                        help="also trace the memory of planning each case (slow)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # A child process runs one case and prints its records
+    if args.case:
+        layout, _, count = args.case.partition(":")
+        for record in run_case(layout, int(count), args.dir, args.memory):
+            print(json.dumps(record))
+        return 0
+
+    try:
+        sizes = _parse_list(args.sizes, int)
+    except ValueError:
+        parser.error(f"--sizes expects comma-separated numbers, not '{args.sizes}'")
+    layouts = _parse_list(args.layouts, str.strip)
+    unknown = [layout for layout in layouts if layout not in LAYOUTS]
+    if unknown:
+        parser.error(f"unknown layout '{unknown[0]}'; choose from {', '.join(LAYOUTS)}")
+    baseline = _load(args.compare) if args.compare else None
+
+    environment = _environment()
+    records: List[dict] = []
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for count in sizes:
+            for layout in layouts:
+                print(f"{layout} {count} files...", file=sys.stderr)
+                command = [sys.executable, "-m", "benchmarks.run", "--case", f"{layout}:{count}", "--dir", args.dir]
+                if args.memory:
+                    command.append("--memory")
+                child = subprocess.run(command, cwd=_REPO, capture_output=True, text=True)
+                if child.returncode:
+                    print(child.stderr, file=sys.stderr)
+                    return 2
+                for line in child.stdout.splitlines():
+                    record = {**json.loads(line), **environment}
+                    records.append(record)
+                    out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if baseline is not None:
+        regressions = compare(records, baseline, args.tolerance)
+        for line in regressions:
+            print(f"Slower: {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No phase is slower than the baseline allows.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Rename engine behind the Footage Renamer app.
+
+The modules in this package have no Tk dependency and can be used headless,
+either from Python or through ``python -m renamer``.
+"""
+from .columns import NameColumn, NameSet
+from .engine import (
+    STATUS_DUPLICATE,
+    STATUS_OK,
+    STATUS_SUFFIXED,
+    STATUS_UNCHANGED,
+    NameIndex,
+    NamingOptions,
+    PlanBuilder,
+    PlanEntry,
+    PlanMoves,
+    PlanRow,
+    RenamePlan,
+    RenameResult,
+    execute_plan,
+    generate_new_name,
+    plan_renames,
+    read_metadata,
+    recover_interrupted,
+    undo_last_batch,
+)
+from .export import REPORT_FORMATS, PlanIndex, ReportWriter, export_plan, write_report
+from .filenames import NAME_PARSERS, NameParser, ParsedName, parse_name, register_parser
+from .metadata import MediaInfo, read_media_info, read_media_infos
+from .sequences import FrameSequence, group_sequences
+from .stats import RunStats
+from .sync import IntervalIndex, match_takes
+from .template import DEFAULT_TEMPLATE, Template, TemplateError, TemplateStore, compile_template
+from .walker import VENDOR_RULES, DirListing, VendorRule, scan_tree, walk
+from .watch import FolderWatcher
+
+__all__ = [
+    "DEFAULT_TEMPLATE",
+    "DirListing",
+    "FolderWatcher",
+    "FrameSequence",
+    "IntervalIndex",
+    "MediaInfo",
+    "NAME_PARSERS",
+    "STATUS_DUPLICATE",
+    "STATUS_OK",
+    "STATUS_SUFFIXED",
+    "STATUS_UNCHANGED",
+    "NameColumn",
+    "NameIndex",
+    "NameParser",
+    "NameSet",
+    "NamingOptions",
+    "ParsedName",
+    "PlanBuilder",
+    "PlanEntry",
+    "PlanIndex",
+    "PlanMoves",
+    "PlanRow",
+    "REPORT_FORMATS",
+    "RenamePlan",
+    "RenameResult",
+    "ReportWriter",
+    "RunStats",
+    "Template",
+    "TemplateError",
+    "TemplateStore",
+    "VENDOR_RULES",
+    "VendorRule",
+    "compile_template",
+    "execute_plan",
+    "export_plan",
+    "generate_new_name",
+    "group_sequences",
+    "match_takes",
+    "parse_name",
+    "plan_renames",
+    "read_media_info",
+    "read_media_infos",
+    "read_metadata",
+    "recover_interrupted",
+    "register_parser",
+    "scan_tree",
+    "undo_last_batch",
+    "walk",
+    "write_report",
+]
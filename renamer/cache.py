@@ -0,0 +1,262 @@
+"""Persistent per-folder scan cache backed by SQLite.
+
+Header metadata is remembered per file, keyed by folder and name and validated
+against the file's inode, size and mtime. Reopening a large folder therefore
+re-reads headers only for files that were added or changed, and a finished
+rename batch updates the cached names in place rather than forcing a rescan.
+"""
+import json
+import os
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .metadata import MediaInfo, read_media_infos
+from .paths import state_dir
+from .stats import REPORT_SUFFIX, CallStats
+
+# Checksum lists an offload tool leaves next to the media; see renamer.verify
+MHL_SUFFIX = ".mhl"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    info TEXT,
+    PRIMARY KEY (folder, name)
+)
+"""
+
+
+@dataclass
+class FolderScan:
+    """One listing of a folder."""
+
+    folder: str
+    names: List[str] = field(default_factory=list)      # every entry, files and folders
+    files: List[str] = field(default_factory=list)      # regular files only, in listing order
+    metadata: Optional[Dict[str, Optional[MediaInfo]]] = None
+    changed: int = 0                                    # files whose headers had to be read
+
+    def apply_renames(self, renamed: Iterable[Tuple[str, str]]) -> None:
+        """Update the listing with the results of a rename batch."""
+        mapping = dict(renamed)
+        if not mapping:
+            return
+        self.names = [mapping.get(name, name) for name in self.names]
+        self.files = [mapping.get(name, name) for name in self.files]
+        if self.metadata is not None:
+            self.metadata = {mapping.get(name, name): info for name, info in self.metadata.items()}
+
+
+def _encode_info(info: Optional[MediaInfo]) -> str:
+    if info is None:
+        return "null"
+    data = asdict(info)
+    if info.creation_date is not None:
+        data["creation_date"] = info.creation_date.isoformat()
+    return json.dumps(data)
+
+
+def _decode_info(text: Optional[str]) -> Optional[MediaInfo]:
+    data = json.loads(text) if text else None
+    if data is None:
+        return None
+    if data.get("creation_date"):
+        data["creation_date"] = datetime.fromisoformat(data["creation_date"])
+    return MediaInfo(**data)
+
+
+def _list_folder(folder: str) -> Tuple[FolderScan, List[os.DirEntry]]:
+    """List a folder with one ``os.scandir`` pass, without stat'ing entries."""
+    result = FolderScan(os.path.abspath(folder))
+    file_entries = []
+    with os.scandir(result.folder) as entries:
+        for entry in entries:
+            result.names.append(entry.name)
+            # Run reports of neighbouring folders and offload checksum lists are never footage
+            if (entry.is_file() and not entry.name.endswith(REPORT_SUFFIX)
+                    and not entry.name.lower().endswith(MHL_SUFFIX)):
+                result.files.append(entry.name)
+                file_entries.append(entry)
+    return result, file_entries
+
+
+def scan_folder(folder: str, with_metadata: bool = False,
+                cache: Optional["ScanCache"] = None,
+                calls: Optional[CallStats] = None) -> FolderScan:
+    """List a folder, using the cache for header metadata when one is given.
+
+    Args:
+        folder: The folder to scan
+        with_metadata: Also return header metadata for every file
+        cache: The scan cache to consult and update
+        calls: Optional stats that get every stat the cache makes to validate its rows
+
+    Returns:
+        The listing, with metadata when requested
+    """
+    if cache is not None:
+        return cache.scan(folder, with_metadata, calls)
+    result, _ = _list_folder(folder)
+    if with_metadata:
+        load_metadata(result)
+    return result
+
+
+def load_metadata(scan: FolderScan, cache: Optional["ScanCache"] = None,
+                  calls: Optional[CallStats] = None) -> None:
+    """Read header metadata for a listing that was made without it.
+
+    Works for tree scans too, whose file names carry their subfolder.
+
+    Args:
+        scan: The listing to complete
+        cache: The scan cache to consult and update
+        calls: Optional stats that get every stat the cache makes to validate its rows
+    """
+    if cache is not None:
+        cache.tree_metadata(scan, calls)
+        return
+    infos = read_media_infos(os.path.join(scan.folder, name) for name in scan.files)
+    scan.metadata = {name: infos[os.path.join(scan.folder, name)] for name in scan.files}
+    scan.changed = len(scan.files)
+
+
+class ScanCache:
+    """Lists folders with ``os.scandir`` and caches header metadata between runs."""
+
+    def __init__(self, path: Optional[str] = None):
+        """Open (or create) the cache database.
+
+        Args:
+            path: The database file, defaulting to the state folder
+        """
+        self.path = path or os.path.join(state_dir("cache"), "scan.sqlite3")
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def scan(self, folder: str, with_metadata: bool = False,
+             calls: Optional[CallStats] = None) -> FolderScan:
+        """List a folder, reading headers only for files that changed since the last scan.
+
+        ``os.scandir`` reports entry types without a stat per entry. Files are
+        only stat'ed when metadata is wanted, to validate the cached rows.
+
+        Args:
+            folder: The folder to scan
+            with_metadata: Also return header metadata for every file
+            calls: Optional stats that get every stat's latency and error
+
+        Returns:
+            The listing, with metadata when requested
+        """
+        result, file_entries = _list_folder(folder)
+        if with_metadata:
+            result.metadata, result.changed = self._metadata(
+                result.folder, ((entry.name, entry.stat) for entry in file_entries), calls)
+        return result
+
+    def tree_metadata(self, scan: FolderScan, calls: Optional[CallStats] = None) -> None:
+        """Fill in metadata for a listing whose files may sit in subfolders.
+
+        Args:
+            scan: The listing to complete; file names are relative to its folder
+            calls: Optional stats that get every stat's latency and error
+        """
+        by_folder: Dict[str, List[str]] = {}
+        for name in scan.files:
+            directory, filename = os.path.split(name)
+            by_folder.setdefault(directory, []).append(filename)
+
+        scan.metadata, scan.changed = {}, 0
+        for directory, filenames in by_folder.items():
+            folder = os.path.join(scan.folder, directory)
+            metadata, changed = self._metadata(
+                folder, ((filename, lambda path=os.path.join(folder, filename): os.stat(path))
+                         for filename in filenames), calls)
+            scan.metadata.update((os.path.join(directory, filename), info)
+                                 for filename, info in metadata.items())
+            scan.changed += changed
+
+    def _metadata(self, folder: str, files: Iterable[Tuple[str, Callable[[], os.stat_result]]],
+                  calls: Optional[CallStats] = None) -> Tuple[Dict[str, Optional[MediaInfo]], int]:
+        cached = {row[0]: row[1:] for row in self._db.execute(
+            "SELECT name, inode, size, mtime_ns, info FROM files WHERE folder = ?", (folder,))}
+
+        metadata: Dict[str, Optional[MediaInfo]] = {}
+        stale: Dict[str, Tuple[int, int, int]] = {}
+        for name, stat in files:
+            start = time.perf_counter_ns()
+            try:
+                st = stat()
+            except OSError as e:
+                if calls is not None:
+                    calls.record(time.perf_counter_ns() - start, e)
+                continue
+            if calls is not None:
+                calls.record(time.perf_counter_ns() - start)
+            key = (st.st_ino, st.st_size, st.st_mtime_ns)
+            row = cached.pop(name, None)
+            if row is not None and tuple(row[:3]) == key:
+                metadata[name] = _decode_info(row[3])
+            else:
+                stale[name] = key
+
+        if stale:
+            infos = read_media_infos(os.path.join(folder, name) for name in stale)
+            for name in stale:
+                metadata[name] = infos[os.path.join(folder, name)]
+            self._db.executemany(
+                "INSERT OR REPLACE INTO files (folder, name, inode, size, mtime_ns, info) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((folder, name, *key, _encode_info(metadata[name])) for name, key in stale.items()))
+
+        # Whatever is left in the cache was deleted or renamed outside the app
+        if cached:
+            self._db.executemany("DELETE FROM files WHERE folder = ? AND name = ?",
+                                 ((folder, name) for name in cached))
+        if stale or cached:
+            self._db.commit()
+        return metadata, len(stale)
+
+    def record_renames(self, folder: str, renamed: Iterable[Tuple[str, str]]) -> None:
+        """Move cached rows to their new names after a rename batch.
+
+        Renaming keeps a file's inode, size and mtime, so the rows stay valid.
+
+        Args:
+            folder: The folder the batch ran in
+            renamed: (old name, new name) pairs that were applied, relative to the folder
+        """
+        folder = os.path.abspath(folder)
+        # Rows are kept per directory; names of a tree scan carry their subfolder
+        by_folder: Dict[str, List[Tuple[str, str]]] = {}
+        for old, new in renamed:
+            directory, old_name = os.path.split(old)
+            by_folder.setdefault(os.path.join(folder, directory) if directory else folder, []).append(
+                (old_name, os.path.basename(new)))
+        if not by_folder:
+            return
+        for directory, pairs in by_folder.items():
+            cached = {row[0]: row[1:] for row in self._db.execute(
+                "SELECT name, inode, size, mtime_ns, info FROM files WHERE folder = ?", (directory,))}
+            rows = [(directory, new, *cached[old]) for old, new in pairs if old in cached]
+            # Delete every old row first so swaps and cycles never hit the primary key
+            self._db.executemany("DELETE FROM files WHERE folder = ? AND name = ?",
+                                 ((directory, old) for old, _ in pairs))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO files (folder, name, inode, size, mtime_ns, info) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self._db.commit()
@@ -0,0 +1,362 @@
+"""Command-line front end for the rename engine.
+
+Without ``--apply`` the plan is printed as tab-separated ``original``, ``new``
+and ``status`` columns so it can be reviewed or piped; with ``--apply`` it is
+executed. ``--export`` streams the plan with each entry's flags to a CSV or
+JSON report.
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional, TextIO
+
+from . import engine, ingest, journal, verify
+from .cache import ScanCache, load_metadata, scan_folder
+from .executor import Concurrency
+from .export import REPORT_FORMATS, ReportWriter, report_format
+from .stats import RunStats
+from .template import DEFAULT_TEMPLATE, TemplateError, TemplateStore, compile_template
+from .walker import scan_base, scan_tree
+from .watch import SETTLE_SECONDS, FolderWatcher
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the argument parser for the command-line tool."""
+    defaults = engine.NamingOptions()
+    parser = argparse.ArgumentParser(
+        prog="footage-renamer",
+        description="Batch rename footage files using the Netflix default naming convention.")
+    parser.add_argument("folders", nargs="*", metavar="folder",
+                        help="folder containing the files to rename; several with --recursive")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="also rename files in subfolders, following camera and recorder card layouts")
+    parser.add_argument("--camera-roll", default=defaults.camera_roll,
+                        help="camera roll (default: %(default)s)")
+    parser.add_argument("--clip-prefix", default=defaults.clip_prefix,
+                        help="clip prefix (default: %(default)s)")
+    parser.add_argument("--date", default=defaults.date,
+                        help="shoot date as YYMMDD (default: today)")
+    parser.add_argument("--template",
+                        help="naming template such as '[cameraRoll]_[originalClipName]_[shootDate-YYMMDD]' "
+                             "(default: the --project template, else the Netflix default)")
+    parser.add_argument("--project",
+                        help="use the template saved for this project")
+    parser.add_argument("--save-template", action="store_true",
+                        help="save --template as the --project template")
+    parser.add_argument("--no-sequences", action="store_true",
+                        help="name every frame of an image sequence as a separate clip")
+    parser.add_argument("--from-headers", action="store_true",
+                        help="take shoot date and camera roll from each file's header when present")
+    parser.add_argument("--sync-audio", action="store_true",
+                        help="give each sound take the clip name of the camera clip its timecode overlaps")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="read every header instead of using the scan cache")
+    parser.add_argument("--checksum", choices=("xxh64", "md5"),
+                        help="hash files before renaming, check them against the offload's MHL "
+                             "and write an ASC-MHL manifest; files the MHL recorded under the other "
+                             "algorithm are checked with that one")
+    parser.add_argument("--copy-to", action="append", metavar="DEST",
+                        help="copy the files to DEST under their new names and leave the source "
+                             "untouched; may be given more than once")
+    parser.add_argument("--concurrency", type=int, metavar="N",
+                        help="renames in flight per volume (default: 1 on local disks, "
+                             "16 on network shares)")
+    parser.add_argument("--volume-concurrency", action="append", default=[], metavar="FOLDER=N",
+                        help="renames in flight for the volume holding FOLDER; may be given more than once")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep watching the folder and plan files as an offload finishes writing them")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS, metavar="SECONDS",
+                        help="with --watch, how long a file must stay unchanged (default: %(default)s)")
+    parser.add_argument("--apply", action="store_true",
+                        help="rename the files instead of printing the plan")
+    parser.add_argument("--no-report", action="store_true",
+                        help="do not append timings and error counts to FOLDER.rename-report.jsonl")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="do not print the plan")
+    parser.add_argument("--export", metavar="FILE",
+                        help="write the plan with each entry's flags (unchanged, suffixed, duplicate, "
+                             "unparsed) to FILE, or to standard output for '-'")
+    parser.add_argument("--export-format", choices=REPORT_FORMATS,
+                        help="format of --export (default: json for a .json FILE, otherwise csv)")
+    parser.add_argument("--undo", action="store_true",
+                        help="restore the original names of the last renamed batch")
+    parser.add_argument("--recover", choices=("finish", "rollback"),
+                        help="finish or roll back batches interrupted by a crash")
+    return parser
+
+
+def _report(result: engine.RenameResult) -> int:
+    """Print a batch result and return the matching exit status."""
+    print(result.summary(), file=sys.stderr)
+    for error in result.errors:
+        print(error, file=sys.stderr)
+    return 1 if result.errors else 0
+
+
+def _write_run_report(stats: RunStats, args: argparse.Namespace) -> None:
+    """Print the run's phase timings and append them to the report beside the folder."""
+    if args.no_report:
+        return
+    print(stats.summary(), file=sys.stderr)
+    try:
+        print(f"Run report appended to {stats.write_report()}", file=sys.stderr)
+    except OSError as e:
+        print(f"Failed to write the run report: {e}", file=sys.stderr)
+
+
+def _open_export(args: argparse.Namespace) -> Optional[ReportWriter]:
+    """Start the --export report, or return None without one.
+
+    Raises:
+        OSError: If the file cannot be created
+    """
+    if not args.export:
+        return None
+    fmt = args.export_format or report_format(args.export)
+    out: TextIO = sys.stdout
+    if args.export != "-":
+        # Undecodable bytes in listed names are written back as they were
+        out = open(args.export, "w", encoding="utf-8", errors="surrogateescape", newline="")
+    return ReportWriter(out, fmt)
+
+
+def _close_export(export: Optional[ReportWriter]) -> None:
+    """Finish the --export report and close its file."""
+    if export is None:
+        return
+    try:
+        export.close()
+    finally:
+        if export.out is not sys.stdout:
+            export.out.close()
+
+
+def _concurrency(parser: argparse.ArgumentParser, args: argparse.Namespace) -> Concurrency:
+    """Build the per-volume rename concurrency from the command line."""
+    volumes = {}
+    for setting in args.volume_concurrency:
+        folder, _, count = setting.rpartition("=")
+        if not folder or not count.isdigit() or int(count) < 1:
+            parser.error(f"--volume-concurrency expects FOLDER=N, not '{setting}'")
+        volumes[folder] = int(count)
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    return Concurrency(args.concurrency, volumes)
+
+
+def _watch(folder: str, options: engine.NamingOptions, args: argparse.Namespace,
+           concurrency: Concurrency, cache: Optional[ScanCache]) -> int:
+    """Plan, and with ``--apply`` rename, files as they settle until interrupted."""
+    watcher = FolderWatcher(folder, args.settle)
+    folder = watcher.folder
+    headers = args.from_headers or args.sync_audio
+    if args.apply and not args.copy_to and any(
+            batch.folder == folder for batch in journal.interrupted_batches()):
+        watcher.close()
+        print("An interrupted batch in this folder needs --recover finish or --recover rollback first.",
+              file=sys.stderr)
+        return 3
+    names = os.listdir(folder)
+    try:
+        export = _open_export(args)
+    except OSError:
+        watcher.close()
+        raise
+    stats = RunStats(folder, "watch")
+    # Every file already present is reported by the first poll, so it is a source
+    builder = engine.PlanBuilder(folder, options, names,
+                                 [name for name in names if os.path.isfile(os.path.join(folder, name))],
+                                 stats)
+    mode = "inotify" if watcher.uses_inotify else "polling"
+    print(f"Watching {folder} ({mode}); press Ctrl-C to stop.", file=sys.stderr)
+    status = 0
+    try:
+        while True:
+            ready, _ = watcher.poll(1.0)
+            if not ready:
+                continue
+            metadata = None
+            if headers:
+                with stats.phase("headers", len(ready)):
+                    metadata = engine.read_metadata(folder, ready)
+            first = builder.add(ready, metadata)
+            plan = builder.plan.slice(first)
+            if export is not None:
+                export.write(builder.plan, first)
+                export.out.flush()
+            if not args.quiet and args.export != "-":
+                # Earlier entries moved aside for a file that arrived at their new name
+                for i in builder.retargeted:
+                    entry = builder.plan.entry(i)
+                    sys.stdout.write(f"{entry.original}\t{entry.new_name}\t{entry.status}\n")
+                for entry in plan:
+                    sys.stdout.write(f"{entry.original}\t{entry.new_name}\t{entry.status}\n")
+                sys.stdout.flush()
+            if not args.apply:
+                continue
+            # The new names are this app's own work, not new arrivals
+            watcher.ignore(plan.new_names)
+            if args.copy_to:
+                with stats.phase("copy", len(plan)):
+                    result = ingest.copy_plan(plan, args.copy_to)
+            else:
+                result = engine.execute_plan(plan, concurrency=concurrency, stats=stats)
+                if cache is not None:
+                    cache.record_renames(folder, result.renamed)
+            status = max(status, _report(result))
+    except KeyboardInterrupt:
+        print(f"Stopped watching; planned {len(builder.plan)} files.", file=sys.stderr)
+    finally:
+        watcher.close()
+        _close_export(export)
+    if args.apply:
+        _write_run_report(stats, args)
+    return status
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command-line tool.
+
+    Args:
+        argv: Arguments to parse, defaulting to ``sys.argv[1:]``
+
+    Returns:
+        The process exit status
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    concurrency = _concurrency(parser, args)
+
+    if args.recover:
+        status = 0
+        for result in engine.recover_interrupted(finish=args.recover == "finish"):
+            status = max(status, _report(result))
+        return status
+
+    if args.undo:
+        result = engine.undo_last_batch(concurrency=concurrency)
+        if result is None:
+            print("There is no rename batch to undo.", file=sys.stderr)
+            return 1
+        return _report(result)
+
+    store = TemplateStore()
+    if args.save_template:
+        if not (args.project and args.template):
+            parser.error("--save-template needs both --project and --template")
+        try:
+            store.save(args.project, args.template)
+        except TemplateError as e:
+            parser.error(f"invalid template: {e}")
+        print(f"Saved the template for project '{args.project}'.", file=sys.stderr)
+        if not args.folders:
+            return 0
+
+    if not args.folders:
+        parser.error("a folder is required")
+    if len(args.folders) > 1 and not args.recursive:
+        parser.error("scanning several folders needs --recursive")
+    if args.watch and (args.recursive or args.checksum):
+        parser.error("--watch watches a single folder and cannot be combined with --recursive or --checksum")
+    if args.copy_to and args.checksum:
+        parser.error("--checksum applies to in-place renames and cannot be combined with --copy-to")
+
+    template = args.template or (store.get(args.project) if args.project else DEFAULT_TEMPLATE)
+    try:
+        compile_template(template)
+    except TemplateError as e:
+        parser.error(f"invalid template: {e}")
+    options = engine.NamingOptions(args.camera_roll, args.clip_prefix, args.date,
+                                   use_metadata=args.from_headers, template=template,
+                                   group_sequences=not args.no_sequences, sync_audio=args.sync_audio)
+    headers = args.from_headers or args.sync_audio
+
+    cache = None
+    if headers and not args.no_cache:
+        try:
+            cache = ScanCache()
+        except Exception as e:
+            print(f"Scan cache unavailable, reading all headers: {e}", file=sys.stderr)
+
+    if args.watch:
+        try:
+            return _watch(args.folders[0], options, args, concurrency, cache)
+        except OSError as e:
+            print(f"Failed to watch folder: {e}", file=sys.stderr)
+            return 2
+
+    try:
+        stats = RunStats(scan_base(args.folders)[0] if args.recursive else args.folders[0])
+        with stats.phase("scan") as phase:
+            scandir = phase.call("scandir")
+            # The cache validates each file with one stat; changed files have their header read
+            stat = phase.call("stat") if headers and cache is not None else None
+            if args.recursive:
+                scan = scan_tree(args.folders, lambda listing: scandir.count())
+                if headers:
+                    load_metadata(scan, cache, stat)
+            else:
+                scan = scan_folder(args.folders[0], headers, cache, stat)
+                scandir.count()
+            phase.files = len(scan.files)
+            if headers:
+                phase.add("headers_read", scan.changed)
+    except (OSError, ValueError) as e:
+        print(f"Failed to load files: {e}", file=sys.stderr)
+        return 2
+
+    plan = engine.plan_renames(scan.folder, scan.files, options,
+                               existing=scan.names, metadata=scan.metadata, stats=stats)
+
+    if args.export:
+        try:
+            export = _open_export(args)
+            try:
+                export.write(plan)
+            finally:
+                _close_export(export)
+        except OSError as e:
+            print(f"Failed to export the plan: {e}", file=sys.stderr)
+            return 2
+        if args.export != "-":
+            print(f"Exported {export.count} entries to {args.export}", file=sys.stderr)
+    # The export takes standard output's place for '-'
+    if not args.quiet and args.export != "-":
+        out = sys.stdout
+        for entry in plan:
+            out.write(f"{entry.original}\t{entry.new_name}\t{entry.status}\n")
+    if args.sync_audio:
+        print(f"Matched {len(plan.matches)} sound takes to camera clips by timecode.", file=sys.stderr)
+    if plan.unparsed_count:
+        print(f"{plan.unparsed_count} files have no clip number a vendor parser recognises; "
+              "numbered from their names or order instead.", file=sys.stderr)
+
+    if not args.apply:
+        action = "copy" if args.copy_to else "rename"
+        print(f"Planned {len(plan)} renames (dry run, use --apply to {action}).", file=sys.stderr)
+        return 0
+
+    if args.copy_to:
+        with stats.phase("copy", len(plan)):
+            result = ingest.copy_plan(plan, args.copy_to)
+        status = _report(result)
+        _write_run_report(stats, args)
+        return status
+
+    # Never start a new batch on top of one that still needs recovery
+    if any(batch.folder == scan.folder for batch in journal.interrupted_batches()):
+        print("An interrupted batch in this folder needs --recover finish or --recover rollback first.",
+              file=sys.stderr)
+        return 3
+
+    if args.checksum:
+        result = verify.execute_verified(plan, args.checksum, concurrency=concurrency, stats=stats)
+    else:
+        result = engine.execute_plan(plan, concurrency=concurrency, stats=stats)
+    if result.manifest:
+        print(f"Checksum manifest written to {result.manifest}", file=sys.stderr)
+    if cache is not None:
+        cache.record_renames(scan.folder, result.renamed)
+    status = _report(result)
+    _write_run_report(stats, args)
+    return status
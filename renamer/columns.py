@@ -0,0 +1,207 @@
+"""Compact storage for the names of a million-entry plan.
+
+A Python string costs about 50 bytes before its first character, so a plan
+held as lists of names and per-entry objects needs a few hundred bytes per
+file. A ``NameColumn`` instead keeps every name as a pattern number and the
+part that varies, in one UTF-8 buffer: the frames of a sequence share their
+clip name and extension, which are stored once, so each frame costs its
+frame number plus eight bytes. Names added in bulk share the start and end
+they have in common in the same way, so a folder of clips numbered in order
+stores little more than the numbers. Names are decoded only when they are
+read.
+
+A ``NameSet`` answers whether a name was seen from one array of hashes,
+rather than holding every name as a string.
+"""
+import os
+from array import array
+from itertools import accumulate, chain, islice, repeat
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Lone surrogates (undecodable bytes from a listing) survive the round trip
+_ERRORS = "surrogatepass"
+
+# Characters names must share for ``extend`` to store them under a pattern
+_MIN_SHARED = 4
+
+# Names ``extend`` stores under one pattern
+_BLOCK = 1024
+
+# The most a 32-bit offset reaches; longer buffers switch to 64-bit offsets
+_MAX_OFFSET = 0xFFFFFFFF
+
+
+class NameColumn:
+    """A sequence of names, stored as shared patterns plus varying parts.
+
+    Names are appended; the rare name changed afterwards is kept apart by index.
+    """
+
+    def __init__(self):
+        # Pattern 0 is the empty prefix and suffix: the whole name is the varying part
+        self._patterns: List[Tuple[str, str]] = [("", "")]
+        self._pattern_ids: Dict[Tuple[str, str], int] = {("", ""): 0}
+        self._ids = array("I")       # pattern per name
+        self._ends = array("I")      # end of each name's varying part in _data, "Q" past 4 GB
+        self._data = bytearray()
+        self._replaced: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self._ids)
+            if index < 0:
+                raise IndexError("name index out of range")
+        if self._replaced and index in self._replaced:
+            return self._replaced[index]
+        end = self._ends[index]
+        start = self._ends[index - 1] if index else 0
+        prefix, suffix = self._patterns[self._ids[index]]
+        return prefix + self._data[start:end].decode("utf-8", _ERRORS) + suffix
+
+    def __iter__(self) -> Iterator[str]:
+        if self._replaced:
+            replaced = self._replaced
+            for index in range(len(self._ids)):
+                yield replaced[index] if index in replaced else self[index]
+            return
+        patterns, data = self._patterns, self._data
+        start = 0
+        for pattern, end in zip(self._ids, self._ends):
+            prefix, suffix = patterns[pattern]
+            yield prefix + data[start:end].decode("utf-8", _ERRORS) + suffix
+            start = end
+
+    def replace(self, index: int, name: str) -> None:
+        """Change the name at ``index``."""
+        if not 0 <= index < len(self._ids):
+            raise IndexError("name index out of range")
+        self._replaced[index] = name
+
+    def append(self, name: str) -> None:
+        """Add a name that shares nothing with the others."""
+        self._ids.append(0)
+        self._data += name.encode("utf-8", _ERRORS)
+        end = len(self._data)
+        if end > _MAX_OFFSET:
+            self._grow(end)
+        self._ends.append(end)
+
+    def extend(self, names: Sequence[str]) -> None:
+        """Add names, storing the start and end they all share once.
+
+        Names listed in order, such as a folder of numbered clips, share most
+        of their text, so each costs little more than its number.
+        """
+        # Blocks of neighbours share more than the whole list does
+        for offset in range(0, len(names), _BLOCK):
+            block = names[offset:offset + _BLOCK]
+            prefix = os.path.commonprefix(block)
+            room = min(map(len, block)) - len(prefix)
+            suffix = os.path.commonprefix([name[::-1] for name in block])[:room][::-1] if room else ""
+            if len(prefix) + len(suffix) < _MIN_SHARED:
+                prefix = suffix = ""
+            stop = -len(suffix) or None
+            self.extend_pattern(prefix, suffix, [name[len(prefix):stop] for name in block])
+
+    def _grow(self, end: int) -> None:
+        """Widen the offsets once the buffer outgrows 32 bits."""
+        if end > _MAX_OFFSET and self._ends.typecode == "I":
+            self._ends = array("Q", self._ends)
+
+    def extend_pattern(self, prefix: str, suffix: str, middles: Sequence[str]) -> None:
+        """Add ``prefix + middle + suffix`` for every middle, storing the prefix and suffix once.
+
+        Args:
+            prefix: The start the names share, e.g. a sequence's clip name and separator
+            suffix: The end the names share, e.g. the extension
+            middles: The varying parts, e.g. frame numbers
+        """
+        if not middles:
+            return
+        key = (prefix, suffix)
+        pattern = self._pattern_ids.get(key)
+        if pattern is None:
+            pattern = self._pattern_ids[key] = len(self._patterns)
+            self._patterns.append(key)
+        data = "".join(middles).encode("utf-8", _ERRORS)
+        self._grow(len(self._data) + len(data))
+        lengths = (map(len, middles) if data.isascii()
+                   else (len(middle.encode("utf-8", _ERRORS)) for middle in middles))
+        self._ends.extend(islice(accumulate(chain((len(self._data),), lengths)), 1, None))
+        self._ids.extend(repeat(pattern, len(middles)))
+        self._data += data
+
+
+class NameSet:
+    """A set of names that keeps only each name's 64-bit hash, in one open-addressed array.
+
+    It costs eight to sixteen bytes a name where a ``set`` of strings costs
+    around a hundred. Two different names with the same hash are taken for
+    one; for a million names the chance of that is about one in thirty
+    million, and the only effect is a name treated as taken.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._table = array("q", bytes(8 * 1024))   # 0 marks a free slot
+        self._mask = 1023
+        self._count = 0
+        self.update(names)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, name: str) -> bool:
+        key = hash(name) or 1
+        table, mask = self._table, self._mask
+        i = key & mask
+        while True:
+            slot = table[i]
+            if slot == key:
+                return True
+            if not slot:
+                return False
+            i = (i + 1) & mask
+
+    def add(self, name: str) -> bool:
+        """Add one name.
+
+        Returns:
+            Whether the name was new
+        """
+        key = hash(name) or 1
+        table, mask = self._table, self._mask
+        i = key & mask
+        while True:
+            slot = table[i]
+            if slot == key:
+                return False
+            if not slot:
+                break
+            i = (i + 1) & mask
+        table[i] = key
+        self._count += 1
+        # Kept at most half full, so probes stay short
+        if self._count * 2 > mask:
+            self._resize()
+        return True
+
+    def update(self, names: Iterable[str]) -> None:
+        """Add every name."""
+        add = self.add
+        for name in names:
+            add(name)
+
+    def _resize(self) -> None:
+        old = self._table
+        mask = self._mask * 2 + 1
+        table = array("q", bytes(8 * (mask + 1)))
+        for key in old:
+            if key:
+                i = key & mask
+                while table[i]:
+                    i = (i + 1) & mask
+                table[i] = key
+        self._table, self._mask = table, mask
@@ -0,0 +1,877 @@
+"""Headless rename planning and execution for footage folders.
+
+Nothing in this module imports Tk, so the same logic runs behind the
+FootageRenamer window, from the command line and from ingest scripts.
+"""
+import gc
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import chain, repeat
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+from . import journal
+from .columns import NameColumn, NameSet
+from .executor import Concurrency
+from .filenames import ParsedName
+from .metadata import MediaInfo, read_media_infos
+from .sequences import MIN_FRAMES, SEGMENT_EXTENSIONS, FrameSequence, group_sequences
+from .stats import RunStats, measure
+from .sync import match_takes
+from .template import DEFAULT_TEMPLATE, Template, compile_template
+
+_FRAME_DIGITS = "0123456789"
+
+# Files parsed and rendered together; their parses only exist for one chunk
+_PLAN_CHUNK = 65536
+
+# Plan entry states shown in the preview
+STATUS_OK = "ok"
+STATUS_UNCHANGED = "unchanged"    # the file already has its target name
+STATUS_SUFFIXED = "suffixed"      # the target exists on disk, a suffix was added
+STATUS_DUPLICATE = "duplicate"    # another file in the batch claimed the target first
+
+# Statuses by the one-byte code a plan stores per entry
+STATUSES = (STATUS_OK, STATUS_UNCHANGED, STATUS_SUFFIXED, STATUS_DUPLICATE)
+_STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+@dataclass
+class NamingOptions:
+    """Parameters for a naming template, the Netflix default convention unless changed."""
+
+    camera_roll: str = "J001"
+    clip_prefix: str = "Clip"
+    date: str = field(default_factory=lambda: datetime.now().strftime("%y%m%d"))
+    # Take shoot date and camera roll from each file's header when it has them
+    use_metadata: bool = False
+    template: str = DEFAULT_TEMPLATE
+    # Name each image sequence as one clip, keeping every frame's number
+    group_sequences: bool = True
+    # Give each sound take the clip name of the camera clip it overlaps in timecode
+    sync_audio: bool = False
+
+
+@dataclass
+class PlanEntry:
+    """A single planned rename inside the plan's folder."""
+
+    original: str
+    new_name: str
+    status: str = STATUS_OK
+    parsed: bool = True     # False when no vendor parser read the clip number from the name
+
+
+@dataclass
+class PlanRow:
+    """One preview row: a single file, or every frame of an image sequence."""
+
+    start: int        # the row's first entry in the plan
+    stop: int         # one past its last entry
+    original: str
+    new_name: str
+    status: str = STATUS_OK
+    parsed: bool = True
+
+    @property
+    def is_sequence(self) -> bool:
+        return self.stop - self.start > 1
+
+
+class RenamePlan:
+    """An ordered list of renames for one folder, stored column by column.
+
+    The original and new names are ``NameColumn``s, in which the frames of a
+    sequence share their clip name and extension, and each entry's status is
+    one byte, as is whether a vendor parser read its clip number from the
+    name; see ``renamer.columns``. Entries are read by index or as
+    ``PlanEntry`` records made on the fly, so a plan of a million frames
+    stays within a few tens of megabytes.
+
+    Preview rows group the frames of each sequence. While the plan has no
+    sequences every entry is its own row and no rows are stored.
+    """
+
+    def __init__(self, folder: str, entries: Iterable[PlanEntry] = ()):
+        self.folder = folder
+        self.originals = NameColumn()
+        self.new_names = NameColumn()
+        self.statuses = bytearray()     # index into STATUSES per entry
+        self.unparsed = bytearray()     # 1 per entry whose clip number is a fallback
+        self.matches: Dict[str, str] = {}   # camera clip by sound take, with sync_audio
+        # The first entry of each row, and the labels of sequence rows by row
+        self._row_starts = array("Q")
+        self._labels: Dict[int, Tuple[str, str]] = {}
+        for entry in entries:
+            self.append(entry.original, entry.new_name, entry.status, entry.parsed)
+
+    def __len__(self) -> int:
+        return len(self.statuses)
+
+    def __iter__(self) -> Iterator[PlanEntry]:
+        for original, new_name, status, unparsed in zip(self.originals, self.new_names, self.statuses,
+                                                        self.unparsed):
+            yield PlanEntry(original, new_name, STATUSES[status], not unparsed)
+
+    def entry(self, index: int) -> PlanEntry:
+        """Return one entry by index."""
+        return PlanEntry(self.originals[index], self.new_names[index], STATUSES[self.statuses[index]],
+                         not self.unparsed[index])
+
+    @property
+    def unparsed_count(self) -> int:
+        """The entries named with a fallback clip number because no parser recognised the name."""
+        return self.unparsed.count(1)
+
+    def append(self, original: str, new_name: str, status: str = STATUS_OK, parsed: bool = True) -> None:
+        """Add one rename to the end of the plan."""
+        self.originals.append(original)
+        self.new_names.append(new_name)
+        self.statuses.append(_STATUS_CODES[status])
+        self.unparsed.append(not parsed)
+
+    def _extend(self, originals: Sequence[str], new_names: Sequence[str], statuses: bytes,
+                unparsed: bytes) -> None:
+        """Add renames in bulk, one status code and unparsed flag per entry, storing the names compactly."""
+        self.originals.extend(originals)
+        self.new_names.extend(new_names)
+        self.statuses += statuses
+        self.unparsed += unparsed
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "RenamePlan":
+        """Copy the entries from ``start`` to ``stop`` into a plan of their own, without rows."""
+        stop = len(self) if stop is None else stop
+        return RenamePlan(self.folder, (self.entry(i) for i in range(start, stop)))
+
+    def moves(self) -> "PlanMoves":
+        """The (original, new name) pairs of every entry not already under its new name."""
+        unchanged = _STATUS_CODES[STATUS_UNCHANGED]
+        if unchanged not in self.statuses:
+            return PlanMoves(self)
+        return PlanMoves(self, array("Q", (i for i, status in enumerate(self.statuses) if status != unchanged)))
+
+    @property
+    def row_count(self) -> int:
+        return len(self._row_starts) if self._row_starts else len(self)
+
+    def row(self, index: int) -> PlanRow:
+        """Return a preview row by index."""
+        start, stop = self.row_bounds(index)
+        labels = self._labels.get(index) if self._row_starts else None
+        if labels is None:
+            return PlanRow(start, stop, self.originals[start], self.new_names[start],
+                           STATUSES[self.statuses[start]], not self.unparsed[start])
+        # A sequence row shows the first status other than "ok" (code 0) among its frames
+        statuses = self.statuses[start:stop]
+        first = len(statuses) - len(statuses.lstrip(b"\0"))
+        status = STATUSES[statuses[first]] if first < len(statuses) else STATUS_OK
+        return PlanRow(start, stop, labels[0], labels[1], status, not self.unparsed[start])
+
+    def row_bounds(self, index: int) -> Tuple[int, int]:
+        """Return the first entry of a row and the entry after its last."""
+        starts = self._row_starts
+        if not starts:
+            return index, index + 1
+        return starts[index], starts[index + 1] if index + 1 < len(starts) else len(self)
+
+    def row_index(self, entry: int) -> int:
+        """Return the row that shows an entry."""
+        starts = self._row_starts
+        return bisect_right(starts, entry) - 1 if starts else entry
+
+    def row_names(self, index: int) -> Tuple[str, str]:
+        """Return a row's original and new name as the preview shows them, without its status."""
+        labels = self._labels.get(index) if self._row_starts else None
+        if labels is not None:
+            return labels
+        start = self._row_starts[index] if self._row_starts else index
+        return self.originals[start], self.new_names[start]
+
+    def _add_frames(self, sequence: FrameSequence, prefix: str, ext: str, status: str,
+                    taken: List[Tuple[int, str, str]], parsed: bool = True) -> None:
+        """Append a sequence's frames, renamed to ``prefix + frame + ext`` unless taken.
+
+        Args:
+            sequence: The frames to add
+            prefix: The new clip name and separator
+            ext: The new extension
+            status: The status of every frame not taken
+            taken: (position, name, status) of the frames that got another name
+            parsed: Whether a vendor parser recognised the clip's name
+        """
+        frames = sequence.frames
+        original = sequence.clip + sequence.separator
+        code = _STATUS_CODES[status]
+        self.unparsed += bytes((not parsed,)) * len(frames)
+        position = 0
+        for stop, name, frame_status in chain(taken, [(len(frames), "", "")]):
+            middles = frames[position:stop]
+            self.originals.extend_pattern(original, sequence.ext, middles)
+            self.new_names.extend_pattern(prefix, ext, middles)
+            self.statuses += bytes((code,)) * len(middles)
+            if name:
+                self.originals.extend_pattern(original, sequence.ext, frames[stop:stop + 1])
+                self.new_names.append(name)
+                self.statuses.append(_STATUS_CODES[frame_status])
+            position = stop + 1
+
+    def _add_rows(self, first: int, spans: List[Tuple[int, int, str, str]]) -> None:
+        """Add rows for the entries from ``first`` on: one per sequence span, one per other entry.
+
+        Args:
+            first: The first entry without a row
+            spans: (start, stop, label, new label) of each sequence among the entries
+        """
+        starts = self._row_starts
+        if not spans and not starts:
+            return
+        if not starts:
+            # Earlier entries had no sequences and so no rows of their own yet
+            starts.extend(range(first))
+        position = first
+        for start, stop, label, new_label in spans:
+            starts.extend(range(position, start))
+            self._labels[len(starts)] = (label, new_label)
+            starts.append(start)
+            position = stop
+        starts.extend(range(position, len(self)))
+
+
+class PlanMoves:
+    """The (original, new name) pairs of a plan's entries, read from its columns when accessed.
+
+    Execution journals and renames through this view rather than a list, so
+    a million-entry plan is never copied into tuples of strings.
+    """
+
+    def __init__(self, plan: RenamePlan, indices: Optional[array] = None):
+        """Select entries to move.
+
+        Args:
+            plan: The plan to read
+            indices: The entries, in order; every entry when omitted
+        """
+        self._plan = plan
+        self._indices = indices
+
+    def __len__(self) -> int:
+        return len(self._plan) if self._indices is None else len(self._indices)
+
+    def __getitem__(self, index: int) -> Tuple[str, str]:
+        if self._indices is not None:
+            index = self._indices[index]
+        return self._plan.originals[index], self._plan.new_names[index]
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        if self._indices is None:
+            return zip(self._plan.originals, self._plan.new_names)
+        return map(self.__getitem__, range(len(self._indices)))
+
+
+@dataclass
+class RenameResult:
+    """Outcome of executing a rename plan."""
+
+    success_count: int = 0
+    errors: List[str] = field(default_factory=list)
+    cancelled: bool = False
+    not_renamed: List[str] = field(default_factory=list)
+    folder: str = ""
+    renamed: List[Tuple[str, str]] = field(default_factory=list)  # (old, new) pairs applied
+    manifest: str = ""    # checksum manifest written for the batch, if any
+    report: str = ""      # run report the batch's timings were appended to, if any
+
+    @property
+    def error_count(self) -> int:
+        return len(self.errors)
+
+    def summary(self) -> str:
+        """Return the one-line summary shown after a batch."""
+        verb = "cancelled" if self.cancelled else "completed"
+        message = (f"Renaming {verb}. {self.success_count} files successfully renamed, "
+                   f"{self.error_count} errors")
+        if self.not_renamed:
+            message += f", {len(self.not_renamed)} files not renamed"
+        return message + "."
+
+
+class _FrameRuns:
+    """Frame numbers kept as runs of consecutive numbers written with the same width."""
+
+    def __init__(self):
+        self._starts: List[Tuple[int, int]] = []    # (width, first number) of each run, sorted
+        self._lasts: List[int] = []
+
+    def __contains__(self, frame: str) -> bool:
+        width, number = len(frame), int(frame)
+        i = bisect_right(self._starts, (width, number)) - 1
+        return i >= 0 and self._starts[i][0] == width and self._lasts[i] >= number
+
+    def add(self, frames: Iterable[str]) -> None:
+        width = first = last = -1
+        for frame in frames:
+            number = int(frame)
+            if len(frame) == width and number == last + 1:
+                last = number
+                continue
+            if width >= 0:
+                self._insert(width, first, last)
+            width, first, last = len(frame), number, number
+        if width >= 0:
+            self._insert(width, first, last)
+
+    def _insert(self, width: int, first: int, last: int) -> None:
+        i = bisect_right(self._starts, (width, first))
+        self._starts.insert(i, (width, first))
+        self._lasts.insert(i, last)
+
+
+class NameIndex:
+    """The names taken in a folder, used to resolve collisions in memory.
+
+    The index is seeded from a single directory listing and records every
+    target claimed by the batch, so checking a candidate never touches the
+    disk. A per-name suffix counter makes repeated collisions on the same
+    target O(1) each instead of re-probing ``_1``, ``_2``, ... every time.
+    The frames of a sequence are claimed as runs of frame numbers under the
+    sequence's new name rather than one string each, and other claimed names
+    are kept as hashes in a ``NameSet``.
+    """
+
+    def __init__(self, existing: Iterable[str]):
+        self._on_disk: Set[str] = set(existing)
+        self._claimed = NameSet()
+        self._next_suffix: Dict[str, int] = {}
+        # Claimed frames by the (clip name and separator, extension) they share
+        self._frames: Dict[Tuple[str, str], _FrameRuns] = {}
+
+    def add_existing(self, names: Iterable[str]) -> None:
+        """Record names that appeared in the folder after the index was built."""
+        self._on_disk.update(names)
+
+    def __contains__(self, name: str) -> bool:
+        return (name in self._on_disk or name in self._claimed
+                or (bool(self._frames) and self._in_frames(name)))
+
+    def is_claimed(self, name: str) -> bool:
+        """Whether a name was reserved as the target of a planned rename."""
+        return name in self._claimed or (bool(self._frames) and self._in_frames(name))
+
+    def _in_frames(self, name: str) -> bool:
+        """Whether a name is a frame claimed as part of a sequence."""
+        stem, ext = os.path.splitext(name)
+        head = stem.rstrip(_FRAME_DIGITS)
+        if not ext or len(head) == len(stem):
+            return False
+        runs = self._frames.get((head, ext))
+        return runs is not None and stem[len(head):] in runs
+
+    def claim(self, original: str, new_name: str) -> Tuple[str, str]:
+        """Reserve a unique target name for a file.
+
+        Args:
+            original: The file's current name
+            new_name: The name the file should get
+
+        Returns:
+            The name actually reserved and the resulting plan status
+        """
+        if new_name == original:
+            self._claimed.add(new_name)
+            return new_name, STATUS_UNCHANGED
+        framed = bool(self._frames) and self._in_frames(new_name)
+        if framed or new_name in self._on_disk:
+            return self._suffixed(new_name, framed or new_name in self._claimed)
+        # One probe both checks and reserves the name
+        if self._claimed.add(new_name):
+            return new_name, STATUS_OK
+        return self._suffixed(new_name, True)
+
+    def claim_frames(self, prefix: str, ext: str, frames: List[str],
+                     unchanged: bool = False) -> List[Tuple[int, str, str]]:
+        """Reserve the names ``prefix + frame + ext`` for the frames of a sequence.
+
+        Args:
+            prefix: The new clip name and separator
+            ext: The new extension
+            frames: The frame numbers as written
+            unchanged: Whether the frames already carry these names
+
+        Returns:
+            (position, name, status) of each frame whose name was taken and
+            that reserved a suffixed name instead
+        """
+        runs = self._frames.get((prefix, ext))
+        taken: List[int] = []
+        if not unchanged:
+            on_disk = self._on_disk
+            # Sequences claim runs, so the names claimed one by one are often none
+            claimed = self._claimed if len(self._claimed) else ()
+            for position, frame in enumerate(frames):
+                name = prefix + frame + ext
+                if name in on_disk or name in claimed or (runs is not None and frame in runs):
+                    taken.append(position)
+        free = frames
+        if taken:
+            skip = set(taken)
+            free = [frame for position, frame in enumerate(frames) if position not in skip]
+        if ext:
+            if runs is None:
+                runs = self._frames[(prefix, ext)] = _FrameRuns()
+            runs.add(free)
+        else:
+            # Without an extension the frame number cannot be told from a name reliably
+            self._claimed.update(prefix + frame for frame in free)
+        return [(position, *self._suffixed(prefix + frames[position] + ext)) for position in taken]
+
+    def _suffixed(self, new_name: str, claimed: Optional[bool] = None) -> Tuple[str, str]:
+        """Reserve ``new_name`` with the first free ``_N`` suffix.
+
+        Args:
+            new_name: The name that is taken
+            claimed: Whether the batch itself took it, worked out when omitted
+        """
+        if claimed is None:
+            claimed = self.is_claimed(new_name)
+        name, ext = os.path.splitext(new_name)
+        unique_suffix = self._next_suffix.get(new_name, 1)
+        on_disk, frames = self._on_disk, self._frames
+        while True:
+            candidate = f"{name}_{unique_suffix}{ext}"
+            if (candidate not in on_disk and not (frames and self._in_frames(candidate))
+                    and self._claimed.add(candidate)):
+                break
+            unique_suffix += 1
+        self._next_suffix[new_name] = unique_suffix + 1
+        return candidate, STATUS_DUPLICATE if claimed else STATUS_SUFFIXED
+
+
+def generate_new_name(filename: str, index: int, options: NamingOptions,
+                      info: Optional[MediaInfo] = None, clip_source: Optional[str] = None) -> str:
+    """Generate a new filename from the options' naming template.
+
+    Naming a whole folder should go through ``plan_renames``, which renders
+    the template for every file in one pass.
+
+    Args:
+        filename: The original filename
+        index: The index of the file in the list (used if no numbers are found)
+        options: The naming parameters to apply
+        info: Header metadata for the file; its date and reel override the options
+        clip_source: The camera clip a sound take was matched to, whose clip name it shares
+
+    Returns:
+        The new filename, by default in the format [cameraRoll]_[clipName]_[date]
+    """
+    metadata = {filename: info} if info is not None else None
+    clip_sources = {filename: clip_source} if clip_source else None
+    return compile_template(options.template).render(
+        [filename], options.camera_roll, options.clip_prefix, options.date, metadata, start=index,
+        clip_sources=clip_sources)[0]
+
+
+def read_metadata(folder: str, files: List[str]) -> Dict[str, Optional[MediaInfo]]:
+    """Read header metadata for files in a folder, keyed by file name."""
+    infos = read_media_infos(os.path.join(folder, filename) for filename in files)
+    return {filename: infos[os.path.join(folder, filename)] for filename in files}
+
+
+def plan_renames(folder: str, files: List[str], options: NamingOptions,
+                 existing: Optional[Iterable[str]] = None,
+                 metadata: Optional[Mapping[str, Optional[MediaInfo]]] = None,
+                 stats: Optional[RunStats] = None) -> RenamePlan:
+    """Build the rename plan for a list of files.
+
+    With ``options.group_sequences``, the frames of each image sequence are
+    named together: the template is rendered once for the clip and every
+    frame keeps its frame number and padding, and the plan gets one row per
+    sequence.
+
+    Collisions are resolved here rather than during execution: every target
+    is checked against the names already in the folder and the names claimed
+    earlier in the batch, and gets a ``_N`` suffix when taken. Names of files
+    in the batch count as free, since execution moves every source out of the
+    way before any target is written.
+
+    Args:
+        folder: The folder containing the files
+        files: The file names to rename, in display order
+        options: The naming parameters to apply
+        existing: Names already present in the folder; listed once when omitted
+        metadata: Header metadata by file name; read when omitted and
+            ``options.use_metadata`` or ``options.sync_audio`` is set
+        stats: Optional run stats to record the planning phases in
+
+    Returns:
+        A plan with one entry per file
+    """
+    if metadata is None and (options.use_metadata or options.sync_audio):
+        with measure(stats, "headers", len(files)):
+            metadata = read_metadata(folder, files)
+    if existing is None:
+        try:
+            existing = os.listdir(folder)
+        except OSError:
+            existing = files
+    with _gc_paused():
+        builder = PlanBuilder(folder, options, existing, files, stats)
+        builder.add(files, metadata)
+    return builder.plan
+
+
+@contextmanager
+def _gc_paused():
+    """Suspend the cyclic garbage collector while a plan is built.
+
+    A plan for a million frames allocates millions of small objects without
+    reference cycles, and the collections they trigger otherwise cost more
+    than building the plan.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class PlanBuilder:
+    """Builds a plan in steps, keeping the collision state between them.
+
+    ``plan_renames`` adds a whole folder in one step. Watch mode adds files as
+    they arrive, so each step costs O(new files) rather than O(folder). A
+    file that arrives under a name an earlier entry was going to take keeps
+    it, and that entry gets a suffixed name instead.
+    """
+
+    def __init__(self, folder: str, options: NamingOptions, existing: Iterable[str],
+                 sources: Iterable[str] = (), stats: Optional[RunStats] = None):
+        """Start an empty plan.
+
+        Args:
+            folder: The folder containing the files
+            options: The naming parameters to apply
+            existing: Names already present in the folder
+            sources: Names in ``existing`` that the plan will rename, which count as free
+            stats: Optional run stats to record the "plan" and "collisions" phases in
+        """
+        self.plan = RenamePlan(folder)
+        self.options = options
+        self.stats = stats
+        self.index = NameIndex(())
+        self._template = compile_template(options.template)
+        self._clips = 0
+        # The new clip name and separator, and extension, of every sequence named so far
+        self._sequences: Dict[Tuple[str, str, str], Tuple[str, str]] = {}
+        # Sequences whose clip name no vendor parser recognised
+        self._unparsed: Set[Tuple[str, str, str]] = set()
+        # Sources not added yet; any other file added is an arrival and takes up its name
+        self._sources = set(sources)
+        # Earlier entries given a new name by the last step, because a file arrived at theirs
+        self.retargeted: List[int] = []
+        self.index.add_existing(name for name in existing if name not in self._sources)
+
+    def add(self, files: List[str],
+            metadata: Optional[Mapping[str, Optional[MediaInfo]]] = None) -> int:
+        """Name more files and append them to the plan.
+
+        Args:
+            files: The file names to rename, in display order
+            metadata: Header metadata by file name; it names the files when
+                ``options.use_metadata`` is set and pairs sound with picture
+                when ``options.sync_audio`` is
+
+        Returns:
+            The index of the first entry added
+        """
+        plan = self.plan
+        first = len(plan)
+        self.retargeted = []
+        self._arrive(files)
+        with measure(self.stats, "plan", len(files)):
+            items, targets, parsed = self._targets(files, metadata)
+
+        with measure(self.stats, "collisions", len(files)) as phase:
+            # Files that already carry their target name keep it, whatever their position
+            index = self.index
+            sequences = self._sequences
+            for item, target in zip(items, targets):
+                if isinstance(item, FrameSequence):
+                    target = sequences[_sequence_key(item)]
+                    if _unchanged(item, target):
+                        index.claim_frames(*target, item.frames, unchanged=True)
+                elif item == target:
+                    index.claim(item, target)
+
+            spans: List[Tuple[int, int, str, str]] = []
+            # Single files go into the plan in chunks, so their names are stored compactly
+            originals: List[str] = []
+            new_names: List[str] = []
+            codes = bytearray()
+            unparsed = bytearray()
+            for item, target, recognised in zip(items, targets, parsed or repeat(True)):
+                if isinstance(item, FrameSequence) or len(originals) == _PLAN_CHUNK:
+                    plan._extend(originals, new_names, codes, unparsed)
+                    originals, new_names, codes, unparsed = [], [], bytearray(), bytearray()
+                if isinstance(item, FrameSequence):
+                    target = prefix, ext = sequences[_sequence_key(item)]
+                    unchanged = _unchanged(item, target)
+                    taken = [] if unchanged else index.claim_frames(prefix, ext, item.frames)
+                    start = len(plan)
+                    plan._add_frames(item, prefix, ext, STATUS_UNCHANGED if unchanged else STATUS_OK, taken,
+                                     recognised)
+                    spans.append((start, len(plan), item.label(), item.label(prefix, "", ext)))
+                else:
+                    new_name, status = index.claim(item, target)
+                    originals.append(item)
+                    new_names.append(new_name)
+                    codes.append(_STATUS_CODES[status])
+                    unparsed.append(not recognised)
+            plan._extend(originals, new_names, codes, unparsed)
+            if phase is not None:
+                for code, count in Counter(plan.statuses[first:]).items():
+                    if STATUSES[code] != STATUS_OK:
+                        phase.add(STATUSES[code], count)
+
+        plan._add_rows(first, spans)
+        return first
+
+    def _arrive(self, files: List[str]) -> None:
+        """Register the names of files that were not sources as taken.
+
+        An entry already planned to take one of those names is moved to the
+        first free suffixed name, so renaming it cannot replace the newcomer.
+        """
+        sources = self._sources
+        if sources:
+            arrived = [name for name in files if name not in sources]
+            sources.difference_update(files)
+            if not sources:
+                # Drop the emptied table rather than keep it for the rest of the session
+                self._sources = set()
+        else:
+            arrived = files
+        if not arrived:
+            return
+        index = self.index
+        taken = {name for name in arrived if index.is_claimed(name)}
+        index.add_existing(arrived)
+        if not taken:
+            return
+        plan = self.plan
+        for i, name in enumerate(plan.new_names):
+            if name in taken and plan.statuses[i] != _STATUS_CODES[STATUS_UNCHANGED]:
+                new_name, _ = index._suffixed(name)
+                plan.new_names.replace(i, new_name)
+                plan.statuses[i] = _STATUS_CODES[STATUS_SUFFIXED]
+                self.retargeted.append(i)
+
+    def _targets(self, files: List[str], metadata: Optional[Mapping[str, Optional[MediaInfo]]]
+                 ) -> Tuple[List[Union[str, FrameSequence]], NameColumn, Optional[bytearray]]:
+        """Render the template for new files, once for each sequence.
+
+        Names are parsed and rendered a chunk at a time into a ``NameColumn``,
+        so neither the parses nor the new names of a million files exist as
+        objects at once.
+
+        Returns:
+            The files with the frames of each sequence grouped; the target of
+            each file, with an empty name for a sequence, whose new clip name
+            and separator and extension are kept in ``_sequences``; and
+            whether a vendor parser recognised each one's name, or None when
+            the template has no clip name
+        """
+        options = self.options
+        template = self._template
+        pairs = None
+        if options.sync_audio and metadata:
+            pairs = match_takes(metadata)
+            self.plan.matches.update(pairs)
+        if not options.use_metadata:
+            metadata = None
+        # Counters carry on from the files added before
+        start = self._clips + 1
+
+        items = self._group(files) if options.group_sequences else files
+        sequences = self._sequences
+        targets = NameColumn()
+        recognised = bytearray() if template.uses_clip_name else None
+        for offset in range(0, len(items), _PLAN_CHUNK):
+            chunk = items[offset:offset + _PLAN_CHUNK]
+            fresh = clips = chunk
+            clip_metadata = metadata
+            if any(isinstance(item, FrameSequence) for item in chunk):
+                # Frames of a sequence named by an earlier step carry on under its name
+                fresh = [item for item in chunk
+                         if not (isinstance(item, FrameSequence) and _sequence_key(item) in sequences)]
+                # The template sees each sequence as one file named after the clip
+                clips = [item.clip_file if isinstance(item, FrameSequence) else item for item in fresh]
+                if metadata:
+                    # A sequence takes the header of its first frame
+                    clip_metadata = {
+                        clip: metadata.get(item.file(item.frames[0]) if isinstance(item, FrameSequence) else item)
+                        for item, clip in zip(fresh, clips)}
+            parsed = template.parse(clips, pairs)
+            names = template.render(clips, options.camera_roll, options.clip_prefix, options.date,
+                                    clip_metadata, start, pairs, parsed)
+            found = _recognised(template, parsed)
+            start += len(clips)
+            del parsed
+            if fresh is chunk:
+                targets.extend(names)
+                if recognised is not None:
+                    recognised.extend(found)
+                continue
+
+            new_names, new_found = iter(names), iter(found or ())
+            chunk_targets: List[str] = []
+            for item in chunk:
+                if isinstance(item, FrameSequence):
+                    key = _sequence_key(item)
+                    if key not in sequences:
+                        stem, ext = os.path.splitext(next(new_names))
+                        sequences[key] = (stem + (item.separator or "_"), ext)
+                        if found is not None and not next(new_found):
+                            self._unparsed.add(key)
+                    chunk_targets.append("")
+                    # Sequences continued from an earlier step were recognised or not back then
+                    if recognised is not None:
+                        recognised.append(key not in self._unparsed)
+                else:
+                    chunk_targets.append(next(new_names))
+                    if recognised is not None:
+                        recognised.append(next(new_found))
+            targets.extend(chunk_targets)
+        self._clips = start - 1
+        return items, targets, recognised
+
+    def _group(self, files: List[str]) -> List[Union[str, FrameSequence]]:
+        """Group sequences, letting even one frame continue a sequence named before."""
+        items: List[Union[str, FrameSequence]] = []
+        for item in group_sequences(files, min_frames=1):
+            if (isinstance(item, FrameSequence) and len(item) < MIN_FRAMES
+                    and item.ext.lower() not in SEGMENT_EXTENSIONS
+                    and _sequence_key(item) not in self._sequences):
+                items.extend(item.files)
+            else:
+                items.append(item)
+        return items
+
+
+def _sequence_key(sequence: FrameSequence) -> Tuple[str, str, str]:
+    return sequence.clip, sequence.separator, sequence.ext
+
+
+def _recognised(template: Template, parsed: Optional[List[Optional[ParsedName]]]) -> Optional[List[bool]]:
+    """Whether each name gave the template its clip number, or None when it needs none."""
+    if parsed is None or not template.uses_clip_name:
+        return None
+    return [name is not None and bool(name.number) for name in parsed]
+
+
+def _unchanged(sequence: FrameSequence, target: Tuple[str, str]) -> bool:
+    """Whether a sequence's frames already carry the names ``prefix + frame + ext``."""
+    prefix, ext = target
+    return sequence.clip + sequence.separator == prefix and sequence.ext == ext
+
+
+def _result_from_outcome(folder: str, moves: Sequence[journal.Move], outcome: journal.BatchOutcome,
+                         unchanged: int = 0) -> RenameResult:
+    """Translate a journaled batch outcome into the counts shown to the user."""
+    return RenameResult(
+        success_count=unchanged + len(outcome.renamed),
+        errors=outcome.errors,
+        cancelled=outcome.cancelled,
+        not_renamed=[moves[i][0] for i in outcome.not_renamed],
+        folder=folder,
+        renamed=[moves[i] for i in outcome.renamed])
+
+
+def execute_plan(plan: RenamePlan,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 cancel: Optional[threading.Event] = None,
+                 journal_dir: Optional[str] = None,
+                 concurrency: Optional[Concurrency] = None,
+                 stats: Optional[RunStats] = None,
+                 hold: Collection[str] = ()) -> RenameResult:
+    """Apply a rename plan on disk.
+
+    The batch is journaled and run in two phases (see ``renamer.journal``), so
+    swaps and cycles within the plan are safe and an interrupted batch can be
+    finished or rolled back later. Safe to run on a worker thread: it touches
+    nothing but the file system and the callbacks it is given.
+
+    Args:
+        plan: The plan to execute
+        progress: Optional callback receiving (files done, total files)
+        cancel: Optional event; once set, the batch stops after the current file
+        journal_dir: Where to keep the journal, defaulting to the state folder
+        concurrency: Renames in flight per volume; one for local disks and
+            more for network shares when omitted
+        stats: Optional run stats to record the batch's phases in
+        hold: Original names of files to leave as they are; a move into one
+            of those names is undone too. Held files are not counted in the
+            result, so the caller reports them
+
+    Returns:
+        The counts and error messages for the batch
+    """
+    moves = plan.moves()
+    unchanged = len(plan) - len(moves)
+    held: List[int] = []
+    if hold:
+        held = [i for i, (original, _) in enumerate(moves) if original in hold]
+        unchanged -= sum(1 for original in plan.originals if original in hold) - len(held)
+    if not moves:
+        return RenameResult(success_count=unchanged, folder=plan.folder)
+
+    outcome = journal.run_batch(plan.folder, moves, progress, cancel, journal_dir,
+                                concurrency=concurrency, stats=stats, hold=held)
+    return _result_from_outcome(plan.folder, moves, outcome, unchanged)
+
+
+def undo_last_batch(progress: Optional[Callable[[int, int], None]] = None,
+                    cancel: Optional[threading.Event] = None,
+                    journal_dir: Optional[str] = None,
+                    concurrency: Optional[Concurrency] = None) -> Optional[RenameResult]:
+    """Restore the original names of the most recent batch.
+
+    Args:
+        progress: Optional callback receiving (files done, total files)
+        cancel: Optional event; once set, the undo stops after the current file
+        journal_dir: The journal folder, defaulting to the state folder
+        concurrency: Renames in flight per volume, detected when omitted
+
+    Returns:
+        The result of the undo, or None if there is no batch to undo
+    """
+    undone = journal.undo_last(progress, cancel, journal_dir, concurrency)
+    if undone is None:
+        return None
+    batch, outcome = undone
+    moves = [(batch.moves[i][1], batch.moves[i][0]) for i in batch.undoable]
+    return _result_from_outcome(batch.folder, moves, outcome)
+
+
+def recover_interrupted(finish: bool = True,
+                        journal_dir: Optional[str] = None) -> List[RenameResult]:
+    """Finish or roll back every batch that was interrupted by a crash.
+
+    Args:
+        finish: Complete the batches if True, otherwise restore the original names
+        journal_dir: The journal folder, defaulting to the state folder
+
+    Returns:
+        One result per recovered batch
+    """
+    results = []
+    for batch in journal.interrupted_batches(journal_dir):
+        outcome = batch.recover(finish)
+        results.append(_result_from_outcome(batch.folder, batch.moves, outcome))
+    return results
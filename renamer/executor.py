@@ -0,0 +1,239 @@
+"""Concurrent renames, grouped by the volume they happen on.
+
+A rename on a local disk takes microseconds, but on an SMB or NFS share each
+one is a network round trip of several milliseconds. Renames within a phase
+of a journaled batch are independent of each other (every temporary name and
+every target is unique), so they can be issued concurrently: each volume gets
+its own pool of workers, sized for that volume, and all volumes run at once.
+The phase boundary itself stays a barrier; see ``renamer.journal``.
+"""
+import ctypes
+import errno
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .stats import CallStats
+
+# Concurrent renames per volume when nothing is configured
+LOCAL_CONCURRENCY = 1
+NETWORK_CONCURRENCY = 16
+
+# Renames in flight per worker; enough to keep workers busy without queueing the whole batch
+_QUEUE_DEPTH = 4
+
+_NETWORK_FILESYSTEMS = frozenset({
+    "9p", "afpfs", "cifs", "davfs", "fuse.sshfs", "ncpfs", "nfs", "nfs4", "smb3", "smbfs", "webdav",
+})
+
+
+# renameat2 flag: fail with EEXIST rather than replace the target
+_RENAME_NOREPLACE = 1
+_AT_FDCWD = -100
+
+
+def _load_renameat2() -> Optional[Callable[..., int]]:
+    """Return libc's renameat2 on Linux (glibc 2.28 and later), or None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return None
+    renameat2.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint)
+    renameat2.restype = ctypes.c_int
+    return renameat2
+
+
+_renameat2 = _load_renameat2()
+
+
+def rename_noreplace(src: str, dst: str) -> None:
+    """Rename a file, failing if anything already exists at the target.
+
+    ``os.rename`` silently replaces an existing target on POSIX. This uses
+    ``renameat2(RENAME_NOREPLACE)`` where the kernel and file system support
+    it, otherwise a hard link plus unlink, and on file systems without hard
+    links (FAT, exFAT, some shares) a check right before a plain rename.
+
+    Raises:
+        FileExistsError: If the target exists
+        OSError: If the rename fails otherwise
+    """
+    if _renameat2 is not None:
+        if _renameat2(_AT_FDCWD, os.fsencode(src), _AT_FDCWD, os.fsencode(dst), _RENAME_NOREPLACE) == 0:
+            return
+        code = ctypes.get_errno()
+        if code not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+            raise OSError(code, os.strerror(code), src, None, dst)
+    if os.path.isdir(src):
+        # Directories cannot be hard linked
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), src, None, dst)
+        os.rename(src, dst)
+        return
+    try:
+        os.link(src, dst, follow_symlinks=False)
+    except FileExistsError:
+        raise
+    except (OSError, NotImplementedError):
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), src, None, dst)
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+
+def _mounts() -> List[Tuple[str, str]]:
+    """Return (mount point, filesystem type) pairs, longest mount point first."""
+    mounts = []
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/mounts", encoding="utf-8") as fh:
+                for line in fh:
+                    fields = line.split()
+                    if len(fields) >= 3:
+                        # Spaces in mount points are written as \040
+                        mounts.append((fields[1].replace("\\040", " "), fields[2]))
+        except OSError:
+            pass
+    mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+    return mounts
+
+
+def _within(path: str, folder: str) -> bool:
+    return path == folder or path.startswith(os.path.join(folder, ""))
+
+
+def is_network_path(path: str, mounts: Optional[List[Tuple[str, str]]] = None) -> bool:
+    """Tell whether a path is on a network share.
+
+    Args:
+        path: Any path on the volume
+        mounts: The mount table, read when omitted
+
+    Returns:
+        True for UNC paths and, on Linux, for network filesystem mounts
+    """
+    path = os.path.abspath(path)
+    if path.startswith("\\\\"):
+        return True
+    for mount_point, fstype in mounts if mounts is not None else _mounts():
+        if _within(path, mount_point):
+            return fstype in _NETWORK_FILESYSTEMS
+    return False
+
+
+@dataclass
+class Concurrency:
+    """How many renames to run at once on each volume."""
+
+    default: Optional[int] = None       # for every volume; detected per volume when None
+    volumes: Dict[str, int] = field(default_factory=dict)  # by folder; the deepest match wins
+
+    def for_path(self, path: str, mounts: Optional[List[Tuple[str, str]]] = None) -> int:
+        """Return the concurrency for renames in a folder."""
+        path = os.path.abspath(path)
+        matches = [folder for folder in self.volumes if _within(path, os.path.abspath(folder))]
+        if matches:
+            return max(1, self.volumes[max(matches, key=len)])
+        if self.default is not None:
+            return max(1, self.default)
+        return NETWORK_CONCURRENCY if is_network_path(path, mounts) else LOCAL_CONCURRENCY
+
+
+def rename_all(moves: Sequence[Tuple[str, str]], concurrency: Optional[Concurrency] = None,
+               cancel: Optional[threading.Event] = None,
+               calls: Optional[CallStats] = None,
+               replace: bool = True) -> Iterator[Tuple[int, Optional[OSError]]]:
+    """Run independent renames, concurrently within and across volumes.
+
+    The caller must ensure no rename depends on another one in the same call.
+    Results are yielded on the calling thread, so the caller's bookkeeping
+    needs no locking.
+
+    Args:
+        moves: (source path, target path) pairs
+        concurrency: Workers per volume, detected per volume when omitted
+        cancel: Optional event; once set, renames not yet started are skipped
+        calls: Optional stats that get every rename's latency and error
+        replace: Whether a rename may replace an existing target; when False
+            a taken target fails with FileExistsError (see ``rename_noreplace``)
+
+    Yields:
+        (index into moves, the error or None) for every rename attempted
+    """
+    concurrency = concurrency or Concurrency()
+    mounts = _mounts()
+    rename = os.rename if replace else rename_noreplace
+
+    # Group by device, looked up once per directory
+    devices: Dict[str, Tuple[int, int]] = {}
+    groups: Dict[int, List[int]] = {}
+    workers: Dict[int, int] = {}
+    for i, (src, _) in enumerate(moves):
+        directory = os.path.dirname(src)
+        device = devices.get(directory)
+        if device is None:
+            try:
+                st_dev = os.stat(directory or os.curdir).st_dev
+            except OSError:
+                st_dev = -1
+            device = devices[directory] = (
+                st_dev, concurrency.for_path(directory or os.curdir, mounts))
+        groups.setdefault(device[0], []).append(i)
+        workers[device[0]] = max(workers.get(device[0], 1), device[1])
+
+    def attempt(i: int) -> Tuple[Optional[OSError], int]:
+        # Timed on the worker; the stats themselves are only touched on the calling thread
+        start = time.perf_counter_ns()
+        try:
+            rename(*moves[i])
+        except OSError as e:
+            return e, time.perf_counter_ns() - start
+        return None, time.perf_counter_ns() - start
+
+    # One worker in total: rename inline, as fast as a plain loop
+    if len(groups) <= 1 and max(workers.values(), default=1) == 1:
+        for i in range(len(moves)):
+            if cancel is not None and cancel.is_set():
+                return
+            error, ns = attempt(i)
+            if calls is not None:
+                calls.record(ns, error)
+            yield i, error
+        return
+
+    pools = {device: ThreadPoolExecutor(max_workers=workers[device], thread_name_prefix="rename")
+             for device in groups}
+    queues = {device: iter(indices) for device, indices in groups.items()}
+    pending = {}
+
+    def submit(device: int) -> None:
+        # Feed each pool a few renames at a time so cancelling takes effect promptly
+        if cancel is not None and cancel.is_set():
+            return
+        i = next(queues[device], None)
+        if i is not None:
+            pending[pools[device].submit(attempt, i)] = (device, i)
+
+    try:
+        for device in groups:
+            for _ in range(workers[device] * _QUEUE_DEPTH):
+                submit(device)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                device, i = pending.pop(future)
+                submit(device)
+                error, ns = future.result()
+                if calls is not None:
+                    calls.record(ns, error)
+                yield i, error
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
@@ -0,0 +1,215 @@
+"""Dry-run reports of a rename plan, and indexes for finding its problem rows.
+
+A report lists every entry of a plan with its flags: ``unchanged`` (already
+under its new name), ``suffixed`` (the target exists on disk), ``duplicate``
+(another file in the batch claimed the target first) and ``unparsed`` (no
+vendor parser read the clip number from the name). ``ReportWriter`` streams
+entries to CSV or JSON as they are read from the plan's columns, so a report
+of a million frames never exists in memory as a whole.
+
+``PlanIndex`` finds the rows the preview filters on: rows with a conflict,
+rows with an unparsed name, and rows whose original or new name starts with
+a prefix. Flag lists are extended as a watched plan grows, and the name
+orders are sorted once, so a filter costs a lookup rather than a pass over
+every row.
+"""
+import csv
+import json
+from array import array
+from itertools import islice
+from typing import Callable, List, Optional, Sequence, TextIO, Tuple
+
+from .engine import STATUS_DUPLICATE, STATUS_OK, STATUS_SUFFIXED, STATUSES, RenamePlan
+
+FLAG_UNPARSED = "unparsed"
+
+REPORT_FORMATS = ("csv", "json")
+
+# Report columns, in order
+FIELDS = ("original", "new_name", "flags")
+
+# Translates status codes to 1 for conflicts and 0 otherwise
+_CONFLICTS = bytes(int(status in (STATUS_SUFFIXED, STATUS_DUPLICATE)) for status in STATUSES).ljust(256, b"\0")
+
+
+def entry_flags(status: str, parsed: bool) -> List[str]:
+    """Return the report flags of an entry with the given status."""
+    flags = [] if status == STATUS_OK else [status]
+    if not parsed:
+        flags.append(FLAG_UNPARSED)
+    return flags
+
+
+def report_format(path: str) -> str:
+    """Pick the report format from a file name: JSON for ``.json``, otherwise CSV."""
+    return "json" if path.lower().endswith(".json") else "csv"
+
+
+class ReportWriter:
+    """Writes plan entries to a CSV or JSON report as they are planned."""
+
+    def __init__(self, out: TextIO, fmt: str = "csv"):
+        """Start a report.
+
+        Args:
+            out: The text stream to write to; CSV expects it opened with ``newline=""``
+            fmt: One of REPORT_FORMATS
+
+        Raises:
+            ValueError: If the format is unknown
+        """
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format '{fmt}'")
+        self.out = out
+        self.fmt = fmt
+        self.count = 0
+        # Flags for each status code, unparsed or not, worked out once
+        self._flags = [[entry_flags(status, parsed) for status in STATUSES] for parsed in (True, False)]
+        if fmt == "csv":
+            self._csv = csv.writer(out)
+            self._csv.writerow(FIELDS)
+        else:
+            # A JSON array opened here and closed by close, one entry per line
+            out.write("[")
+
+    def write(self, plan: RenamePlan, start: int = 0) -> int:
+        """Append the plan's entries from ``start`` on.
+
+        Returns:
+            The number of entries written
+        """
+        flags = self._flags
+        entries = zip(islice(plan.originals, start, None), islice(plan.new_names, start, None),
+                      islice(plan.statuses, start, None), islice(plan.unparsed, start, None))
+        before = self.count
+        if self.fmt == "csv":
+            write_row = self._csv.writerow
+            for original, new_name, status, unparsed in entries:
+                write_row((original, new_name, ";".join(flags[unparsed][status])))
+                self.count += 1
+        else:
+            write, dumps = self.out.write, json.dumps
+            flags = [[dumps(entry) for entry in by_status] for by_status in flags]
+            for original, new_name, status, unparsed in entries:
+                write(f'{"," if self.count else ""}\n'
+                      f'{{"original": {dumps(original)}, "new_name": {dumps(new_name)}, '
+                      f'"flags": {flags[unparsed][status]}}}')
+                self.count += 1
+        return self.count - before
+
+    def close(self) -> None:
+        """Finish the report; the stream itself is left open."""
+        if self.fmt == "json":
+            self.out.write("\n]\n" if self.count else "]\n")
+        self.out.flush()
+
+
+def write_report(plan: RenamePlan, out: TextIO, fmt: str = "csv") -> int:
+    """Stream a whole plan to a report; see ``ReportWriter``.
+
+    Returns:
+        The number of entries written
+    """
+    writer = ReportWriter(out, fmt)
+    count = writer.write(plan)
+    writer.close()
+    return count
+
+
+def export_plan(plan: RenamePlan, path: str, fmt: Optional[str] = None) -> int:
+    """Write a plan's report to a file.
+
+    Args:
+        plan: The plan to report
+        path: The file to write
+        fmt: One of REPORT_FORMATS, by default chosen from the file name
+
+    Returns:
+        The number of entries written
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    # Undecodable bytes in listed names are written back as they were
+    with open(path, "w", encoding="utf-8", errors="surrogateescape", newline="") as out:
+        return write_report(plan, out, fmt or report_format(path))
+
+
+def _bisect(order: Sequence[int], value: str, key: Callable[[int], str], lo: int = 0) -> int:
+    """Return the first position in ``order`` whose key is not below ``value``."""
+    hi = len(order)
+    while lo < hi:
+        middle = (lo + hi) // 2
+        if key(order[middle]) < value:
+            lo = middle + 1
+        else:
+            hi = middle
+    return lo
+
+
+class PlanIndex:
+    """Rows of a plan by flag and by name prefix, for filtering the preview."""
+
+    def __init__(self, plan: RenamePlan):
+        self.plan = plan
+        self._conflicts = array("Q")
+        self._unparsed = array("Q")
+        self._indexed = 0       # rows covered by the flag lists
+        # Rows sorted by case-folded original and new name, built on the first search
+        self._by_name: Optional[Tuple[array, array]] = None
+        self._sorted_rows = 0
+
+    def conflicts(self) -> Sequence[int]:
+        """The rows with an entry that was suffixed or clashed with another file in the batch."""
+        self._update()
+        return self._conflicts
+
+    def unparsed(self) -> Sequence[int]:
+        """The rows whose clip number no vendor parser read from the name."""
+        self._update()
+        return self._unparsed
+
+    def search(self, prefix: str) -> Sequence[int]:
+        """The rows whose original or new name starts with ``prefix``, ignoring case, in plan order."""
+        plan = self.plan
+        if not prefix:
+            return range(plan.row_count)
+        if self._by_name is None or self._sorted_rows != plan.row_count:
+            self._sort()
+        prefix = prefix.casefold()
+        found = set()
+        for column, order in enumerate(self._by_name):
+            def key(row: int) -> str:
+                return plan.row_names(row)[column].casefold()
+
+            first = _bisect(order, prefix, key)
+            # Every name starting with the prefix sorts before the prefix plus the highest character
+            last = _bisect(order, prefix + "\U0010ffff", key, first)
+            found.update(order[first:last])
+        return array("Q", sorted(found))
+
+    def _update(self) -> None:
+        """Add the rows planned since the last call to the flag lists."""
+        plan = self.plan
+        rows = plan.row_count
+        if self._indexed >= rows:
+            return
+        start = plan.row_bounds(self._indexed)[0]
+        self._indexed = rows
+        # Each search runs in C and skips to the end of the row it lands in
+        for flags, rows_out in ((plan.statuses[start:].translate(_CONFLICTS), self._conflicts),
+                                (plan.unparsed[start:], self._unparsed)):
+            position = flags.find(1)
+            while position >= 0:
+                row = plan.row_index(start + position)
+                rows_out.append(row)
+                position = flags.find(1, plan.row_bounds(row)[1] - start)
+
+    def _sort(self) -> None:
+        plan = self.plan
+        rows = range(plan.row_count)
+        # Kept as arrays: a list of a million row numbers costs four times as much
+        self._by_name = tuple(
+            array("Q", sorted(rows, key=lambda row: plan.row_names(row)[column].casefold()))
+            for column in (0, 1))
+        self._sorted_rows = plan.row_count
@@ -0,0 +1,148 @@
+"""Reading roll, clip, take and date out of camera and recorder file names.
+
+Every vendor numbers its clips differently: ARRI writes ``A001C003_200101_R1AB``,
+RED ``A001_C002_0101XY``, Blackmagic ``A001_08211536_C001`` and Sound Devices
+``T01``. A ``NameParser`` describes one scheme as a regular expression with
+named groups for the fields it carries. The registered parsers are compiled
+into one alternation, each wrapped in a group of its own, so a name is
+classified by a single match; ``lastgroup`` tells which parser matched.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# The fields a parser may capture
+FIELDS = ("roll", "clip", "take", "date")
+
+_GROUP = re.compile(r'\(\?P<([A-Za-z_]\w*)>')
+
+
+@dataclass(frozen=True)
+class NameParser:
+    """How one vendor names its files."""
+
+    name: str
+    pattern: str    # matched against the whole name without its extension, ignoring case;
+                    # named groups capture any of FIELDS, the date as YYMMDD
+
+
+@dataclass
+class ParsedName:
+    """The fields found in one file name; any of them may be missing."""
+
+    vendor: str
+    roll: Optional[str] = None
+    clip: Optional[str] = None      # the clip number as written, e.g. "003"
+    take: Optional[str] = None
+    date: Optional[str] = None      # YYMMDD
+
+    @property
+    def number(self) -> Optional[str]:
+        """The number that names the clip: its clip number, or the take for sound."""
+        return self.clip or self.take
+
+
+NAME_PARSERS: Tuple[NameParser, ...] = (
+    # A001C003_200101_R1AB, or A001C003 as on scans and VFX pulls
+    NameParser("ARRI", r'(?P<roll>[A-Z]\d{3})C(?P<clip>\d{3})(?:_(?P<date>\d{6})_[A-Z0-9]{4})?'),
+    # A001C003_200101AB_CANON
+    NameParser("Canon", r'(?P<roll>[A-Z]\d{3})C(?P<clip>\d{3})_(?P<date>\d{6})[A-Z0-9]{2}_CANON'),
+    # VENICE: A001C003_200101AB
+    NameParser("Sony VENICE", r'(?P<roll>[A-Z]\d{3})C(?P<clip>\d{3})_(?P<date>\d{6})[A-Z0-9]{2}'),
+    # A001_C002_0101XY, with _001, _002, ... per R3D segment: month and day, but no year
+    NameParser("RED", r'(?P<roll>[A-Z]\d{3})_C(?P<clip>\d{3})_\d{4}[A-Z0-9]{2}(?:_\d{3})?'),
+    # A001_08211536_C001: month, day, hour and minute
+    NameParser("Blackmagic", r'(?P<roll>[A-Z]\d{3})_\d{8}_C(?P<clip>\d{3})'),
+    # XDCAM and XAVC camcorders: C0001
+    NameParser("Sony", r'C(?P<clip>\d{4})'),
+    # T01, 200101_T01, and polyphonic tracks such as T01_1 or T01_ST03
+    NameParser("Sound Devices", r'(?:(?P<date>\d{6})_)?T(?P<take>\d{2,4})(?:_[A-Z0-9]+)?'),
+    # This app's default output, so renamed files are read back: A001_Clip003_200101
+    NameParser("Netflix", r'(?P<roll>[A-Z]\d{3})_[A-Z]*(?P<clip>\d{3,})_(?P<date>\d{6})'),
+)
+
+
+class NameMatcher:
+    """Parsers compiled into one pattern that classifies a name in a single match."""
+
+    def __init__(self, parsers: Sequence[NameParser] = NAME_PARSERS):
+        """Compile the parsers; earlier parsers win when several match.
+
+        Raises:
+            ValueError: If a parser captures something other than FIELDS
+        """
+        self.parsers = tuple(parsers)
+        alternatives = []
+        # The vendor and the groups of FIELDS of each parser by the group that wraps it
+        self._fields: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+        for i, parser in enumerate(self.parsers):
+            fields: List[str] = []
+
+            def rename(match: "re.Match[str]") -> str:
+                field = match.group(1)
+                if field not in FIELDS:
+                    raise ValueError(f"Parser '{parser.name}' captures unknown field '{field}'")
+                fields.append(field)
+                return f"(?P<p{i}_{field}>"
+
+            pattern = _GROUP.sub(rename, parser.pattern)
+            # Fields the parser lacks get a group that never takes part, so every
+            # match yields all of FIELDS in order
+            missing = "".join(f"(?:(?!)(?P<p{i}_{field}>))?" for field in FIELDS if field not in fields)
+            alternatives.append(f"(?P<p{i}>{pattern}{missing})")
+            self._fields[f"p{i}"] = (parser.name, tuple(f"p{i}_{field}" for field in FIELDS))
+        # The folder and extension are skipped by the same match rather than split off first
+        separators = re.escape(os.sep + (os.altsep or ""))
+        pattern = f"(?:.*[{separators}])?(?:{'|'.join(alternatives) or '(?!)'})(?:\\.[^.{separators}]*)?"
+        self._fullmatch = re.compile(pattern, re.IGNORECASE | re.DOTALL).fullmatch
+
+    def parse(self, name: str) -> Optional[ParsedName]:
+        """Read the fields out of a file name.
+
+        Args:
+            name: A file name, with or without a subfolder and extension
+
+        Returns:
+            The fields, or None if no parser recognises the name
+        """
+        match = self._fullmatch(name)
+        if match is None:
+            return None
+        vendor, groups = self._fields[match.lastgroup]
+        return ParsedName(vendor, *match.group(*groups))
+
+    def parse_all(self, names: Iterable[str]) -> List[Optional[ParsedName]]:
+        """Parse many names; see ``parse``."""
+        parse = self.parse
+        return [parse(name) for name in names]
+
+
+_registry: List[NameParser] = list(NAME_PARSERS)
+_matcher = NameMatcher(_registry)
+
+
+def register_parser(parser: NameParser, first: bool = True) -> None:
+    """Add a naming scheme to the parsers every plan uses.
+
+    Args:
+        parser: The scheme to add
+        first: Try it before the built-in parsers, so it wins when both match
+
+    Raises:
+        ValueError: If the parser captures something other than FIELDS
+    """
+    global _matcher
+    parsers = [parser] + _registry if first else _registry + [parser]
+    _matcher = NameMatcher(parsers)
+    _registry[:] = parsers
+
+
+def parse_name(name: str) -> Optional[ParsedName]:
+    """Read a file name with the registered parsers; see ``NameMatcher.parse``."""
+    return _matcher.parse(name)
+
+
+def parse_names(names: Iterable[str]) -> List[Optional[ParsedName]]:
+    """Read many file names with the registered parsers."""
+    return _matcher.parse_all(names)
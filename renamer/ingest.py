@@ -0,0 +1,279 @@
+"""Non-destructive ingest: copy files to one or more destinations under their new names.
+
+The source card is never modified. Data is moved by the kernel wherever the
+platform allows it (a reflink clone, ``copy_file_range`` or ``sendfile`` on
+Linux, ``fcopyfile`` on macOS via ``shutil``), so it never passes through
+Python buffers. Copies are written to a ``.part`` file and renamed into place
+when complete, which makes an interrupted ingest resumable file by file: a
+file already at the destination is skipped once it is compared byte for byte
+with the source, which reads both but writes nothing.
+"""
+import errno
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import engine
+
+PART_SUFFIX = ".part"
+
+# Concurrent copies per destination
+COPY_WORKERS = 4
+
+# Largest request handed to copy_file_range/sendfile in one call
+_CHUNK = 64 * 1024 * 1024
+
+# Bytes compared at each end of a file before comparing it through
+_SAMPLE = 1024 * 1024
+
+# Bytes read from each file at a time when comparing a whole copy
+_COMPARE_BLOCK = 8 * 1024 * 1024
+
+# Linux ioctl that clones file extents on Btrfs, XFS and other CoW filesystems
+_FICLONE = 0x40049409
+
+# Errors meaning "this copy method is not available here", not "the copy failed"
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                errno.EBADF, errno.ENOTTY, errno.EPERM}
+
+
+@dataclass
+class TransferStats:
+    """Throughput for one destination."""
+
+    files: int = 0
+    skipped: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class IngestResult(engine.RenameResult):
+    """Outcome of copying a plan to its destinations."""
+
+    destinations: Dict[str, TransferStats] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        verb = "cancelled" if self.cancelled else "completed"
+        lines = [f"Copy {verb}. {self.success_count} files on every destination, "
+                 f"{self.error_count} errors."]
+        for destination, stats in self.destinations.items():
+            lines.append(f"{destination}: {stats.files} copied, {stats.skipped} already present, "
+                         f"{stats.bytes / 1e9:.2f} GB at {stats.mb_per_second:.0f} MB/s")
+        return "\n".join(lines)
+
+
+def _reflink(fin, fout) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+        fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+        return True
+    except (OSError, ImportError):
+        return False
+
+
+def _copy_kernel(fin, fout, size: int, copy: Callable[[int, int, int], int]) -> bool:
+    """Copy ``size`` bytes with a kernel call.
+
+    Returns:
+        Whether every byte was copied; some filesystems end early, and so
+        does a source that shrinks
+    """
+    offset = 0
+    while offset < size:
+        sent = copy(fin.fileno(), fout.fileno(), min(_CHUNK, size - offset))
+        if sent == 0:
+            return False
+        offset += sent
+    return True
+
+
+def _rewind(fin, fout) -> None:
+    """Start over after a kernel copy failed part way, which moved both file offsets."""
+    fin.seek(0)
+    fout.seek(0)
+    fout.truncate()
+
+
+def copy_file(src: str, dst: str) -> str:
+    """Copy a file without routing its data through Python.
+
+    Args:
+        src: The file to copy
+        dst: The path to create; overwritten if it exists
+
+    Returns:
+        The method that did the copy
+
+    Raises:
+        OSError: If the copy failed, or the source changed size while it was copied
+    """
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        size = os.fstat(fin.fileno()).st_size
+        if _reflink(fin, fout):
+            method = "reflink"
+        else:
+            method = ""
+            if hasattr(os, "copy_file_range"):
+                try:
+                    if _copy_kernel(fin, fout, size, lambda i, o, n: os.copy_file_range(i, o, n)):
+                        method = "copy_file_range"
+                    else:
+                        _rewind(fin, fout)
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED:
+                        raise
+                    _rewind(fin, fout)
+            if not method and sys.platform.startswith("linux"):
+                try:
+                    if _copy_kernel(fin, fout, size, lambda i, o, n: os.sendfile(o, i, None, n)):
+                        method = "sendfile"
+                    else:
+                        _rewind(fin, fout)
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED:
+                        raise
+                    _rewind(fin, fout)
+    if not method:
+        # shutil uses fcopyfile on macOS and large buffered copies elsewhere
+        shutil.copyfile(src, dst)
+        method = "copyfile"
+        # The buffered copy reads to the end of the file, wherever that now is
+        if os.stat(dst).st_size != size:
+            raise OSError(errno.EIO, "the source changed size while it was copied", src)
+    shutil.copystat(src, dst)
+    return method
+
+
+def _same_data(src: str, dst: str, size: int) -> bool:
+    """Whether two files of the same size hold the same bytes.
+
+    The ends are compared first, so most copies that differ are told apart
+    without reading them through.
+    """
+    with open(src, "rb") as a, open(dst, "rb") as b:
+        for offset in sorted({0, max(size - _SAMPLE, 0)}):
+            a.seek(offset)
+            b.seek(offset)
+            if a.read(_SAMPLE) != b.read(_SAMPLE):
+                return False
+        a.seek(0)
+        b.seek(0)
+        while True:
+            block = a.read(_COMPARE_BLOCK)
+            if block != b.read(_COMPARE_BLOCK):
+                return False
+            if not block:
+                return True
+
+
+def _copy_one(src: str, destination: str, name: str) -> Tuple[bool, int]:
+    """Copy one file into a destination, skipping it if a complete copy is there.
+
+    Returns:
+        Whether the file was copied (False if resumed past) and its size
+    """
+    source = os.stat(src)
+    size = source.st_size
+    dst = os.path.join(destination, name)
+    try:
+        existing = os.stat(dst)
+    except FileNotFoundError:
+        existing = None
+    if existing is not None:
+        if existing.st_size != size:
+            raise FileExistsError(errno.EEXIST, "a different file already has this name", dst)
+        # Neither the size nor the mtime tells a finished copy from a padded or damaged one
+        if _same_data(src, dst, size):
+            return False, size
+
+    part = dst + PART_SUFFIX
+    # Names from a tree scan keep their card's folder structure
+    if os.path.dirname(name):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+    copy_file(src, part)
+    os.replace(part, dst)
+    return True, size
+
+
+def copy_plan(plan: engine.RenamePlan, destinations: List[str],
+              progress: Optional[Callable[[int, int], None]] = None,
+              cancel: Optional[threading.Event] = None,
+              workers: int = COPY_WORKERS) -> IngestResult:
+    """Copy every file of a plan to each destination under its planned name.
+
+    Files already present at a destination with the same contents are
+    treated as done, so running the same ingest again resumes where it
+    stopped. Others of the same size are copied again.
+
+    Args:
+        plan: The plan whose new names to use
+        destinations: Folders to copy into; created if missing
+        progress: Optional callback receiving (copies done, total copies)
+        cancel: Optional event; once set, copies not yet started are skipped
+        workers: Concurrent copies per destination
+
+    Returns:
+        The counts, errors and per-destination throughput
+    """
+    result = IngestResult(folder=plan.folder)
+    total = len(plan) * len(destinations)
+    pools = []
+    futures = {}
+    started = {}
+    copied_everywhere: Dict[str, int] = {}
+
+    def job(entry: engine.PlanEntry, destination: str) -> Tuple[bool, int]:
+        if cancel is not None and cancel.is_set():
+            return False, -1
+        return _copy_one(os.path.join(plan.folder, entry.original), destination, entry.new_name)
+
+    try:
+        for destination in destinations:
+            os.makedirs(destination, exist_ok=True)
+            result.destinations[destination] = TransferStats()
+            pool = ThreadPoolExecutor(max_workers=workers)
+            pools.append(pool)
+            started[destination] = time.monotonic()
+            for entry in plan:
+                futures[pool.submit(job, entry, destination)] = (entry, destination)
+
+        for done, future in enumerate(as_completed(futures), 1):
+            entry, destination = futures[future]
+            stats = result.destinations[destination]
+            try:
+                copied, size = future.result()
+                if size < 0:
+                    result.cancelled = True
+                    result.not_renamed.append(entry.original)
+                else:
+                    if copied:
+                        stats.files += 1
+                        stats.bytes += size
+                    else:
+                        stats.skipped += 1
+                    copied_everywhere[entry.original] = copied_everywhere.get(entry.original, 0) + 1
+            except OSError as e:
+                result.errors.append(f"Failed to copy '{entry.original}' to "
+                                     f"'{os.path.join(destination, entry.new_name)}': {str(e)}")
+            stats.seconds = time.monotonic() - started[destination]
+            if progress is not None:
+                progress(done, total)
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+
+    result.success_count = sum(1 for count in copied_everywhere.values() if count == len(destinations))
+    result.not_renamed = sorted(set(result.not_renamed))
+    return result
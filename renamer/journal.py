@@ -0,0 +1,545 @@
+"""Crash-safe, two-phase rename batches with recovery and undo.
+
+Every batch is written to a journal before anything on disk changes. Files are
+first moved to unique temporary names (phase 1) and only then to their final
+names (phase 2), so swaps and cycles such as A->B, B->A never overwrite each
+other, and phase 2 never replaces a file that appeared at a target after
+planning. The journal is synced once per phase rather than once per file; after a
+crash, where each file ended up is read back from the file system using the
+journal's temporary names.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Collection, Dict, List, Optional, Sequence, Set, Tuple
+
+from .executor import Concurrency, rename_all, rename_noreplace
+from .paths import state_dir
+from .stats import CallStats, RunStats, measure
+
+TEMP_SUFFIX = ".renaming"
+
+# Finished journals kept for undo and auditing; interrupted ones are never pruned
+KEEP_JOURNALS = 20
+
+STATE_PENDING = "pending"          # phase 1 may be incomplete
+STATE_STAGED = "staged"            # phase 1 done, phase 2 may be incomplete
+STATE_COMMITTED = "committed"
+STATE_ROLLED_BACK = "rolled_back"
+
+# Bytes read at a time when looking for a journal's final record
+_TAIL_BLOCK = 4096
+
+Move = Tuple[str, str]
+
+
+@dataclass
+class BatchOutcome:
+    """What happened to each move of a batch, by index into the move list."""
+
+    renamed: List[int] = field(default_factory=list)
+    not_renamed: List[int] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    cancelled: bool = False
+
+
+def _fsync_dir(path: str) -> None:
+    """Make a new directory entry durable where the platform allows it."""
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _blocked_moves(moves: Sequence[Move], staged: Set[int]) -> Set[int]:
+    """Find staged moves that must go back because their target is still occupied.
+
+    A move whose source was never staged keeps its name, so any staged move
+    targeting that name has to return to its own source, which in turn may
+    block another move. Following that chain once keeps this O(n).
+    """
+    rollback: Set[int] = set()
+    occupied = [moves[i][0] for i in range(len(moves)) if i not in staged]
+    if not occupied:
+        return rollback
+    staged_by_target = {moves[i][1]: i for i in staged}
+    while occupied:
+        i = staged_by_target.get(occupied.pop())
+        if i is not None and i not in rollback:
+            rollback.add(i)
+            occupied.append(moves[i][0])
+    return rollback
+
+
+class Journal:
+    """The write-ahead record of one rename batch."""
+
+    def __init__(self, path: str, moves: Optional[Sequence[Move]] = None):
+        """Read a journal.
+
+        Args:
+            path: The journal file
+            moves: The batch's moves when the caller has just written them,
+                which are then used as they are rather than read back
+        """
+        self.path = path
+        self.batch_id = ""
+        self.folder = ""
+        self.created = 0.0
+        self.undo_of: Optional[str] = None
+        self.moves: Sequence[Move] = []
+        self.state = STATE_PENDING
+        self.held: Set[int] = set()        # moves refused before the batch ran; never staged
+        self.unstaged: Set[int] = set()
+        self.rollback: Set[int] = set()
+        self.failed: Set[int] = set()      # staged moves that did not reach their target in phase 2
+        self.restored: Set[str] = set()    # sources given back their name by a partial undo
+        self.undone = False
+        self.complete = False
+        self._load(moves)
+
+    @classmethod
+    def create(cls, folder: str, moves: Sequence[Move], journal_dir: Optional[str] = None,
+               undo_of: Optional[str] = None, hold: Collection[int] = ()) -> "Journal":
+        """Write a new journal for a batch and sync it before any rename happens.
+
+        Args:
+            folder: The folder the move names are relative to
+            moves: (source, target) names in execution order
+            journal_dir: Where to keep the journal, defaulting to the state folder
+            undo_of: The batch this one reverts, if any
+            hold: Indices of moves the caller has refused; see ``run``
+
+        Returns:
+            The journal, ready to run
+        """
+        journal_dir = journal_dir or state_dir("journal")
+        # Nanoseconds keep batches run within the same second in order
+        now = time.time_ns()
+        batch_id = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now // 10**9))}-{now % 10**9:09d}"
+                    f"-{os.getpid()}-{os.urandom(3).hex()}")
+        path = os.path.join(journal_dir, f"{batch_id}.jsonl")
+
+        header = {"type": "batch", "id": batch_id, "folder": os.path.abspath(folder),
+                  "created": time.time(), "count": len(moves), "undo_of": undo_of,
+                  "hold": sorted(hold)}
+        dumps = json.dumps
+
+        # Streamed through the file buffer, with one fsync for the whole plan
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(dumps(header) + "\n")
+            fh.writelines(dumps({"type": "move", "src": src, "dst": dst}) + "\n" for src, dst in moves)
+            fh.flush()
+            os.fsync(fh.fileno())
+        _fsync_dir(journal_dir)
+        return cls(path, moves)
+
+    def _load(self, moves: Optional[Sequence[Move]] = None) -> None:
+        count = -1
+        with open(self.path, encoding="utf-8") as fh:
+            if moves is not None:
+                # Just written: only the header needs reading
+                self._read_header(json.loads(fh.readline()))
+                self.moves = moves
+                self.complete = True
+                return
+            loaded: List[Move] = []
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append
+                    continue
+                kind = record.get("type")
+                if kind == "batch":
+                    self._read_header(record)
+                    count = record["count"]
+                elif kind == "move":
+                    loaded.append((record["src"], record["dst"]))
+                elif kind == STATE_STAGED:
+                    self.state = STATE_STAGED
+                    self.unstaged = set(record["unstaged"])
+                    self.rollback = set(record["rollback"])
+                elif kind in (STATE_COMMITTED, STATE_ROLLED_BACK):
+                    self.state = kind
+                    self.failed = set(record.get("failed", ()))
+                elif kind == "undone":
+                    self.undone = True
+        self.moves = loaded
+        # If the plan itself was not fully written, nothing on disk was touched yet
+        self.complete = count == len(loaded)
+
+    def _read_header(self, record: Dict) -> None:
+        self.batch_id = record["id"]
+        self.folder = record["folder"]
+        self.created = record["created"]
+        self.undo_of = record.get("undo_of")
+        self.held = set(record.get("hold", ()))
+
+    def _append(self, record: Dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    @property
+    def interrupted(self) -> bool:
+        """Whether the batch stopped before reaching a final state."""
+        return self.complete and self.state in (STATE_PENDING, STATE_STAGED)
+
+    @property
+    def renamed(self) -> List[int]:
+        """Indices of the moves that reached their target in a committed batch."""
+        if self.state != STATE_COMMITTED:
+            return []
+        return [i for i in range(len(self.moves))
+                if i not in self.unstaged and i not in self.rollback and i not in self.failed]
+
+    @property
+    def undoable(self) -> List[int]:
+        """Indices of the renamed moves that no undo has reverted yet."""
+        restored = self.restored
+        return [i for i in self.renamed if self.moves[i][0] not in restored]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+    def _temp_path(self, i: int) -> str:
+        # Temporary names live next to the source so the rename never crosses devices
+        src = self.moves[i][0]
+        return os.path.join(self.folder, os.path.dirname(src), f".{self.batch_id}-{i}{TEMP_SUFFIX}")
+
+    def _error(self, i: int, e: OSError) -> str:
+        src, dst = self.moves[i]
+        return f"Failed to rename '{src}' to '{dst}': {str(e)}"
+
+    def run(self, progress: Optional[Callable[[int, int], None]] = None,
+            cancel: Optional[threading.Event] = None,
+            concurrency: Optional[Concurrency] = None,
+            stats: Optional[RunStats] = None) -> BatchOutcome:
+        """Execute the batch.
+
+        Cancellation is honoured during phase 1 only. Phase 2 is always carried
+        through so every file ends up under either its old or its new name.
+        Within each phase the renames are independent, so they run
+        concurrently per volume; the journal record between the phases is
+        the only ordering point.
+
+        Moves held when the journal was created are never staged: their files
+        keep their names, and so do the files whose targets those names are.
+        Held moves are in neither list of the outcome.
+
+        Args:
+            progress: Optional callback receiving (files done, total files)
+            cancel: Optional event; once set, no further files are staged
+            concurrency: Renames in flight per volume, detected when omitted
+            stats: Optional run stats; the renames of both phases are recorded
+                under the "rename" phase
+
+        Returns:
+            The outcome for every move
+        """
+        outcome = BatchOutcome()
+        total = len(self.moves)
+        staged: Set[int] = set()
+        failed: Set[int] = set(self.held)
+
+        with measure(stats, "rename", total) as phase:
+            calls = phase.call("rename") if phase is not None else None
+            order = [i for i in range(total) if i not in failed] if failed else range(total)
+            stage = [(self._path(self.moves[i][0]), self._temp_path(i)) for i in order]
+            for done, (position, error) in enumerate(rename_all(stage, concurrency, cancel, calls), 1):
+                i = order[position]
+                if error is None:
+                    staged.add(i)
+                else:
+                    failed.add(i)
+                    outcome.errors.append(self._error(i, error))
+                if progress is not None:
+                    progress((done + len(self.held) + 1) // 2, total)
+
+            outcome.cancelled = len(staged) + len(failed) < total
+            outcome.not_renamed.extend(i for i in range(total) if i not in staged and i not in failed)
+            self._commit(staged, outcome, progress, concurrency, calls)
+        return outcome
+
+    def _commit(self, staged: Set[int], outcome: BatchOutcome,
+                progress: Optional[Callable[[int, int], None]] = None,
+                concurrency: Optional[Concurrency] = None,
+                calls: Optional[CallStats] = None) -> None:
+        """Record the end of phase 1, then move every staged file to its final name.
+
+        Phase 2 never replaces a file: one that appeared at a target after
+        planning keeps its name, and the staged file goes back to its source.
+        """
+        total = len(self.moves)
+        self.rollback = _blocked_moves(self.moves, staged)
+        self.unstaged = set(range(total)) - staged
+        self._append({"type": STATE_STAGED, "unstaged": sorted(self.unstaged),
+                      "rollback": sorted(self.rollback)})
+        self.state = STATE_STAGED
+
+        done = total - len(staged)
+        order = sorted(staged)
+        finish = [(self._temp_path(i), self._path(self.moves[i][0 if i in self.rollback else 1]))
+                  for i in order]
+        taken: List[int] = []
+        for position, error in rename_all(finish, concurrency, calls=calls, replace=False):
+            i = order[position]
+            if error is None:
+                (outcome.not_renamed if i in self.rollback else outcome.renamed).append(i)
+            elif isinstance(error, FileExistsError) and i not in self.rollback:
+                taken.append(i)
+            else:
+                self.failed.add(i)
+                outcome.errors.append(f"{self._error(i, error)} (left as '{self._temp_path(i)}')")
+            done += 1
+            if progress is not None:
+                progress((total + done) // 2, total)
+        # Returned after the concurrent renames, so no source is freed while another move targets it
+        for i in taken:
+            self.failed.add(i)
+            src, dst = self.moves[i]
+            try:
+                rename_noreplace(self._temp_path(i), self._path(src))
+            except OSError as e:
+                outcome.errors.append(f"'{dst}' appeared after planning and '{src}' could not be "
+                                      f"restored: {str(e)} (left as '{self._temp_path(i)}')")
+                continue
+            outcome.not_renamed.append(i)
+            outcome.errors.append(f"Did not rename '{src}': '{dst}' appeared after planning")
+        outcome.renamed.sort()
+        outcome.not_renamed.sort()
+
+        self._append({"type": STATE_COMMITTED, "failed": sorted(self.failed)})
+        self.state = STATE_COMMITTED
+
+    def recover(self, finish: bool = True) -> BatchOutcome:
+        """Bring an interrupted batch to a final state.
+
+        Args:
+            finish: Complete the batch if True, otherwise restore every original name
+
+        Returns:
+            The outcome for every move
+        """
+        outcome = BatchOutcome()
+        at_temp = {i for i in range(len(self.moves)) if os.path.lexists(self._temp_path(i))}
+
+        if not finish:
+            self._roll_back(at_temp, outcome)
+            return outcome
+
+        if self.state == STATE_PENDING:
+            # Phase 1 was cut short: stage whatever is still under its old name and not held
+            staged = set(at_temp)
+            for i in range(len(self.moves)):
+                if i in staged or i in self.held:
+                    continue
+                try:
+                    os.rename(self._path(self.moves[i][0]), self._temp_path(i))
+                    staged.add(i)
+                except OSError as e:
+                    outcome.errors.append(self._error(i, e))
+            self._commit(staged, outcome)
+            return outcome
+
+        # Phase 2 was cut short: finish the files still under a temporary name
+        for i in range(len(self.moves)):
+            src, dst = self.moves[i]
+            if i in self.unstaged:
+                continue
+            if i not in at_temp:
+                (outcome.not_renamed if i in self.rollback else outcome.renamed).append(i)
+                continue
+            back = i in self.rollback
+            try:
+                rename_noreplace(self._temp_path(i), self._path(src if back else dst))
+                (outcome.not_renamed if back else outcome.renamed).append(i)
+            except OSError as e:
+                self.failed.add(i)
+                outcome.errors.append(f"{self._error(i, e)} (left as '{self._temp_path(i)}')")
+        self._append({"type": STATE_COMMITTED, "failed": sorted(self.failed)})
+        self.state = STATE_COMMITTED
+        return outcome
+
+    def _roll_back(self, at_temp: Set[int], outcome: BatchOutcome) -> None:
+        """Return every file of an interrupted batch to its original name."""
+        # Files already at their target go back through a temporary name as well,
+        # in case another file's original name is that target
+        if self.state == STATE_STAGED:
+            for i in range(len(self.moves)):
+                if i in at_temp or i in self.unstaged or i in self.rollback:
+                    continue
+                try:
+                    os.rename(self._path(self.moves[i][1]), self._temp_path(i))
+                    at_temp.add(i)
+                except OSError as e:
+                    outcome.errors.append(self._error(i, e))
+
+        for i in sorted(at_temp):
+            try:
+                rename_noreplace(self._temp_path(i), self._path(self.moves[i][0]))
+                outcome.not_renamed.append(i)
+            except OSError as e:
+                outcome.errors.append(self._error(i, e))
+        self._append({"type": STATE_ROLLED_BACK})
+        self.state = STATE_ROLLED_BACK
+
+    def mark_undone(self) -> None:
+        """Record that this batch has been reverted."""
+        self._append({"type": "undone"})
+        self.undone = True
+
+
+def _journal_paths(journal_dir: Optional[str] = None) -> List[str]:
+    """List journal files oldest first; batch ids sort by creation time."""
+    journal_dir = journal_dir or state_dir("journal")
+    return [os.path.join(journal_dir, name) for name in sorted(os.listdir(journal_dir))
+            if name.endswith(".jsonl")]
+
+
+def _last_record_type(path: str) -> Optional[str]:
+    """Read the type of a journal's final record without loading the whole plan.
+
+    The file is read backwards a block at a time until the line break before
+    the final record, which may be far longer than one block when it lists
+    the failures of a large batch.
+    """
+    try:
+        with open(path, "rb") as fh:
+            end = fh.seek(0, os.SEEK_END)
+            tail = b""
+            while end:
+                start = max(0, end - _TAIL_BLOCK)
+                fh.seek(start)
+                tail = fh.read(end - start) + tail
+                end = start
+                if b"\n" in tail.rstrip(b"\n"):
+                    break
+        return json.loads(tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]).get("type")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _load(path: str) -> Optional[Journal]:
+    try:
+        journal = Journal(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return journal if journal.complete else None
+
+
+def interrupted_batches(journal_dir: Optional[str] = None) -> List[Journal]:
+    """Return the batches that need recovery, oldest first."""
+    journals = []
+    for path in _journal_paths(journal_dir):
+        if _last_record_type(path) in (STATE_COMMITTED, STATE_ROLLED_BACK, "undone"):
+            continue
+        journal = _load(path)
+        if journal is not None and journal.interrupted:
+            journals.append(journal)
+    return journals
+
+
+def last_batch(journal_dir: Optional[str] = None) -> Optional[Journal]:
+    """Return the most recent batch if it can still be undone.
+
+    Undo goes back one step only: once the latest batch has been undone (or did
+    not commit), older batches are not offered. A batch whose undo was partial
+    is offered again for the files it still has renamed.
+    """
+    restored: Dict[str, Set[str]] = {}
+    for path in reversed(_journal_paths(journal_dir)):
+        if _last_record_type(path) != STATE_COMMITTED:
+            return None
+        journal = _load(path)
+        if journal is None:
+            return None
+        if journal.undo_of is not None:
+            # The undo of an earlier batch; look at the batch it reverted
+            restored.setdefault(journal.undo_of, set()).update(journal.moves[i][1] for i in journal.renamed)
+            continue
+        journal.restored = restored.get(journal.batch_id, set())
+        return journal if journal.undoable else None
+    return None
+
+
+def run_batch(folder: str, moves: Sequence[Move],
+              progress: Optional[Callable[[int, int], None]] = None,
+              cancel: Optional[threading.Event] = None,
+              journal_dir: Optional[str] = None,
+              undo_of: Optional[str] = None,
+              concurrency: Optional[Concurrency] = None,
+              stats: Optional[RunStats] = None,
+              hold: Collection[int] = ()) -> BatchOutcome:
+    """Journal and execute a batch of renames within a folder.
+
+    Args:
+        folder: The folder the names are relative to
+        moves: (source, target) names in execution order
+        progress: Optional callback receiving (files done, total files)
+        cancel: Optional event that stops the batch before its next file
+        journal_dir: Where to keep the journal, defaulting to the state folder
+        undo_of: The batch this one reverts, if any
+        concurrency: Renames in flight per volume, detected when omitted
+        stats: Optional run stats to record the "journal" and "rename" phases in
+        hold: Indices of moves to leave out, recorded in the journal so
+            recovery leaves them out too; see ``Journal.run``
+
+    Returns:
+        The outcome for every move
+    """
+    with measure(stats, "journal", len(moves)):
+        journal = Journal.create(folder, moves, journal_dir, undo_of, hold)
+    outcome = journal.run(progress, cancel, concurrency, stats)
+    prune(journal_dir)
+    return outcome
+
+
+def undo_last(progress: Optional[Callable[[int, int], None]] = None,
+              cancel: Optional[threading.Event] = None,
+              journal_dir: Optional[str] = None,
+              concurrency: Optional[Concurrency] = None) -> Optional[Tuple[Journal, BatchOutcome]]:
+    """Revert the most recent batch.
+
+    Args:
+        progress: Optional callback receiving (files done, total files)
+        cancel: Optional event that stops the undo before its next file
+        journal_dir: The journal folder, defaulting to the state folder
+        concurrency: Renames in flight per volume, detected when omitted
+
+    Returns:
+        The reverted batch's journal and the undo outcome, or None if there is nothing to undo
+    """
+    journal = last_batch(journal_dir)
+    if journal is None:
+        return None
+    moves = [(journal.moves[i][1], journal.moves[i][0]) for i in journal.undoable]
+    outcome = run_batch(journal.folder, moves, progress, cancel, journal_dir,
+                        undo_of=journal.batch_id, concurrency=concurrency)
+    # A partial undo stays in the history, so the files still renamed can be undone again
+    if len(outcome.renamed) == len(moves):
+        journal.mark_undone()
+    return journal, outcome
+
+
+def prune(journal_dir: Optional[str] = None, keep: int = KEEP_JOURNALS) -> None:
+    """Delete the oldest finished journals beyond ``keep``."""
+    finished = [path for path in _journal_paths(journal_dir)
+                if _last_record_type(path) in (STATE_COMMITTED, STATE_ROLLED_BACK, "undone")]
+    for path in finished[:-keep] if keep else finished:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
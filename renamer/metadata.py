@@ -0,0 +1,385 @@
+"""Shoot date, reel and timecode read straight from media file headers.
+
+Only the structures that carry this information are read: atom and chunk
+headers are walked with seeks, and the few payloads that matter (``mvhd``,
+``udta``/``meta``, the timecode track's sample description and first sample,
+``bext`` and ``iXML``) are read with a size cap. A multi-GB clip therefore
+costs a few KB of I/O, and a thread pool overlaps the latency of many files.
+"""
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+QUICKTIME_EXTENSIONS = frozenset((".mov", ".mp4", ".m4v", ".m4a", ".3gp"))
+WAVE_EXTENSIONS = frozenset((".wav", ".bwf"))
+
+# Upper bound on any single payload read; headers that claim more are truncated
+MAX_PAYLOAD = 64 * 1024
+
+DEFAULT_WORKERS = 16
+
+_QT_EPOCH = datetime(1904, 1, 1)
+_UNSAFE = re.compile(r'[^A-Za-z0-9_-]+')
+_DATE = re.compile(r'(\d{4})\D?(\d{2})\D?(\d{2})')
+_IXML_FIELDS = ("TAPE", "SCENE", "TAKE", "TIMECODE_RATE", "TIMECODE_FLAG")
+
+
+@dataclass
+class MediaInfo:
+    """Production metadata found in a file header; any field may be missing."""
+
+    creation_date: Optional[datetime] = None
+    reel: Optional[str] = None
+    timecode: Optional[str] = None
+    start_seconds: Optional[float] = None   # start timecode as seconds since midnight
+    duration: Optional[float] = None        # seconds
+    frame_rate: Optional[float] = None
+    scene: Optional[str] = None
+    take: Optional[str] = None
+
+    @property
+    def shoot_date(self) -> Optional[str]:
+        """The creation date as YYMMDD, the form used in file names."""
+        return self.creation_date.strftime("%y%m%d") if self.creation_date else None
+
+    @property
+    def camera_roll(self) -> Optional[str]:
+        """The reel name reduced to characters that are safe in file names."""
+        if not self.reel:
+            return None
+        return _UNSAFE.sub("_", self.reel.strip()).strip("_") or None
+
+
+def format_timecode(frames: int, fps: int, drop_frame: bool = False) -> str:
+    """Format a frame count as HH:MM:SS:FF (or HH:MM:SS;FF for drop frame).
+
+    Args:
+        frames: Frames since midnight
+        fps: The nominal frame rate, e.g. 24, 25 or 30
+        drop_frame: Whether the count follows drop-frame numbering
+
+    Returns:
+        The timecode string
+    """
+    if drop_frame and fps in (30, 60):
+        # Two (or four) frame numbers are skipped every minute except each tenth
+        dropped = fps // 15
+        per_ten_minutes = fps * 600 - dropped * 9
+        per_minute = fps * 60 - dropped
+        tens, rest = divmod(frames, per_ten_minutes)
+        frames += dropped * 9 * tens
+        if rest > dropped:
+            frames += dropped * ((rest - dropped) // per_minute)
+    ff = frames % fps
+    total_seconds = frames // fps
+    separator = ";" if drop_frame else ":"
+    return (f"{total_seconds // 3600 % 24:02d}:{total_seconds // 60 % 60:02d}:"
+            f"{total_seconds % 60:02d}{separator}{ff:02d}")
+
+
+def _read_exact(fh: BinaryIO, offset: int, size: int) -> bytes:
+    fh.seek(offset)
+    return fh.read(min(size, MAX_PAYLOAD))
+
+
+def _iter_atoms(fh: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload offset, end offset) for the atoms between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        header = _read_exact(fh, offset, 16)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header[:8])
+        payload = offset + 8
+        if size == 1 and len(header) == 16:
+            size = struct.unpack(">Q", header[8:16])[0]
+            payload = offset + 16
+        elif size == 0:
+            size = end - offset
+        if size < payload - offset:
+            return
+        yield kind, payload, min(offset + size, end)
+        offset += size
+
+
+def _find_atom(fh: BinaryIO, start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for child, payload, child_end in _iter_atoms(fh, start, end):
+        if child == kind:
+            return payload, child_end
+    return None
+
+
+def _qt_text(data: bytes) -> str:
+    """Decode a QuickTime string atom (2-byte length, 2-byte language, text)."""
+    if len(data) >= 4:
+        length = struct.unpack(">H", data[:2])[0]
+        if 0 < length <= len(data) - 4:
+            return data[4:4 + length].decode("utf-8", "replace")
+    return data.decode("utf-8", "replace").strip("\x00")
+
+
+def _parse_date(text: str) -> Optional[datetime]:
+    match = _DATE.search(text)
+    if not match:
+        return None
+    try:
+        return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+def _read_mvhd(fh: BinaryIO, payload: int, info: MediaInfo) -> None:
+    data = _read_exact(fh, payload, 32)
+    if len(data) < 20:
+        return
+    if data[0] == 1 and len(data) >= 32:
+        created, _, timescale, duration = struct.unpack(">QQIQ", data[4:32])
+    else:
+        created, _, timescale, duration = struct.unpack(">IIII", data[4:20])
+    if created:
+        info.creation_date = _QT_EPOCH + timedelta(seconds=created)
+    if timescale:
+        info.duration = duration / timescale
+
+
+def _read_udta(fh: BinaryIO, start: int, end: int, info: MediaInfo) -> None:
+    for kind, payload, atom_end in _iter_atoms(fh, start, end):
+        if kind == b"\xa9day":
+            date = _parse_date(_qt_text(_read_exact(fh, payload, atom_end - payload)))
+            if date:
+                info.creation_date = date
+
+
+def _read_meta(fh: BinaryIO, start: int, end: int, info: MediaInfo) -> None:
+    """Read reel and creation date from QuickTime ``meta`` keys (mdta namespace)."""
+    keys_atom = _find_atom(fh, start, end, b"keys")
+    ilst_atom = _find_atom(fh, start, end, b"ilst")
+    if keys_atom is None or ilst_atom is None:
+        return
+
+    keys = {}
+    data = _read_exact(fh, keys_atom[0], keys_atom[1] - keys_atom[0])
+    offset = 8
+    for index in range(1, struct.unpack(">I", data[4:8])[0] + 1 if len(data) >= 8 else 1):
+        if offset + 8 > len(data):
+            break
+        size = struct.unpack(">I", data[offset:offset + 4])[0]
+        if size < 8:
+            break
+        keys[index] = data[offset + 8:offset + size].decode("utf-8", "replace").lower()
+        offset += size
+
+    for kind, payload, item_end in _iter_atoms(fh, ilst_atom[0], ilst_atom[1]):
+        key = keys.get(struct.unpack(">I", kind)[0], "")
+        if "reel" not in key and "creationdate" not in key:
+            continue
+        value_atom = _find_atom(fh, payload, item_end, b"data")
+        if value_atom is None:
+            continue
+        value = _read_exact(fh, value_atom[0], value_atom[1] - value_atom[0])[8:]
+        text = value.decode("utf-8", "replace").strip("\x00").strip()
+        if "reel" in key and text:
+            info.reel = text
+        elif "creationdate" in key:
+            info.creation_date = _parse_date(text) or info.creation_date
+
+
+def _read_timecode_track(fh: BinaryIO, start: int, end: int, info: MediaInfo) -> None:
+    """Read start timecode and reel from a ``tmcd`` track, if this trak is one."""
+    mdia = _find_atom(fh, start, end, b"mdia")
+    if mdia is None:
+        return
+    hdlr = _find_atom(fh, mdia[0], mdia[1], b"hdlr")
+    if hdlr is None or _read_exact(fh, hdlr[0] + 8, 4) != b"tmcd":
+        return
+    minf = _find_atom(fh, mdia[0], mdia[1], b"minf")
+    stbl = _find_atom(fh, minf[0], minf[1], b"stbl") if minf else None
+    if stbl is None:
+        return
+
+    stsd = _find_atom(fh, stbl[0], stbl[1], b"stsd")
+    if stsd is None:
+        return
+    # stsd: version/flags, entry count, then the first sample description
+    entry = _read_exact(fh, stsd[0] + 8, 34)
+    if len(entry) < 34 or entry[4:8] != b"tmcd":
+        return
+    flags, timescale, frame_duration, fps = struct.unpack(">IIIB", entry[20:33])
+    drop_frame = bool(flags & 0x1)
+    entry_size = struct.unpack(">I", entry[:4])[0]
+    name = _find_atom(fh, stsd[0] + 8 + 34, stsd[0] + 8 + entry_size, b"name")
+    if name is not None and not info.reel:
+        info.reel = _qt_text(_read_exact(fh, name[0], name[1] - name[0])) or None
+    if not fps:
+        return
+
+    # The first timecode sample is a 4-byte frame number at the first chunk offset
+    offset = None
+    stco = _find_atom(fh, stbl[0], stbl[1], b"stco")
+    if stco is not None:
+        data = _read_exact(fh, stco[0], 12)
+        if len(data) == 12 and struct.unpack(">I", data[4:8])[0]:
+            offset = struct.unpack(">I", data[8:12])[0]
+    else:
+        co64 = _find_atom(fh, stbl[0], stbl[1], b"co64")
+        data = _read_exact(fh, co64[0], 16) if co64 else b""
+        if len(data) == 16 and struct.unpack(">I", data[4:8])[0]:
+            offset = struct.unpack(">Q", data[8:16])[0]
+    if offset is None:
+        return
+    sample = _read_exact(fh, offset, 4)
+    if len(sample) != 4:
+        return
+
+    frames = struct.unpack(">I", sample)[0]
+    info.timecode = format_timecode(frames, fps, drop_frame)
+    info.frame_rate = timescale / frame_duration if frame_duration else float(fps)
+    info.start_seconds = frames / fps
+
+
+def read_quicktime(fh: BinaryIO, size: int) -> MediaInfo:
+    """Read metadata from a QuickTime/MP4 file opened in binary mode."""
+    info = MediaInfo()
+    moov = _find_atom(fh, 0, size, b"moov")
+    if moov is None:
+        return info
+
+    for kind, payload, end in _iter_atoms(fh, *moov):
+        if kind == b"mvhd":
+            _read_mvhd(fh, payload, info)
+        elif kind == b"udta":
+            _read_udta(fh, payload, end, info)
+        elif kind == b"meta":
+            # QuickTime's meta holds atoms directly; ISO MP4's is a full box with 4 extra bytes
+            if _read_exact(fh, payload + 4, 4) != b"hdlr":
+                payload += 4
+            _read_meta(fh, payload, end, info)
+        elif kind == b"trak":
+            _read_timecode_track(fh, payload, end, info)
+    return info
+
+
+def _parse_ixml(text: str, info: MediaInfo) -> Dict[str, str]:
+    fields = {}
+    for tag in _IXML_FIELDS:
+        match = re.search(rf"<{tag}>([^<]*)</{tag}>", text)
+        if match:
+            fields[tag] = match.group(1).strip()
+    info.reel = fields.get("TAPE") or info.reel
+    info.scene = fields.get("SCENE") or info.scene
+    info.take = fields.get("TAKE") or info.take
+    return fields
+
+
+def _parse_rate(text: str) -> Optional[float]:
+    try:
+        numerator, _, denominator = text.partition("/")
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def read_wave(fh: BinaryIO, size: int) -> MediaInfo:
+    """Read metadata from a Broadcast WAV (RIFF, RF64 or BW64) file."""
+    info = MediaInfo()
+    header = _read_exact(fh, 0, 12)
+    if len(header) < 12 or header[:4] not in (b"RIFF", b"RF64", b"BW64") or header[8:12] != b"WAVE":
+        return info
+
+    sample_rate = byte_rate = 0
+    data_size = ds64_data_size = None
+    time_reference = None
+    ixml_fields: Dict[str, str] = {}
+    description = ""
+
+    offset = 12
+    while offset + 8 <= size:
+        chunk = _read_exact(fh, offset, 8)
+        if len(chunk) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+        payload = offset + 8
+        if chunk_id == b"ds64":
+            data = _read_exact(fh, payload, 16)
+            if len(data) == 16:
+                ds64_data_size = struct.unpack("<Q", data[8:16])[0]
+        elif chunk_id == b"fmt ":
+            data = _read_exact(fh, payload, 16)
+            if len(data) == 16:
+                _, _, sample_rate, byte_rate, _, _ = struct.unpack("<HHIIHH", data)
+        elif chunk_id == b"bext":
+            data = _read_exact(fh, payload, 346)
+            if len(data) == 346:
+                description = data[:256].decode("latin-1").strip("\x00")
+                info.creation_date = _parse_date(data[320:330].decode("latin-1"))
+                time_reference = struct.unpack("<Q", data[338:346])[0]
+        elif chunk_id == b"iXML":
+            text = _read_exact(fh, payload, chunk_size).decode("utf-8", "replace")
+            ixml_fields = _parse_ixml(text, info)
+        elif chunk_id == b"data":
+            data_size = ds64_data_size if chunk_size == 0xFFFFFFFF and ds64_data_size else chunk_size
+            chunk_size = data_size
+        offset = payload + chunk_size + (chunk_size & 1)
+
+    # Sound Devices and others also write sTAPE=/sSCENE=/sTAKE= lines into the description
+    if not info.reel:
+        match = re.search(r"[sd]TAPE=([^\r\n]*)", description)
+        info.reel = match.group(1).strip() if match else None
+    if data_size is not None and byte_rate:
+        info.duration = data_size / byte_rate
+    if time_reference is not None and sample_rate:
+        info.start_seconds = time_reference / sample_rate
+        rate = _parse_rate(ixml_fields.get("TIMECODE_RATE", ""))
+        if rate:
+            info.frame_rate = rate
+            fps = round(rate)
+            drop_frame = ixml_fields.get("TIMECODE_FLAG", "").upper() == "DF"
+            real_rate = rate if drop_frame else fps
+            info.timecode = format_timecode(int(info.start_seconds * real_rate), fps, drop_frame)
+    return info
+
+
+def read_media_info(path: str) -> Optional[MediaInfo]:
+    """Read production metadata from a media file.
+
+    Args:
+        path: The file to read
+
+    Returns:
+        The metadata found, or None for unsupported or unreadable files
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in QUICKTIME_EXTENSIONS:
+        reader = read_quicktime
+    elif ext in WAVE_EXTENSIONS:
+        reader = read_wave
+    else:
+        return None
+    try:
+        # Unbuffered, so each seek+read fetches only the bytes asked for
+        with open(path, "rb", buffering=0) as fh:
+            return reader(fh, os.fstat(fh.fileno()).st_size)
+    except (OSError, struct.error, ValueError, OverflowError):
+        return None
+
+
+def read_media_infos(paths: Iterable[str],
+                     max_workers: int = DEFAULT_WORKERS) -> Dict[str, Optional[MediaInfo]]:
+    """Read metadata for many files concurrently.
+
+    Args:
+        paths: The files to read
+        max_workers: Number of reader threads
+
+    Returns:
+        The metadata for each path, None where nothing could be read
+    """
+    paths = list(paths)
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as pool:
+        return dict(zip(paths, pool.map(read_media_info, paths)))
@@ -0,0 +1,29 @@
+"""Locations for the app's persistent state (journals, caches, templates)."""
+import os
+import sys
+
+
+def state_dir(*parts: str) -> str:
+    """Return a directory under the per-user state folder, creating it if needed.
+
+    ``FOOTAGE_RENAMER_HOME`` overrides the platform default, which is handy for
+    ingest servers that keep state on a dedicated volume.
+
+    Args:
+        parts: Subdirectories below the state folder
+
+    Returns:
+        The absolute path of the directory
+    """
+    base = os.environ.get("FOOTAGE_RENAMER_HOME")
+    if not base:
+        if sys.platform == "win32":
+            base = os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "FootageRenamer")
+        elif sys.platform == "darwin":
+            base = os.path.expanduser("~/Library/Application Support/FootageRenamer")
+        else:
+            xdg = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+            base = os.path.join(xdg, "footage-renamer")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
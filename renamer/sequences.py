@@ -0,0 +1,112 @@
+"""Detection of image sequences (DPX, EXR, ARRIRAW, CinemaDNG, ...) in a file listing.
+
+Scanners and some cameras write one file per frame, named as a clip name,
+an optional separator, a frame number and an extension. Grouping those
+frames into one clip lets a template name the clip once and every frame keep
+its frame number and padding.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple, Union
+
+# Extensions written one file per frame, plus RED's numbered clip segments
+# (A001_C001_0101AB_001.R3D, _002, ...); other containers never form sequences.
+# Still formats (JPEG, PNG, TIFF) are left out: a folder of photos such as
+# IMG_0001.JPG ... IMG_0200.JPG is named file by file, not as one clip
+FRAME_EXTENSIONS = frozenset({".ari", ".cin", ".dng", ".dpx", ".exr", ".r3d", ".sgi", ".tga"})
+
+# Extensions whose files belong to a clip even when there is only one of them
+SEGMENT_EXTENSIONS = frozenset({".r3d"})
+
+# A sequence needs at least this many frames; a lone still stays a plain file
+MIN_FRAMES = 2
+
+# The digits ending the name before the extension are the frame number
+_DIGITS = "0123456789"
+_SEPARATORS = "._-"
+
+
+@dataclass
+class FrameSequence:
+    """The frames of one clip, e.g. ``A001C003_0086400.dpx`` ... ``A001C003_0096399.dpx``."""
+
+    clip: str                       # the name before the frame number, e.g. "A001C003"
+    separator: str                  # "_", "." or "-" between clip name and frame, or ""
+    ext: str                        # the extension as written, with its dot
+    frames: List[str] = field(default_factory=list)  # frame numbers as written, in order
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @property
+    def clip_file(self) -> str:
+        """The name a template sees for the clip: its name plus the extension."""
+        return self.clip + self.ext
+
+    def file(self, frame: str) -> str:
+        """The file name of one frame."""
+        return self.clip + self.separator + frame + self.ext
+
+    @property
+    def files(self) -> List[str]:
+        """The frame file names, in frame order."""
+        prefix = self.clip + self.separator
+        ext = self.ext
+        return [prefix + frame + ext for frame in self.frames]
+
+    def label(self, clip: str = None, separator: str = None, ext: str = None) -> str:
+        """Describe the sequence as ``clip_[first-last].ext``, optionally under a new name."""
+        clip = self.clip if clip is None else clip
+        separator = self.separator if separator is None else separator
+        ext = self.ext if ext is None else ext
+        return f"{clip}{separator}[{self.frames[0]}-{self.frames[-1]}]{ext}"
+
+
+def group_sequences(files: Iterable[str],
+                    min_frames: int = MIN_FRAMES) -> List[Union[str, FrameSequence]]:
+    """Group the frames of image sequences in one pass over a listing.
+
+    Frames belong together when they share the clip name, separator and
+    extension; frames with nothing before the frame number stay plain
+    files. Each sequence takes the position of its first frame in the
+    listing; other files keep their own positions.
+
+    Args:
+        files: File names in listing order
+        min_frames: The fewest frames that make a sequence
+
+    Returns:
+        Plain file names and sequences, in listing order
+    """
+    items: List[Union[str, Tuple[str, str, str]]] = []
+    groups: Dict[Tuple[str, str, str], List[str]] = {}
+    # Plain string operations; a regex match per name is the slowest part at a million frames
+    for name in files:
+        stem, dot, ext = name.rpartition(".")
+        head = stem.rstrip(_DIGITS)
+        if not dot or len(head) == len(stem) or dot + ext.lower() not in FRAME_EXTENSIONS:
+            items.append(name)
+            continue
+        separator = head[-1] if head and head[-1] in _SEPARATORS else ""
+        clip = head[:len(head) - len(separator)]
+        if not clip:
+            items.append(name)
+            continue
+        key = (clip, separator, dot + ext)
+        frames = groups.get(key)
+        if frames is None:
+            frames = groups[key] = []
+            items.append(key)
+        frames.append(stem[len(head):])
+
+    result: List[Union[str, FrameSequence]] = []
+    for item in items:
+        if isinstance(item, str):
+            result.append(item)
+            continue
+        sequence = FrameSequence(*item, groups[item])
+        if len(sequence) < min_frames and sequence.ext.lower() not in SEGMENT_EXTENSIONS:
+            result.extend(sequence.files)
+            continue
+        sequence.frames.sort(key=int)
+        result.append(sequence)
+    return result
@@ -0,0 +1,234 @@
+"""Per-phase timings, call counts, latencies and errors for one run.
+
+Everything is aggregated as it happens: a call adds one to a counter and one
+to a latency histogram bucket, and an error adds one to its errno's count,
+so collecting stays cheap enough to leave on for every batch and its memory
+does not grow with the number of files. Percentiles are read back from the
+histogram, whose buckets are a quarter of a power of two wide (within 25%).
+
+A finished run is appended as JSON lines to a report next to the folder,
+``<folder>.rename-report.jsonl``: one record per phase, then a summary.
+"""
+import errno as errno_names
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import ContextManager, Dict, Iterator, List, Optional
+
+from .paths import state_dir
+
+REPORT_SUFFIX = ".rename-report.jsonl"
+
+# Percentiles written to the report
+PERCENTILES = (50, 90, 99)
+
+# Sub-buckets per power of two in the latency histogram
+_STEPS = 4
+_STEP_BITS = 2
+
+
+class Histogram:
+    """Latencies in nanoseconds, counted in log-scale buckets."""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.max_ns = 0
+
+    def add(self, ns: int) -> None:
+        # The bucket is the bit length plus the next two bits, a cheap log2
+        bits = ns.bit_length()
+        if bits > _STEP_BITS:
+            bucket = (bits << _STEP_BITS) | ((ns >> (bits - 1 - _STEP_BITS)) & (_STEPS - 1))
+        else:
+            bucket = ns
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    @staticmethod
+    def _upper_bound(bucket: int) -> int:
+        bits, step = bucket >> _STEP_BITS, bucket & (_STEPS - 1)
+        if bits <= _STEP_BITS:
+            return bucket
+        return ((_STEPS + step + 1) << (bits - 1 - _STEP_BITS)) - 1
+
+    def percentile(self, percent: float) -> int:
+        """Return an upper bound on the given percentile, in nanoseconds."""
+        if not self.total:
+            return 0
+        rank = max(1, -(-self.total * percent // 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._upper_bound(bucket), self.max_ns)
+        return self.max_ns
+
+
+class CallStats:
+    """Aggregates for one kind of system call within a phase."""
+
+    def __init__(self):
+        self.calls = 0
+        self.latency = Histogram()
+        self.errors: Dict[str, int] = {}    # by errno name, e.g. "EACCES"
+
+    def record(self, ns: int, error: Optional[OSError] = None) -> None:
+        self.calls += 1
+        self.latency.add(ns)
+        if error is not None:
+            name = errno_names.errorcode.get(error.errno, str(error.errno)) if error.errno else "unknown"
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def count(self, calls: int = 1) -> None:
+        """Count calls that were not timed one by one."""
+        self.calls += calls
+
+
+@dataclass
+class PhaseStats:
+    """Wall time, files and calls of one phase; repeated phases add up."""
+
+    name: str
+    seconds: float = 0.0
+    files: int = 0
+    calls: Dict[str, CallStats] = field(default_factory=dict)   # by call, e.g. "rename"
+    counts: Dict[str, int] = field(default_factory=dict)        # anything else worth counting
+
+    def call(self, name: str) -> CallStats:
+        stats = self.calls.get(name)
+        if stats is None:
+            stats = self.calls[name] = CallStats()
+        return stats
+
+    def add(self, counter: str, amount: int = 1) -> None:
+        self.counts[counter] = self.counts.get(counter, 0) + amount
+
+    def record(self) -> dict:
+        calls = {}
+        for name, stats in self.calls.items():
+            entry: Dict[str, object] = {"calls": stats.calls}
+            if stats.latency.total:
+                entry.update({f"p{percent}_us": round(stats.latency.percentile(percent) / 1000, 1)
+                              for percent in PERCENTILES})
+                entry["max_us"] = round(stats.latency.max_ns / 1000, 1)
+            if stats.errors:
+                entry["errors"] = dict(stats.errors)
+            calls[name] = entry
+        return {"type": "phase", "phase": self.name, "seconds": round(self.seconds, 6),
+                "files": self.files, "calls": calls, "counts": dict(self.counts)}
+
+
+class RunStats:
+    """The phases of one scan, plan and rename run of a folder."""
+
+    def __init__(self, folder: str, kind: str = "rename"):
+        self.folder = os.path.abspath(folder)
+        self.kind = kind
+        self.started = time.time()
+        self.phases: Dict[str, PhaseStats] = {}
+
+    def phase_stats(self, name: str) -> PhaseStats:
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(name)
+        return stats
+
+    @contextmanager
+    def phase(self, name: str, files: int = 0) -> Iterator[PhaseStats]:
+        """Time a block as (part of) a phase.
+
+        Args:
+            name: The phase, e.g. "scan", "plan", "collisions" or "rename"
+            files: Files handled in the block, if known up front
+
+        Yields:
+            The phase, for counting calls and files inside the block
+        """
+        stats = self.phase_stats(name)
+        stats.files += files
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+
+    def discard(self, *names: str) -> None:
+        """Forget phases that are about to be redone, such as a plan after a template change."""
+        for name in names:
+            self.phases.pop(name, None)
+
+    def errors(self) -> Dict[str, int]:
+        """Errors of every phase, by errno name."""
+        totals: Dict[str, int] = {}
+        for phase in self.phases.values():
+            for call in phase.calls.values():
+                for name, count in call.errors.items():
+                    totals[name] = totals.get(name, 0) + count
+        return totals
+
+    def records(self) -> List[dict]:
+        """The report records: one per phase, then the run summary."""
+        records = [phase.record() for phase in self.phases.values()]
+        records.append({
+            "type": "run", "kind": self.kind, "folder": self.folder,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": round(sum(phase.seconds for phase in self.phases.values()), 6),
+            "errors": self.errors(),
+        })
+        return records
+
+    def summary(self) -> str:
+        """Describe the run in a few lines for the window or the terminal."""
+        lines = []
+        for phase in self.phases.values():
+            line = f"{phase.name}: {phase.seconds:.2f}s"
+            if phase.files:
+                line += f", {phase.files} files"
+            for name, call in phase.calls.items():
+                line += f", {call.calls} {name}"
+                if call.latency.total:
+                    line += (f" (p50 {call.latency.percentile(50) / 1000:.0f}us,"
+                             f" p99 {call.latency.percentile(99) / 1000:.0f}us)")
+            lines.append(line)
+        errors = self.errors()
+        if errors:
+            lines.append("errors: " + ", ".join(f"{count} {name}" for name, count in sorted(errors.items())))
+        return "\n".join(lines)
+
+    def write_report(self, path: Optional[str] = None) -> str:
+        """Append the run to its JSON-lines report.
+
+        Args:
+            path: The report file, defaulting to ``report_path(folder)``
+
+        Returns:
+            The report's path
+        """
+        path = path or report_path(self.folder)
+        lines = "".join(json.dumps(record) + "\n" for record in self.records())
+        try:
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
+        except OSError:
+            if path != report_path(self.folder):
+                raise
+            # The card's parent may be read-only; keep the report with the app's state instead
+            path = os.path.join(state_dir("reports"), os.path.basename(path))
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
+        return path
+
+
+def measure(stats: Optional[RunStats], name: str, files: int = 0) -> ContextManager[Optional[PhaseStats]]:
+    """``stats.phase(name, files)``, or a block that records nothing when there are no stats."""
+    return stats.phase(name, files) if stats is not None else nullcontext()
+
+
+def report_path(folder: str) -> str:
+    """Where a folder's run report goes: beside the folder, not inside it, so it is never renamed."""
+    return os.path.abspath(folder).rstrip(os.sep) + REPORT_SUFFIX
@@ -0,0 +1,151 @@
+"""Pairing of sound takes (OAF) with the camera clips (OCF) shot alongside them.
+
+A camera clip and a sound take belong together when their timecode ranges
+overlap. The takes are put in an ``IntervalIndex``, and each clip looks up
+the takes it overlaps by bisection, so pairing n clips with m takes costs
+O((n + m) log m) plus the pairs found rather than n * m comparisons, even
+when a long take overlaps most clips. Timecode repeats every day, so a take
+is paired with the clips of its own shoot date first. Camera headers date a
+clip in UTC while sound reports date a take in local time, so near midnight
+the two can fall on neighbouring dates; takes that find no clip on their own
+date are then paired with the clips of the day before and after.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from .metadata import QUICKTIME_EXTENSIONS, WAVE_EXTENSIONS, MediaInfo
+
+# Containers that hold camera clips; .m4a is sound only
+VIDEO_EXTENSIONS = QUICKTIME_EXTENSIONS - {".m4a"}
+AUDIO_EXTENSIONS = WAVE_EXTENSIONS
+
+_Interval = Tuple[float, float, str]
+
+
+class IntervalIndex:
+    """Named time ranges, searched for the ones that overlap a query.
+
+    The ranges are kept as a nested containment list: sorted by start, with
+    each range that lies inside another moved to a sublist of that range.
+    No range in a list contains another, so the ends rise with the starts
+    and both bounds of a query are found by bisection; a sublist is searched
+    only when the range holding it overlaps the query. A query costs
+    O(log n + k) per level of nesting, so one take that runs all day, such
+    as room tone, does not slow down the lookups that come after it.
+    """
+
+    def __init__(self, intervals: Iterable[_Interval]):
+        """Build the index.
+
+        Args:
+            intervals: (start, end, name) triples, in seconds
+        """
+        # Longer ranges first on equal starts, so they hold the ones inside them
+        items = sorted(intervals, key=lambda item: (item[0], -item[1], item[2]))
+        self._count = len(items)
+        # Each list holds starts, ends, names and the sublist under each range (0 for none)
+        self._lists: List[Tuple[List[float], List[float], List[str], List[int]]] = [([], [], [], [])]
+        # The ranges that may hold the next one, innermost last: (end, list, position)
+        holders: List[Tuple[float, int, int]] = []
+        for start, end, name in items:
+            while holders and holders[-1][0] < end:
+                holders.pop()
+            level = 0
+            if holders:
+                _, parent, position = holders[-1]
+                children = self._lists[parent][3]
+                if not children[position]:
+                    children[position] = len(self._lists)
+                    self._lists.append(([], [], [], []))
+                level = children[position]
+            starts, ends, names, children = self._lists[level]
+            starts.append(start)
+            ends.append(end)
+            names.append(name)
+            children.append(0)
+            holders.append((end, level, len(starts) - 1))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def overlapping(self, start: float, end: float) -> Iterator[_Interval]:
+        """Yield the ranges that overlap ``[start, end)``."""
+        pending = [0]
+        while pending:
+            starts, ends, names, children = self._lists[pending.pop()]
+            for i in range(bisect_right(ends, start), bisect_left(starts, end)):
+                yield starts[i], ends[i], names[i]
+                if children[i]:
+                    pending.append(children[i])
+
+
+def _extension(name: str) -> str:
+    _, dot, ext = name.rpartition(".")
+    return "." + ext.lower() if dot else ""
+
+
+def _intervals(metadata: Mapping[str, Optional[MediaInfo]]
+               ) -> Tuple[Dict[Optional[str], List[_Interval]], Dict[Optional[str], List[_Interval]]]:
+    """Split files with a start timecode and duration into clips and takes by shoot date."""
+    clips: Dict[Optional[str], List[_Interval]] = {}
+    takes: Dict[Optional[str], List[_Interval]] = {}
+    for name, info in metadata.items():
+        if info is None or info.start_seconds is None or not info.duration:
+            continue
+        ext = _extension(name)
+        if ext in VIDEO_EXTENSIONS:
+            side = clips
+        elif ext in AUDIO_EXTENSIONS:
+            side = takes
+        else:
+            continue
+        side.setdefault(info.shoot_date, []).append(
+            (info.start_seconds, info.start_seconds + info.duration, name))
+    return clips, takes
+
+
+def _neighbours(date: Optional[str]) -> List[str]:
+    """The shoot dates the day before and after ``date``, in YYMMDD form."""
+    if date is None:
+        return []
+    day = datetime.strptime(date, "%y%m%d")
+    return [(day + timedelta(days=step)).strftime("%y%m%d") for step in (-1, 1)]
+
+
+def _pair(index: IntervalIndex, clips: List[_Interval]) -> Dict[str, str]:
+    """Pair each take in ``index`` with the clip it overlaps the most."""
+    matches: Dict[str, str] = {}
+    best: Dict[str, float] = {}
+    # Clips in start order, so on equal overlap the earlier clip keeps the take
+    for start, end, clip in sorted(clips):
+        for take_start, take_end, take in index.overlapping(start, end):
+            overlap = min(end, take_end) - max(start, take_start)
+            if overlap > best.get(take, 0.0):
+                best[take] = overlap
+                matches[take] = clip
+    return matches
+
+
+def match_takes(metadata: Mapping[str, Optional[MediaInfo]]) -> Dict[str, str]:
+    """Pair each sound take with the camera clip it overlaps the most.
+
+    Args:
+        metadata: Header metadata by file name, for camera clips and sound
+            takes alike; files without a start timecode and duration are left out
+
+    Returns:
+        The camera clip's name for each sound take that overlaps one
+    """
+    clips, takes = _intervals(metadata)
+    matches: Dict[str, str] = {}
+    for date, day_takes in takes.items():
+        # Clips of the take's own date first; the neighbouring dates only pair what they leave
+        for dates in ([date], _neighbours(date)):
+            day_clips = [clip for day in dates for clip in clips.get(day, ())]
+            if day_clips:
+                matches.update(_pair(IntervalIndex(day_takes), day_clips))
+                day_takes = [take for take in day_takes if take[2] not in matches]
+            if not day_takes:
+                break
+    return matches
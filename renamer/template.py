@@ -0,0 +1,354 @@
+"""Naming templates: a small token language compiled once and applied per batch.
+
+A template is literal text with bracketed tokens, for example the Netflix
+default ``[cameraRoll]_[clipName]_[shootDate-YYMMDD]``. Compiling turns it
+into a single ``str.format`` pattern plus the list of per-file columns it
+needs; rendering computes each column for a chunk of files in one pass
+and formats the names with ``map``, so no token is re-parsed per file and
+the columns of a million-file batch never exist at once.
+
+Tokens:
+    [cameraRoll]           The camera roll (the header reel when available)
+    [clipPrefix]           The clip prefix field
+    [clipName]             Clip prefix plus the clip number read from the
+                           original name by the vendor parsers (see
+                           ``renamer.filenames``); for names no parser
+                           recognises, the numbers in the name, or the
+                           file's position when it has none. A sound take
+                           matched to a camera clip gets the clip's
+                           number
+    [originalClipName]     The original name without its extension
+    [shootDate-FORMAT]     The shoot date; FORMAT combines YYYY, YY, MM and DD
+    [counter-N]            The file's position, zero-padded to N digits
+    [scene] [take]         Slate fields from the file header, if any; the
+                           take falls back to the one in the file name
+    [ext] [ext-lower] [ext-upper]
+                           The original extension (with its dot), as is or
+                           case-folded; appended as is when no [ext] appears
+
+``[[`` and ``]]`` write literal brackets.
+"""
+import json
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .filenames import ParsedName, parse_names
+from .metadata import MediaInfo
+from .paths import state_dir
+
+DEFAULT_TEMPLATE = "[cameraRoll]_[clipName]_[shootDate-YYMMDD]"
+
+_DIGITS = re.compile(r'\d+')
+_TOKEN = re.compile(r'\[\[|\]\]|\[([A-Za-z]+)(?:-([^\[\]]*))?\]|[\[\]]')
+_DATE_PART = re.compile(r'YYYY|YY|MM|DD|[A-Za-z]')
+_DATE_CODES = {"YYYY": "%Y", "YY": "%y", "MM": "%m", "DD": "%d"}
+_UNSAFE = re.compile(r'[^A-Za-z0-9_-]+')
+
+# The form of the Date field in the window and on the command line
+_FIELD_DATE_FORMAT = "%y%m%d"
+
+# Files rendered together; the per-token columns only exist for one chunk
+_RENDER_CHUNK = 65536
+
+
+class TemplateError(ValueError):
+    """Raised for a template that cannot be compiled."""
+
+
+def _date_format(spec: str) -> str:
+    """Translate a YYYY/YY/MM/DD date pattern into a strftime format."""
+    parts = []
+    position = 0
+    for match in _DATE_PART.finditer(spec):
+        parts.append(spec[position:match.start()].replace("%", "%%"))
+        code = _DATE_CODES.get(match.group())
+        if code is None:
+            raise TemplateError(f"Unknown date field '{match.group()}' in shootDate-{spec}")
+        parts.append(code)
+        position = match.end()
+    parts.append(spec[position:].replace("%", "%%"))
+    return "".join(parts)
+
+
+def _check_literal(text: str) -> None:
+    """Refuse template text that would put a renamed file in another folder."""
+    for separator in filter(None, (os.sep, os.altsep)):
+        if separator in text:
+            raise TemplateError(f"The template cannot contain '{separator}'; names stay in their folder")
+    if ".." in text:
+        raise TemplateError("The template cannot contain '..'")
+
+
+def _safe(value: Optional[str]) -> str:
+    return _UNSAFE.sub("_", value.strip()).strip("_") if value else ""
+
+
+def _fallback_number(stem: str, index: int) -> str:
+    # The numbers in a name no parser recognises, or its position when it has none
+    numbers = _DIGITS.findall(stem)
+    return "_".join(numbers) if numbers else f"{index:03d}"
+
+
+def _name_date(name: Optional[ParsedName], fmt: str) -> Optional[str]:
+    if name is None or not name.date:
+        return None
+    try:
+        return datetime.strptime(name.date, _FIELD_DATE_FORMAT).strftime(fmt)
+    except ValueError:
+        return None
+
+
+class Template:
+    """A compiled naming template.
+
+    Compile templates with ``compile_template``, which caches them, rather
+    than constructing this class directly.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._pattern, self._columns = self._compile(text)
+        kinds = {kind for kind, _ in self._columns}
+        # Whether a name no vendor parser recognises gets a fallback clip number
+        self.uses_clip_name = "clipName" in kinds
+        self._reads_names = bool(kinds & {"clipName", "take", "cameraRoll", "shootDate"})
+
+    def __repr__(self) -> str:
+        return f"Template({self.text!r})"
+
+    @staticmethod
+    def _compile(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+        pattern: List[str] = []
+        columns: List[Tuple[str, str]] = []
+        has_ext = False
+        position = 0
+
+        def column(kind: str, arg: str = "", spec: str = "") -> None:
+            pattern.append(f"{{{len(columns)}{spec}}}")
+            columns.append((kind, arg))
+
+        for match in _TOKEN.finditer(text):
+            literal = text[position:match.start()]
+            _check_literal(literal)
+            pattern.append(literal.replace("{", "{{").replace("}", "}}"))
+            position = match.end()
+            token, arg = match.group(1), match.group(2)
+            if match.group() in ("[[", "]]"):
+                pattern.append(match.group()[0])
+            elif token is None:
+                raise TemplateError(f"Unmatched '{match.group()}' at position {match.start() + 1}")
+            elif token in ("cameraRoll", "clipPrefix", "clipName", "originalClipName",
+                           "scene", "take") and arg is None:
+                column(token)
+            elif token == "shootDate":
+                _check_literal(arg or "")
+                column(token, _date_format(arg or "YYMMDD"))
+            elif token == "counter":
+                if arg is not None and not arg.isdigit():
+                    raise TemplateError(f"counter padding must be a number, not '{arg}'")
+                column(token, spec=f":0{int(arg or 3)}d")
+            elif token == "ext" and arg in (None, "lower", "upper"):
+                column(token, arg or "")
+                has_ext = True
+            else:
+                name = token if arg is None else f"{token}-{arg}"
+                raise TemplateError(f"Unknown token [{name}]")
+        _check_literal(text[position:])
+        pattern.append(text[position:].replace("{", "{{").replace("}", "}}"))
+
+        if not columns and not text.strip():
+            raise TemplateError("The template is empty")
+        if not has_ext:
+            column("ext")
+        return "".join(pattern), columns
+
+    def render(self, files: Sequence[str], camera_roll: str, clip_prefix: str, date: str,
+               metadata: Optional[Mapping[str, Optional[MediaInfo]]] = None,
+               start: int = 1, clip_sources: Optional[Mapping[str, str]] = None,
+               parsed: Optional[Sequence[Optional[ParsedName]]] = None) -> List[str]:
+        """Name a list of files in one pass.
+
+        Args:
+            files: The original file names, in display order; names may include
+                a subfolder, which is kept
+            camera_roll: The camera roll field
+            clip_prefix: The clip prefix field
+            date: The date field, normally YYMMDD
+            metadata: Header metadata by file name; header values override the fields
+            start: The position of the first file, used by [counter] and [clipName]
+            clip_sources: For files that share another file's clip, such as
+                sound takes matched to camera clips, the name [clipName] is
+                taken from
+            parsed: The result of ``parse`` for these files, when the caller
+                already has it
+
+        Returns:
+            The new names, one per file
+        """
+        if len(files) <= _RENDER_CHUNK:
+            return self._render(files, camera_roll, clip_prefix, date, metadata, start, clip_sources, parsed)
+        names: List[str] = []
+        for offset in range(0, len(files), _RENDER_CHUNK):
+            stop = offset + _RENDER_CHUNK
+            names.extend(self._render(files[offset:stop], camera_roll, clip_prefix, date, metadata,
+                                      start + offset, clip_sources, parsed and parsed[offset:stop]))
+        return names
+
+    def parse(self, files: Sequence[str],
+              clip_sources: Optional[Mapping[str, str]] = None) -> Optional[List[Optional[ParsedName]]]:
+        """Read the fields of the names the template's tokens come from.
+
+        Args:
+            files: The original file names
+            clip_sources: As for ``render``; a matched sound take reads its camera clip's name
+
+        Returns:
+            One parse per file, None for names no parser recognises, or None
+            altogether when no token reads the names
+        """
+        if not self._reads_names:
+            return None
+        if clip_sources:
+            files = [clip_sources.get(name, name) for name in files]
+        return parse_names(files)
+
+    def _render(self, files: Sequence[str], camera_roll: str, clip_prefix: str, date: str,
+                metadata: Optional[Mapping[str, Optional[MediaInfo]]],
+                start: int, clip_sources: Optional[Mapping[str, str]],
+                parsed: Optional[Sequence[Optional[ParsedName]]]) -> List[str]:
+        if not files:
+            return []
+        # Typed-in fields are cleaned like header values, so none of them can name a folder
+        camera_roll, clip_prefix, date = _safe(camera_roll), _safe(clip_prefix), _safe(date)
+        infos = [metadata.get(name) for name in files] if metadata else None
+        if parsed is None:
+            parsed = self.parse(files, clip_sources)
+        originals = files
+        # Names from a tree scan carry their subfolder, which tokens never see
+        folders = None
+        if any(os.sep in name or "/" in name for name in files):
+            folders, files = zip(*map(os.path.split, files))
+        splits: List[Tuple[str, str]] = []
+
+        def split() -> List[Tuple[str, str]]:
+            if not splits:
+                splits.extend(os.path.splitext(name) for name in files)
+            return splits
+
+        values: List[Sequence] = []
+        for kind, arg in self._columns:
+            if kind == "cameraRoll":
+                if infos:
+                    # Header first, then the name, then the field
+                    values.append([_safe(info and info.camera_roll) or (name and name.roll) or camera_roll
+                                   for info, name in zip(infos, parsed)])
+                else:
+                    values.append([camera_roll] * len(files))
+            elif kind == "clipPrefix":
+                values.append([clip_prefix] * len(files))
+            elif kind == "clipName":
+                stems = [stem for stem, _ in split()]
+                if clip_sources:
+                    stems = [os.path.splitext(os.path.basename(clip_sources[original]))[0]
+                             if original in clip_sources else stem for original, stem in zip(originals, stems)]
+                values.append([clip_prefix + ((name and name.number) or _fallback_number(stem, i))
+                               for i, (name, stem) in enumerate(zip(parsed, stems), start)])
+            elif kind == "originalClipName":
+                values.append([stem for stem, _ in split()])
+            elif kind == "shootDate":
+                values.append(self._dates(arg, date, infos, parsed, len(files)))
+            elif kind == "counter":
+                values.append(range(start, start + len(files)))
+            elif kind == "scene":
+                values.append([_safe(info and info.scene) for info in infos] if infos else [""] * len(files))
+            elif kind == "take":
+                headers = infos or [None] * len(files)
+                values.append([_safe((info and info.take) or (name and name.take))
+                               for info, name in zip(headers, parsed)])
+            elif kind == "ext":
+                if arg == "lower":
+                    values.append([ext.lower() for _, ext in split()])
+                elif arg == "upper":
+                    values.append([ext.upper() for _, ext in split()])
+                else:
+                    values.append([ext for _, ext in split()])
+        names = list(map(self._pattern.format, *values))
+        if folders is not None:
+            join = os.path.join
+            names = [join(folder, name) if folder else name for folder, name in zip(folders, names)]
+        return names
+
+    @staticmethod
+    def _dates(fmt: str, date: str, infos: Optional[List[Optional[MediaInfo]]],
+               parsed: Sequence[Optional[ParsedName]], count: int) -> List[str]:
+        # The field is used verbatim in its own format, so free-form dates still work
+        if fmt == _FIELD_DATE_FORMAT:
+            field_date = date
+        else:
+            try:
+                field_date = datetime.strptime(date, _FIELD_DATE_FORMAT).strftime(fmt)
+            except ValueError:
+                field_date = date
+        if not infos:
+            return [field_date] * count
+        # Header first, then the name, then the field
+        return [info.creation_date.strftime(fmt) if info and info.creation_date
+                else _name_date(name, fmt) or field_date
+                for info, name in zip(infos, parsed)]
+
+
+@lru_cache(maxsize=32)
+def compile_template(text: str) -> Template:
+    """Compile a template, reusing an earlier compilation of the same text.
+
+    Args:
+        text: The template source
+
+    Returns:
+        The compiled template
+
+    Raises:
+        TemplateError: If the template has an unknown token or stray bracket
+    """
+    return Template(text)
+
+
+class TemplateStore:
+    """Templates saved per project, kept in a JSON file in the state folder."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(state_dir(), "templates.json")
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._templates: Dict[str, str] = json.load(f)
+        except (OSError, ValueError):
+            self._templates = {}
+
+    def projects(self) -> List[str]:
+        return sorted(self._templates, key=str.lower)
+
+    def get(self, project: str, default: str = DEFAULT_TEMPLATE) -> str:
+        return self._templates.get(project, default)
+
+    def save(self, project: str, text: str) -> None:
+        """Store a project's template after checking that it compiles.
+
+        Raises:
+            TemplateError: If the template is invalid
+        """
+        compile_template(text)
+        self._templates[project] = text
+        self._write()
+
+    def delete(self, project: str) -> None:
+        if self._templates.pop(project, None) is not None:
+            self._write()
+
+    def _write(self) -> None:
+        temp = self.path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(self._templates, f, indent=2, sort_keys=True)
+        os.replace(temp, self.path)
@@ -0,0 +1,411 @@
+"""Checksum verification and ASC-MHL manifests for rename batches.
+
+Files are hashed before they are renamed, compared with any MHL the offload
+left in the folder, and the batch is recorded as a new ASC-MHL generation that
+maps each original name to its new name and checksum. Hashing uses large
+sequential reads on a thread pool per storage device: hashlib and xxhash drop
+the GIL while digesting large buffers, so throughput is bound by the disks
+rather than by one core or one file at a time.
+"""
+import hashlib
+import os
+import re
+import socket
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from . import engine
+from .executor import Concurrency
+from .stats import RunStats, measure
+
+try:
+    import xxhash
+except ImportError:  # optional; MD5 is always available
+    xxhash = None
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Concurrent readers per device; spinning disks get one so reads stay sequential
+WORKERS_PER_DEVICE = 4
+
+MHL_FOLDER = "ascmhl"
+MHL_NAMESPACE = "urn:ASC:MHL:v2.0"
+TOOL_NAME = "Footage Renamer"
+
+_C4_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_GENERATION = re.compile(r'^(\d{4})_.*\.mhl$')
+
+
+def available_algorithms() -> List[str]:
+    """Return the supported checksum algorithms, preferred first."""
+    return ["xxh64", "md5"] if xxhash is not None else ["md5"]
+
+
+def _new_hasher(algorithm: str):
+    if algorithm == "xxh64":
+        if xxhash is None:
+            raise ValueError("xxh64 needs the 'xxhash' package; use md5 instead")
+        return xxhash.xxh64()
+    if algorithm == "md5":
+        return hashlib.md5()
+    raise ValueError(f"Unsupported checksum algorithm: {algorithm}")
+
+
+def hash_file(path: str, algorithm: str = "md5", chunk_size: int = CHUNK_SIZE) -> str:
+    """Hash a file with large sequential reads into a reused buffer.
+
+    Args:
+        path: The file to hash
+        algorithm: "xxh64" or "md5"
+        chunk_size: Bytes per read
+
+    Returns:
+        The lowercase hex digest
+    """
+    hasher = _new_hasher(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as fh:
+        # Let the kernel read ahead aggressively for the whole file
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(fh.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        while True:
+            n = fh.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def _device_workers(device: int) -> int:
+    """Pick the reader count for a device, using one for rotational disks on Linux."""
+    try:
+        with open(f"/sys/dev/block/{os.major(device)}:{os.minor(device)}/queue/rotational") as fh:
+            if fh.read().strip() == "1":
+                return 1
+    except (OSError, AttributeError, ValueError):
+        pass
+    return WORKERS_PER_DEVICE
+
+
+def hash_files(paths: Iterable[str], algorithm: str = "md5",
+               progress: Optional[Callable[[int, int], None]] = None,
+               cancel: Optional[threading.Event] = None,
+               workers_per_device: Optional[int] = None) -> Dict[str, str]:
+    """Hash many files concurrently, with a separate thread pool per device.
+
+    Args:
+        paths: The files to hash
+        algorithm: "xxh64" or "md5"
+        progress: Optional callback receiving (files done, total files)
+        cancel: Optional event; once set, files not yet started are skipped
+        workers_per_device: Readers per device, detected per device when omitted
+
+    Returns:
+        The digest for each file that was hashed; unreadable files map to ""
+    """
+    by_device: Dict[int, List[Tuple[int, str]]] = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        by_device.setdefault(st.st_dev, []).append((st.st_size, path))
+
+    def job(path: str) -> str:
+        if cancel is not None and cancel.is_set():
+            return ""
+        try:
+            return hash_file(path, algorithm)
+        except OSError:
+            return ""
+
+    digests: Dict[str, str] = {}
+    total = sum(len(files) for files in by_device.values())
+    pools = []
+    futures = {}
+    try:
+        for device, files in by_device.items():
+            pool = ThreadPoolExecutor(max_workers=workers_per_device or _device_workers(device))
+            pools.append(pool)
+            # Largest files first so one big clip doesn't finish the batch alone
+            for _, path in sorted(files, reverse=True):
+                futures[pool.submit(job, path)] = path
+        for done, future in enumerate(as_completed(futures), 1):
+            digests[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, total)
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+    return digests
+
+
+def _mhl_hashes(element: ET.Element, namespace: str) -> Dict[str, str]:
+    hashes = {}
+    for child in element:
+        tag = child.tag.replace(namespace, "")
+        text = (child.text or "").strip().lower()
+        if tag in ("md5", "xxh64"):
+            hashes[tag] = text
+        elif tag == "xxhash64be":
+            hashes["xxh64"] = text
+        elif tag == "xxhash64" and text.isdigit():
+            hashes["xxh64"] = f"{int(text):016x}"
+    return hashes
+
+
+def load_reference_hashes(folder: str) -> Dict[str, Dict[str, str]]:
+    """Read the checksums recorded by the offload, if it left an MHL behind.
+
+    Both ASC-MHL v2 generations (``ascmhl/*.mhl``) and legacy v1 ``*.mhl``
+    files in the folder are read. Later generations override earlier ones.
+
+    Args:
+        folder: The offloaded folder
+
+    Returns:
+        Digests by algorithm for each path relative to the folder
+    """
+    candidates = []
+    mhl_dir = os.path.join(folder, MHL_FOLDER)
+    if os.path.isdir(mhl_dir):
+        candidates.extend(os.path.join(mhl_dir, name) for name in sorted(os.listdir(mhl_dir))
+                          if name.endswith(".mhl"))
+    candidates.extend(os.path.join(folder, name) for name in sorted(os.listdir(folder))
+                      if name.lower().endswith(".mhl"))
+
+    reference: Dict[str, Dict[str, str]] = {}
+    for path in candidates:
+        try:
+            root = ET.parse(path).getroot()
+        except (ET.ParseError, OSError):
+            continue
+        namespace = root.tag[:root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+        for entry in root.iter(f"{namespace}hash"):
+            name = entry.find(f"{namespace}path")
+            if name is None:
+                name = entry.find(f"{namespace}file")
+            if name is None or not name.text:
+                continue
+            hashes = _mhl_hashes(entry, namespace)
+            if hashes:
+                reference.setdefault(name.text.strip().replace("\\", "/"), {}).update(hashes)
+    return reference
+
+
+def _c4_id(path: str) -> str:
+    """Compute the C4 ID (SHA-512, base58) that ASC-MHL chain files use."""
+    digest = hashlib.sha512()
+    with open(path, "rb") as fh:
+        digest.update(fh.read())
+    value = int.from_bytes(digest.digest(), "big")
+    encoded = ""
+    while value:
+        value, remainder = divmod(value, 58)
+        encoded = _C4_ALPHABET[remainder] + encoded
+    return "c4" + encoded.rjust(88, "1")
+
+
+def _timestamp(seconds: Optional[float] = None) -> str:
+    moment = datetime.fromtimestamp(seconds if seconds is not None else time.time(), timezone.utc)
+    return moment.replace(microsecond=0).isoformat()
+
+
+def write_manifest(folder: str, records: Iterable[Tuple[str, str, int, float, str, str]],
+                   algorithm: str, algorithms: Optional[Dict[str, str]] = None) -> str:
+    """Write the batch as a new ASC-MHL generation and append it to the chain.
+
+    Args:
+        folder: The folder the batch ran in
+        records: (original name, new name, size, mtime, digest, action) per file,
+            where action is "original" or "verified"
+        algorithm: The checksum algorithm used
+        algorithms: The algorithm by original name for files hashed with
+            another one than ``algorithm``
+
+    Returns:
+        The path of the manifest written
+    """
+    mhl_dir = os.path.join(folder, MHL_FOLDER)
+    os.makedirs(mhl_dir, exist_ok=True)
+    generations = [int(m.group(1)) for m in map(_GENERATION.match, os.listdir(mhl_dir)) if m]
+    generation = max(generations, default=0) + 1
+    now = _timestamp()
+    folder_name = os.path.basename(os.path.abspath(folder))
+    file_name = f"{generation:04d}_{folder_name}_{now.replace(':', '')[:17]}Z.mhl"
+    path = os.path.join(mhl_dir, file_name)
+
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<hashlist version="2.0" xmlns="{MHL_NAMESPACE}">',
+        "  <creatorinfo>",
+        f"    <creationdate>{now}</creationdate>",
+        f"    <hostname>{escape(socket.gethostname())}</hostname>",
+        f'    <tool version="1.0">{TOOL_NAME}</tool>',
+        "  </creatorinfo>",
+        "  <processinfo>",
+        "    <process>in-place</process>",
+        "  </processinfo>",
+        "  <hashes>",
+    ]
+    algorithms = algorithms or {}
+    for original, new_name, size, mtime, digest, action in records:
+        kind = algorithms.get(original, algorithm)
+        lines.append("    <hash>")
+        lines.append(f'      <path size="{size}" lastmodificationdate="{_timestamp(mtime)}">'
+                     f"{escape(new_name)}</path>")
+        if original != new_name:
+            lines.append(f"      <previousPath>{escape(original)}</previousPath>")
+        lines.append(f'      <{kind} action="{action}" hashdate="{now}">{digest}</{kind}>')
+        lines.append("    </hash>")
+    lines.extend(["  </hashes>", "</hashlist>", ""])
+
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(lines))
+
+    _append_to_chain(mhl_dir, generation, file_name, _c4_id(path))
+    return path
+
+
+def _append_to_chain(mhl_dir: str, generation: int, file_name: str, c4: str) -> None:
+    """Add a generation to ``ascmhl_chain.xml``, which lists each manifest with its C4 ID."""
+    chain_path = os.path.join(mhl_dir, "ascmhl_chain.xml")
+    ns = f"{{{MHL_NAMESPACE}}}"
+    entries = []
+    if os.path.exists(chain_path):
+        try:
+            for item in ET.parse(chain_path).getroot().iter(f"{ns}hashlist"):
+                entries.append((item.get("sequencenr", ""), item.findtext(f"{ns}path", ""),
+                                item.findtext(f"{ns}c4", "")))
+        except ET.ParseError:
+            entries = []
+    entries.append((str(generation), file_name, c4))
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<ascmhldirectory xmlns="{MHL_NAMESPACE}">']
+    for sequence, name, c4_id in entries:
+        lines.append(f'  <hashlist sequencenr="{escape(sequence)}">')
+        lines.append(f"    <path>{escape(name)}</path>")
+        lines.append(f"    <c4>{escape(c4_id)}</c4>")
+        lines.append("  </hashlist>")
+    lines.extend(["</ascmhldirectory>", ""])
+    with open(chain_path, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(lines))
+
+
+def execute_verified(plan: engine.RenamePlan, algorithm: str = "md5",
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     cancel: Optional[threading.Event] = None,
+                     journal_dir: Optional[str] = None,
+                     concurrency: Optional[Concurrency] = None,
+                     stats: Optional[RunStats] = None) -> engine.RenameResult:
+    """Hash, check against the offload MHL, rename, and write a manifest.
+
+    Each file is checked with an algorithm the offload's MHL recorded for it,
+    ``algorithm`` where the MHL has it. Files whose checksum disagrees with the
+    MHL, and files it recorded only under algorithms that are not available,
+    are left under their original names and reported as errors.
+
+    Args:
+        plan: The plan to execute
+        algorithm: "xxh64" or "md5", preferred for files the offload recorded
+            under both and used for files it did not record
+        progress: Optional callback receiving (files done, total files)
+        cancel: Optional event that stops the batch early
+        journal_dir: Where to keep the rename journal
+        concurrency: Renames in flight per volume, detected when omitted
+        stats: Optional run stats to record the "hash" phase and the batch's phases in
+
+    Returns:
+        The rename result, with the manifest path set
+    """
+    folder = plan.folder
+    total = len(plan)
+
+    # Hashing fills the first half of the progress range, renaming the second
+    def hash_progress(done: int, _: int) -> None:
+        if progress is not None:
+            progress(done // 2, total)
+
+    def rename_progress(done: int, count: int) -> None:
+        if progress is not None:
+            progress(total // 2 + done * (total - total // 2) // max(count, 1), total)
+
+    reference = load_reference_hashes(folder)
+    errors = []
+    # Pick each file's algorithm from what the offload recorded for it
+    usable = available_algorithms()
+    algorithms: Dict[str, str] = {}
+    for entry in plan:
+        recorded = reference.get(entry.original)
+        choice = algorithm if not recorded or algorithm in recorded else next(
+            (name for name in usable if name in recorded), None)
+        if choice is None:
+            errors.append(f"Cannot verify '{entry.original}': the offload recorded only "
+                          f"{', '.join(sorted(recorded))}, which is not available")
+        else:
+            algorithms[entry.original] = choice
+
+    paths = {entry.original: os.path.join(folder, entry.original) for entry in plan}
+    groups: Dict[str, List[str]] = {}
+    for original, name in algorithms.items():
+        groups.setdefault(name, []).append(paths[original])
+    digests: Dict[str, str] = {}
+    with measure(stats, "hash", len(algorithms)):
+        hashed = 0
+        for name, group in groups.items():
+            digests.update(hash_files(group, name, lambda done, _, base=hashed: hash_progress(base + done, 0),
+                                      cancel))
+            hashed += len(group)
+    if cancel is not None and cancel.is_set():
+        return engine.RenameResult(cancelled=True, folder=folder,
+                                   not_renamed=[entry.original for entry in plan])
+
+    actions = {}
+    keep = []
+    for entry in plan:
+        if entry.original not in algorithms:
+            continue
+        digest = digests.get(paths[entry.original], "")
+        expected = reference.get(entry.original, {}).get(algorithms[entry.original])
+        if not digest:
+            errors.append(f"Could not read '{entry.original}' for verification")
+        elif expected and expected != digest:
+            errors.append(f"Checksum mismatch for '{entry.original}': "
+                          f"offload recorded {expected}, file has {digest}")
+        else:
+            actions[entry.original] = "verified" if expected else "original"
+            keep.append(entry)
+
+    # Files that failed keep their names, and so must any file planned to take one of them
+    held = {entry.original for entry in plan if entry.original not in actions}
+    result = engine.execute_plan(plan, rename_progress, cancel, journal_dir, concurrency, stats, held)
+    result.errors = errors + result.errors
+    result.not_renamed.extend(entry.original for entry in plan if entry.original not in actions)
+
+    # Record every verified file, under whichever name it now has
+    new_names = dict(result.renamed)
+    records = []
+    for entry in keep:
+        name = new_names.get(entry.original, entry.original)
+        try:
+            st = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        records.append((entry.original, name, st.st_size, st.st_mtime,
+                        digests[paths[entry.original]], actions[entry.original]))
+    if records:
+        try:
+            result.manifest = write_manifest(folder, records, algorithm, algorithms)
+        except OSError as e:
+            result.errors.append(f"Failed to write checksum manifest: {str(e)}")
+    return result
@@ -0,0 +1,195 @@
+"""Recursive scanning of camera and sound cards, one or more roots at a time.
+
+Each directory is listed with ``os.scandir`` as a separate task on a thread
+pool, and the subdirectories it finds are queued as new tasks, so a deep or
+wide tree on a network share is listed many directories at a time instead of
+waiting on one round trip after another. Listings are yielded as they finish.
+
+Card structures are recognised by ``VendorRule``: once a directory holds a
+vendor's marker, only that vendor's media files below it are renamed and its
+proxy, thumbnail and metadata folders are not descended into.
+"""
+import os
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Pattern, Sequence, Tuple
+
+from .cache import MHL_SUFFIX, FolderScan
+from .stats import REPORT_SUFFIX
+
+# Directories listed at once; listing is I/O bound, so this is well above the core count
+WALK_WORKERS = 16
+
+# Folders written by operating systems and offload tools, never media
+_SYSTEM_FOLDERS = frozenset({
+    ".spotlight-v100", ".fseventsd", ".trashes", ".temporaryitems", "__macosx",
+    "$recycle.bin", "system volume information",
+    "ascmhl",   # the ASC-MHL history of an offloaded card, see renamer.verify
+})
+
+
+@dataclass(frozen=True)
+class VendorRule:
+    """How one vendor lays out its cards."""
+
+    name: str
+    marker: Pattern                 # an entry name that identifies the card structure
+    media: FrozenSet[str]           # lower-case extensions renamed below the marker's folder
+    skip: FrozenSet[str] = frozenset()  # lower-case folder names not descended into
+
+
+VENDOR_RULES: Tuple[VendorRule, ...] = (
+    # Reel folders such as A001R1AB, holding MXF/MOV clips or ARRIRAW frame folders
+    VendorRule("ARRI", re.compile(r'^[A-Z]\d{3}R[A-Z0-9]{3,4}$'),
+               frozenset({".mxf", ".mov", ".ari", ".arx"})),
+    # A001_0101AB.RDM reel folders with one .RDC folder of R3D segments per clip
+    VendorRule("RED", re.compile(r'\.RDM$', re.IGNORECASE), frozenset({".r3d"})),
+    # XDCAM (XDROOT) and XAVC (PRIVATE/M4ROOT) cards keep the clips in Clip/CLIP
+    VendorRule("Sony", re.compile(r'^(XDROOT|M4ROOT)$'), frozenset({".mxf", ".mp4"}),
+               frozenset({"sub", "thmbnl", "general", "edit", "take", "proxy"})),
+    # Sound Devices recorders move discarded takes out of the way rather than deleting them
+    VendorRule("Sound Devices", re.compile(r'^FALSE TAKES$'), frozenset({".wav"}),
+               frozenset({"false takes", "trash"})),
+)
+
+
+@dataclass
+class DirListing:
+    """One directory of a tree scan."""
+
+    folder: str                     # the absolute path
+    relative: str                   # the path below the scan's base folder
+    names: List[str] = field(default_factory=list)  # every entry, relative to the base
+    files: List[str] = field(default_factory=list)  # files to rename, relative to the base
+    vendor: Optional[str] = None
+
+
+def scan_base(roots: Sequence[str]) -> Tuple[str, List[str]]:
+    """Find the folder a multi-root plan is relative to.
+
+    Args:
+        roots: The folders to scan
+
+    Returns:
+        The common parent folder and the roots, made absolute, with roots
+        inside other roots dropped
+
+    Raises:
+        ValueError: If the roots are on different drives
+    """
+    absolute = sorted({os.path.abspath(root) for root in roots})
+    kept: List[str] = []
+    for root in absolute:
+        if not any(root.startswith(os.path.join(parent, "")) for parent in kept):
+            kept.append(root)
+    if not kept:
+        raise ValueError("no folder to scan")
+    if len(kept) == 1:
+        return kept[0], kept
+    try:
+        return os.path.commonpath(kept), kept
+    except ValueError:
+        raise ValueError("folders on different drives must be scanned separately") from None
+
+
+_Subdirectory = Tuple[str, str, Optional[VendorRule]]
+
+
+def _list_directory(folder: str, relative: str,
+                    rule: Optional[VendorRule]) -> Tuple[DirListing, List[_Subdirectory]]:
+    """List one directory, returning its listing and the subdirectories to visit."""
+    with os.scandir(folder) as scanner:
+        entries = list(scanner)
+    if rule is None:
+        rule = next((candidate for candidate in VENDOR_RULES
+                     if any(candidate.marker.search(entry.name) for entry in entries)), None)
+
+    listing = DirListing(folder, relative, vendor=rule.name if rule else None)
+    subdirectories = []
+    for entry in entries:
+        path = os.path.join(relative, entry.name) if relative else entry.name
+        listing.names.append(path)
+        # Hidden entries include the ._ AppleDouble files macOS leaves on cards
+        if entry.name.startswith("."):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            lower = entry.name.lower()
+            if lower in _SYSTEM_FOLDERS or (rule is not None and lower in rule.skip):
+                continue
+            subdirectories.append((entry.path, path, rule))
+        elif (entry.is_file() and not entry.name.endswith(REPORT_SUFFIX)
+              and not entry.name.lower().endswith(MHL_SUFFIX)):
+            if rule is None or os.path.splitext(entry.name)[1].lower() in rule.media:
+                listing.files.append(path)
+    return listing, subdirectories
+
+
+def walk(roots: Sequence[str], workers: int = WALK_WORKERS,
+         cancel: Optional[threading.Event] = None) -> Iterator[DirListing]:
+    """List every directory below the roots concurrently.
+
+    Args:
+        roots: The folders to scan
+        workers: Directories listed at once
+        cancel: Optional event; once set, no further directories are listed
+
+    Yields:
+        One listing per directory, in completion order; names are relative
+        to the folder returned by ``scan_base``
+
+    Raises:
+        OSError: If a root cannot be listed; unreadable subdirectories are skipped
+    """
+    base, roots = scan_base(roots)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="walk") as pool:
+        pending: Dict[Future, bool] = {}
+        for root in roots:
+            relative = os.path.relpath(root, base)
+            pending[pool.submit(_list_directory, root,
+                                "" if relative == os.curdir else relative, None)] = True
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                is_root = pending.pop(future)
+                try:
+                    listing, subdirectories = future.result()
+                except OSError:
+                    if is_root:
+                        raise
+                    continue
+                if cancel is None or not cancel.is_set():
+                    for folder, relative, rule in subdirectories:
+                        pending[pool.submit(_list_directory, folder, relative, rule)] = False
+                yield listing
+
+
+def scan_tree(roots: Sequence[str],
+              on_listing: Optional[Callable[[DirListing], None]] = None,
+              cancel: Optional[threading.Event] = None,
+              workers: int = WALK_WORKERS) -> FolderScan:
+    """Scan one or more card roots recursively into a single listing.
+
+    File names in the result are relative to the roots' common parent, so a
+    plan built from it renames every file inside its own folder.
+
+    Args:
+        roots: The folders to scan
+        on_listing: Called with each directory's listing as soon as it is read
+        cancel: Optional event; once set, the scan stops early
+        workers: Directories listed at once
+
+    Returns:
+        Every file found, in a stable (sorted) order
+    """
+    base, _ = scan_base(roots)
+    result = FolderScan(base)
+    for listing in walk(roots, workers, cancel):
+        result.names.extend(listing.names)
+        result.files.extend(listing.files)
+        if on_listing is not None:
+            on_listing(listing)
+    # Completion order varies between runs; plans and counters should not
+    result.files.sort()
+    return result
@@ -0,0 +1,236 @@
+"""Watch a folder while an offload is still writing to it.
+
+New files are reported once they have settled: their size and modification
+time must stay the same for ``SETTLE_SECONDS``, so clips still being copied
+are left alone. On Linux the folder is watched with inotify, so each poll
+costs O(files that changed); elsewhere, or if inotify is unavailable, the
+folder is rescanned every poll instead.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import stat
+import struct
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache import MHL_SUFFIX
+from .ingest import PART_SUFFIX
+from .journal import TEMP_SUFFIX
+from .stats import REPORT_SUFFIX
+
+# Seconds a file's size and mtime must stay unchanged before it is picked up
+SETTLE_SECONDS = 5.0
+
+# Seconds between rescans when polling
+POLL_INTERVAL = 2.0
+
+# inotify event bits (linux/inotify.h)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """A non-recursive inotify watch on one folder, through libc."""
+
+    def __init__(self, folder: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), _WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch failed", folder)
+
+    def read(self, timeout: float) -> Tuple[Set[str], Set[str], bool]:
+        """Wait up to ``timeout`` seconds for events.
+
+        Returns:
+            Names with activity, names that went away, and whether events were lost
+        """
+        touched: Set[str] = set()
+        gone: Set[str] = set()
+        overflow = False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        while ready:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                _, mask, _, length = _EVENT.unpack_from(buffer, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & _IN_ISDIR or not name:
+                    continue
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    gone.add(name)
+                    touched.discard(name)
+                else:
+                    touched.add(name)
+                    gone.discard(name)
+        return touched, gone, overflow
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _ignored(name: str) -> bool:
+    # Hidden files include this app's own temporary names during a batch
+    return (name.startswith(".") or name.endswith((TEMP_SUFFIX, PART_SUFFIX, REPORT_SUFFIX))
+            or name.lower().endswith(MHL_SUFFIX))
+
+
+class FolderWatcher:
+    """Reports files in a folder once they have finished being written."""
+
+    def __init__(self, folder: str, settle: float = SETTLE_SECONDS, use_inotify: bool = True):
+        """Start watching a folder.
+
+        Files already present are reported by the first poll, except those
+        modified within the settle time, which wait like new files.
+
+        Args:
+            folder: The folder to watch
+            settle: Seconds a file must stay unchanged before it is reported
+            use_inotify: Use inotify where available instead of rescanning
+        """
+        self.folder = os.path.abspath(folder)
+        self.settle = settle
+        self._inotify: Optional[_Inotify] = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(self.folder)
+            except (OSError, AttributeError):
+                self._inotify = None
+        # name -> (size, mtime_ns, monotonic time of the last change seen)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        self._done: Set[str] = set()
+        self._last_scan = 0.0
+        # The watch is in place before the listing, so nothing written in between is missed
+        self._scan(initial=True)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify is not None
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def ignore(self, names: Iterable[str]) -> None:
+        """Never report these names, e.g. the targets of renames this app made."""
+        for name in names:
+            self._done.add(name)
+            self._pending.pop(name, None)
+
+    def poll(self, timeout: float = 0.0) -> Tuple[List[str], List[str]]:
+        """Collect changes and return the files that have settled.
+
+        With inotify this costs O(files with activity since the last poll).
+
+        Args:
+            timeout: Seconds to wait for activity
+
+        Returns:
+            Newly settled file names, sorted, and names that were removed
+        """
+        removed: Set[str] = set()
+        if self._inotify is not None:
+            touched, gone, overflow = self._inotify.read(timeout)
+            if overflow:
+                removed |= self._scan()
+            now = time.monotonic()
+            for name in touched:
+                if not _ignored(name) and name not in self._done:
+                    self._touch(name, now)
+            for name in gone:
+                self._pending.pop(name, None)
+                self._seen.pop(name, None)
+                self._done.discard(name)
+            removed |= gone
+        else:
+            if timeout:
+                time.sleep(min(timeout, max(0.0, self._last_scan + POLL_INTERVAL - time.monotonic())))
+            if time.monotonic() - self._last_scan >= POLL_INTERVAL:
+                removed |= self._scan()
+        return self._settled(), sorted(removed)
+
+    def _touch(self, name: str, now: float) -> None:
+        try:
+            st = os.stat(os.path.join(self.folder, name))
+        except OSError:
+            self._pending.pop(name, None)
+            return
+        self._pending[name] = (st.st_size, st.st_mtime_ns, now)
+
+    def _scan(self, initial: bool = False) -> Set[str]:
+        """List the folder, queueing new or changed files; returns names that went away."""
+        self._last_scan = now = time.monotonic()
+        current: Dict[str, Tuple[int, int]] = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if _ignored(entry.name) or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                current[entry.name] = (st.st_size, st.st_mtime_ns)
+        removed = set(self._seen) - set(current)
+        for name in removed:
+            self._pending.pop(name, None)
+            self._done.discard(name)
+        wall_clock = time.time()
+        for name, key in current.items():
+            if name not in self._done and self._seen.get(name) != key:
+                # On the first listing, a file counts as quiet since its last modification
+                changed = now - max(0.0, wall_clock - key[1] / 1e9) if initial else now
+                self._pending[name] = (*key, changed)
+        self._seen = current
+        return removed
+
+    def _settled(self) -> List[str]:
+        """Stat the pending files and return those unchanged for the settle time."""
+        now = time.monotonic()
+        settled = []
+        for name, (size, mtime_ns, changed) in list(self._pending.items()):
+            if now - changed < self.settle:
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                del self._pending[name]
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                del self._pending[name]
+                continue
+            key = (st.st_size, st.st_mtime_ns)
+            if key != (size, mtime_ns):
+                # Still being written; check again once it has been quiet for the settle time
+                self._pending[name] = (*key, now)
+                continue
+            del self._pending[name]
+            self._done.add(name)
+            self._seen[name] = key
+            settled.append(name)
+        return sorted(settled)
@@ -0,0 +1,39 @@
+"""The scan cache: stat calls counted where they are made."""
+import os
+import unittest
+from unittest import mock
+
+from renamer.cache import ScanCache, scan_folder
+from renamer.stats import CallStats
+
+from test_journal import FolderTestCase
+
+
+class StatCountTest(FolderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ScanCache()
+        self.addCleanup(self.cache.close)
+
+    def test_every_stat_is_counted_and_failures_by_errno(self):
+        for name in ("A001C001.mov", "A001C002.mov", "A001C003.mov"):
+            self._write(name, "clip")
+        calls = CallStats()
+        real = os.DirEntry.stat
+
+        def stat(entry, *args, **kwargs):
+            # One file disappears between the listing and its stat
+            if entry.name == "A001C002.mov":
+                raise FileNotFoundError(2, "gone")
+            return real(entry, *args, **kwargs)
+
+        with mock.patch.object(os.DirEntry, "stat", stat):
+            scan = scan_folder(self.folder.name, True, self.cache, calls)
+
+        self.assertEqual(calls.calls, 3)
+        self.assertEqual(calls.errors, {"ENOENT": 1})
+        self.assertEqual(sorted(scan.metadata), ["A001C001.mov", "A001C003.mov"])
+
+
+if __name__ == "__main__":
+    unittest.main()
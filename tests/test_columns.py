@@ -0,0 +1,37 @@
+"""Compact name storage: what goes in comes back out."""
+import unittest
+
+from renamer.columns import NameColumn, NameSet
+
+
+class NameColumnTest(unittest.TestCase):
+    def test_names_added_in_bulk_round_trip(self):
+        names = [f"A001_Clip{i:03d}_240821.mov" for i in range(3000)]
+        names += ["x", "", "A001_Clip001_240821_1.mov", "café.wav", "bad\udcff.mov"]
+        column = NameColumn()
+        column.extend(names[:2500])
+        column.append(names[2500])
+        column.extend(names[2501:])
+
+        self.assertEqual(list(column), names)
+        self.assertEqual([column[i] for i in range(len(names))], names)
+
+    def test_numbered_clips_store_little_more_than_their_numbers(self):
+        column = NameColumn()
+        column.extend([f"A001_Clip{i:03d}_240821.mov" for i in range(3000)])
+        self.assertLess(len(column._data), 4 * len(column))
+
+
+class NameSetTest(unittest.TestCase):
+    def test_membership_through_growth(self):
+        names = NameSet([f"clip{i}.mov" for i in range(5000)])
+        self.assertEqual(len(names), 5000)
+        self.assertIn("clip4999.mov", names)
+        self.assertNotIn("clip5000.mov", names)
+        self.assertTrue(names.add("clip5000.mov"))
+        self.assertFalse(names.add("clip5000.mov"))
+        self.assertEqual(len(names), 5001)
+
+
+if __name__ == "__main__":
+    unittest.main()
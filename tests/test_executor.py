@@ -0,0 +1,79 @@
+"""Concurrent renames per volume: concurrency settings, results and no-replace renames."""
+import os
+import tempfile
+import threading
+import unittest
+
+from renamer.executor import (LOCAL_CONCURRENCY, NETWORK_CONCURRENCY, Concurrency, is_network_path,
+                              rename_all, rename_noreplace)
+from renamer.stats import CallStats
+
+_MOUNTS = [("/mnt/share", "cifs"), ("/mnt", "ext4"), ("/", "ext4")]
+
+
+class ConcurrencyTest(unittest.TestCase):
+    def test_network_mounts_get_more_workers(self):
+        self.assertTrue(is_network_path("/mnt/share/A001", _MOUNTS))
+        self.assertFalse(is_network_path("/mnt/shared/A001", _MOUNTS))
+        concurrency = Concurrency()
+        self.assertEqual(concurrency.for_path("/mnt/share/A001", _MOUNTS), NETWORK_CONCURRENCY)
+        self.assertEqual(concurrency.for_path("/mnt/card/A001", _MOUNTS), LOCAL_CONCURRENCY)
+
+    def test_deepest_configured_volume_wins(self):
+        concurrency = Concurrency(default=2, volumes={"/mnt": 4, "/mnt/share": 32})
+        self.assertEqual(concurrency.for_path("/mnt/share/A001", _MOUNTS), 32)
+        self.assertEqual(concurrency.for_path("/mnt/card", _MOUNTS), 4)
+        self.assertEqual(concurrency.for_path("/media/card", _MOUNTS), 2)
+
+
+class RenameAllTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder.name, name)
+
+    def _moves(self, count: int):
+        moves = []
+        for i in range(count):
+            with open(self._path(f"C{i:03d}.mov"), "w") as fh:
+                fh.write(str(i))
+            moves.append((self._path(f"C{i:03d}.mov"), self._path(f"D{i:03d}.mov")))
+        return moves
+
+    def test_every_rename_is_reported_once_with_its_error(self):
+        moves = self._moves(40) + [(self._path("missing.mov"), self._path("E.mov"))]
+        calls = CallStats()
+
+        results = dict(rename_all(moves, Concurrency(default=8), calls=calls))
+
+        self.assertEqual(sorted(results), list(range(41)))
+        self.assertIsInstance(results.pop(40), FileNotFoundError)
+        self.assertEqual(set(results.values()), {None})
+        self.assertEqual((calls.calls, calls.errors), (41, {"ENOENT": 1}))
+        self.assertEqual(sorted(os.listdir(self.folder.name)), [f"D{i:03d}.mov" for i in range(40)])
+
+    def test_cancelled_batch_renames_nothing_more(self):
+        cancel = threading.Event()
+        cancel.set()
+        self.assertEqual(list(rename_all(self._moves(10), Concurrency(default=4), cancel)), [])
+        self.assertEqual(len([name for name in os.listdir(self.folder.name) if name.startswith("C")]), 10)
+
+    def test_no_replace_rename_leaves_a_taken_target(self):
+        (src, dst), = self._moves(1)
+        with open(dst, "w") as fh:
+            fh.write("taken")
+
+        with self.assertRaises(FileExistsError):
+            rename_noreplace(src, dst)
+        results = list(rename_all([(src, dst)], replace=False))
+
+        self.assertIsInstance(results[0][1], FileExistsError)
+        with open(dst) as fh:
+            self.assertEqual(fh.read(), "taken")
+        self.assertTrue(os.path.exists(src))
+
+
+if __name__ == "__main__":
+    unittest.main()
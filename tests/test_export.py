@@ -0,0 +1,78 @@
+"""Dry-run reports and the preview's row index."""
+import csv
+import io
+import json
+import os
+import unittest
+
+from renamer import engine, export
+
+from test_journal import FolderTestCase
+
+_OPTIONS = engine.NamingOptions(camera_roll="A001", clip_prefix="Clip", date="240821")
+
+
+def _plan() -> engine.RenamePlan:
+    """Four files: one clashing with a file in the batch, one unparsed, one already named."""
+    files = ["A001C001_240821_R1AB.mov", "A001C002_240821_R1AB.mov", "holiday.mov", "A001_Clip001_240821.mov"]
+    return engine.plan_renames("/footage", files, _OPTIONS, existing=files)
+
+
+class ReportTest(FolderTestCase):
+    def test_csv_report_lists_every_entry_with_its_flags(self):
+        out = io.StringIO(newline="")
+        self.assertEqual(export.write_report(_plan(), out, "csv"), 4)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows, [
+            ["original", "new_name", "flags"],
+            ["A001C001_240821_R1AB.mov", "A001_Clip001_240821_1.mov", "duplicate"],
+            ["A001C002_240821_R1AB.mov", "A001_Clip002_240821.mov", ""],
+            ["holiday.mov", "A001_Clip003_240821.mov", "unparsed"],
+            ["A001_Clip001_240821.mov", "A001_Clip001_240821.mov", "unchanged"],
+        ])
+
+    def test_json_report_is_chosen_by_extension(self):
+        path = os.path.join(self.folder.name, "plan.json")
+        self.assertEqual(export.export_plan(_plan(), path), 4)
+        with open(path, encoding="utf-8") as fh:
+            entries = json.load(fh)
+        self.assertEqual([entry["flags"] for entry in entries], [["duplicate"], [], ["unparsed"], ["unchanged"]])
+        self.assertEqual(entries[2], {"original": "holiday.mov", "new_name": "A001_Clip003_240821.mov",
+                                      "flags": ["unparsed"]})
+
+    def test_empty_plan_is_an_empty_array(self):
+        out = io.StringIO()
+        export.write_report(engine.RenamePlan("/footage"), out, "json")
+        self.assertEqual(json.loads(out.getvalue()), [])
+
+    def test_unknown_format_is_refused(self):
+        with self.assertRaises(ValueError):
+            export.ReportWriter(io.StringIO(), "xml")
+
+
+class PlanIndexTest(unittest.TestCase):
+    def test_filters_by_flag_and_by_name_prefix(self):
+        index = export.PlanIndex(_plan())
+        self.assertEqual(list(index.conflicts()), [0])
+        self.assertEqual(list(index.unparsed()), [2])
+        self.assertEqual(list(index.search("a001_clip00")), [0, 1, 2, 3])
+        self.assertEqual(list(index.search("HOL")), [2])
+        self.assertEqual(list(index.search("nothing")), [])
+        self.assertEqual(list(index.search("")), [0, 1, 2, 3])
+
+    def test_rows_added_to_a_growing_plan_are_indexed(self):
+        builder = engine.PlanBuilder("/footage", _OPTIONS, ["A001_Clip002_240821.mov"])
+        builder.add(["A001C001_240821_R1AB.mov"])
+        index = export.PlanIndex(builder.plan)
+        self.assertEqual(list(index.unparsed()), [])
+
+        builder.add(["A001C002_240821_R1AB.mov", "holiday.mov"])
+
+        # The second clip's name is taken on disk, so it is suffixed
+        self.assertEqual(list(index.conflicts()), [1])
+        self.assertEqual(list(index.unparsed()), [2])
+        self.assertEqual(list(index.search("holiday")), [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Vendor file name parsers: roll, clip, take and date by camera and recorder."""
+import unittest
+
+from renamer.filenames import NameMatcher, NameParser, ParsedName, parse_name
+
+
+class VendorTest(unittest.TestCase):
+    def test_each_vendor_scheme(self):
+        cases = {
+            "A001C003_240821_R1AB.mov": ParsedName("ARRI", "A001", "003", None, "240821"),
+            "A001C003_240821AB_CANON.MXF": ParsedName("Canon", "A001", "003", None, "240821"),
+            "A001C003_240821AB.mxf": ParsedName("Sony VENICE", "A001", "003", None, "240821"),
+            "A001_C002_0821XY_001.R3D": ParsedName("RED", "A001", "002"),
+            "A001_08211536_C001.braw": ParsedName("Blackmagic", "A001", "001"),
+            "C0042.MP4": ParsedName("Sony", None, "0042"),
+            "240821_T12_1.wav": ParsedName("Sound Devices", None, None, "12", "240821"),
+            "A001_Clip003_240821.mov": ParsedName("Netflix", "A001", "003", None, "240821"),
+        }
+        for name, expected in cases.items():
+            with self.subTest(name=name):
+                self.assertEqual(parse_name(name), expected)
+
+    def test_folder_and_case_do_not_matter(self):
+        parsed = parse_name("A001R1AB/a001c003_240821_r1ab.MOV")
+        self.assertEqual((parsed.vendor, parsed.roll, parsed.number), ("ARRI", "a001", "003"))
+        self.assertEqual(parse_name("T07.WAV").number, "07")
+
+    def test_unknown_names_are_not_parsed(self):
+        for name in ("holiday.mov", "IMG_0001.JPG", "A001C003_extra.mov"):
+            with self.subTest(name=name):
+                self.assertIsNone(parse_name(name))
+
+
+class MatcherTest(unittest.TestCase):
+    def test_earlier_parser_wins(self):
+        matcher = NameMatcher([NameParser("Studio", r'SHOT(?P<clip>\d+)_(?P<take>\d+)'),
+                               NameParser("Loose", r'SHOT(?P<clip>\d+)(?:_\d+)?')])
+        self.assertEqual(matcher.parse("SHOT010_2.exr"), ParsedName("Studio", None, "010", "2"))
+        self.assertEqual(matcher.parse_all(["SHOT010.exr", "x.exr"]), [ParsedName("Loose", None, "010"), None])
+
+    def test_unknown_field_is_refused(self):
+        with self.assertRaises(ValueError):
+            NameMatcher([NameParser("Bad", r'(?P<reel>\d+)')])
+
+
+if __name__ == "__main__":
+    unittest.main()
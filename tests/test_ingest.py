@@ -0,0 +1,112 @@
+"""Copying a plan to destinations: kernel copy fallbacks and resuming."""
+import errno
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from renamer import engine, ingest
+
+
+class IngestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.source = tempfile.TemporaryDirectory()
+        self.destination = tempfile.TemporaryDirectory()
+        self.addCleanup(self.source.cleanup)
+        self.addCleanup(self.destination.cleanup)
+
+    def _write(self, folder: str, name: str, data: bytes) -> str:
+        path = os.path.join(folder, name)
+        with open(path, "wb") as fh:
+            fh.write(data)
+        return path
+
+    def _read(self, path: str) -> bytes:
+        with open(path, "rb") as fh:
+            return fh.read()
+
+
+@unittest.skipUnless(hasattr(os, "copy_file_range"), "needs copy_file_range")
+class FallbackTest(IngestTestCase):
+    def test_copy_falls_back_from_the_start_after_a_partial_kernel_copy(self):
+        data = os.urandom(300000)
+        src = self._write(self.source.name, "clip.mov", data)
+        dst = os.path.join(self.destination.name, "clip.mov")
+        real = os.copy_file_range
+        calls = []
+
+        def partial(fd_in, fd_out, count):
+            # The first call copies a little, the next finds the method unsupported
+            calls.append(count)
+            if len(calls) > 1:
+                raise OSError(errno.EXDEV, "cross-device")
+            return real(fd_in, fd_out, 1000)
+
+        with mock.patch.object(ingest, "_reflink", return_value=False), \
+                mock.patch.object(os, "copy_file_range", partial):
+            method = ingest.copy_file(src, dst)
+
+        self.assertNotEqual(method, "copy_file_range")
+        self.assertEqual(self._read(dst), data)
+
+    def test_kernel_copy_that_ends_early_is_not_taken_as_complete(self):
+        data = os.urandom(300000)
+        src = self._write(self.source.name, "clip.mov", data)
+        dst = os.path.join(self.destination.name, "clip.mov")
+        real = os.copy_file_range
+        calls = []
+
+        def short(fd_in, fd_out, count):
+            # The kernel copies a little, then reports the end of the file
+            calls.append(count)
+            return real(fd_in, fd_out, 1000) if len(calls) == 1 else 0
+
+        with mock.patch.object(ingest, "_reflink", return_value=False), \
+                mock.patch.object(os, "copy_file_range", short):
+            method = ingest.copy_file(src, dst)
+
+        self.assertNotEqual(method, "copy_file_range")
+        self.assertEqual(self._read(dst), data)
+
+
+class ResumeTest(IngestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = os.urandom(3 * ingest._SAMPLE)
+        self._write(self.source.name, "A001C001.mov", self.data)
+        self.plan = engine.RenamePlan(self.source.name, [engine.PlanEntry("A001C001.mov", "A001_Clip001.mov")])
+        self.copy = os.path.join(self.destination.name, "A001_Clip001.mov")
+
+    def _ingest(self) -> ingest.TransferStats:
+        result = ingest.copy_plan(self.plan, [self.destination.name])
+        self.assertEqual(result.errors, [])
+        return result.destinations[self.destination.name]
+
+    def test_finished_copy_is_skipped(self):
+        self._ingest()
+        # A coarse destination clock loses the mtime, but the data still matches
+        os.utime(self.copy, (0, 0))
+        stats = self._ingest()
+        self.assertEqual((stats.files, stats.skipped), (0, 1))
+
+    def test_same_size_copy_with_other_data_is_copied_again(self):
+        self._write(self.destination.name, "A001_Clip001.mov", bytes(len(self.data)))
+        stats = self._ingest()
+        self.assertEqual((stats.files, stats.skipped), (1, 0))
+        self.assertEqual(self._read(self.copy), self.data)
+
+    def test_copy_damaged_in_the_middle_is_copied_again(self):
+        self._ingest()
+        damaged = bytearray(self.data)
+        damaged[len(damaged) // 2] ^= 0xFF
+        stat = os.stat(self.copy)
+        self._write(self.destination.name, "A001_Clip001.mov", bytes(damaged))
+        # Same size, same ends and the same mtime as the finished copy
+        os.utime(self.copy, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        stats = self._ingest()
+        self.assertEqual((stats.files, stats.skipped), (1, 0))
+        self.assertEqual(self._read(self.copy), self.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
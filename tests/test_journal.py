@@ -0,0 +1,103 @@
+"""Journaled rename batches: files that appear at a target after planning, and undo."""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from renamer import engine, journal
+
+
+class FolderTestCase(unittest.TestCase):
+    """A scratch folder to rename in, with the app's state kept apart."""
+
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        self.folder = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"FOOTAGE_RENAMER_HOME": self.home.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.home.cleanup)
+        self.addCleanup(self.folder.cleanup)
+
+    def _write(self, name: str, text: str) -> None:
+        with open(os.path.join(self.folder.name, name), "w", encoding="utf-8") as fh:
+            fh.write(text)
+
+    def _read(self, name: str) -> str:
+        with open(os.path.join(self.folder.name, name), encoding="utf-8") as fh:
+            return fh.read()
+
+
+class TakenTargetTest(FolderTestCase):
+    def test_file_created_at_target_after_planning_is_kept(self):
+        self._write("A001C001.mov", "clip 1")
+        self._write("A001C002.mov", "clip 2")
+        options = engine.NamingOptions(camera_roll="A001", clip_prefix="Clip", date="240821")
+        plan = engine.plan_renames(self.folder.name, sorted(os.listdir(self.folder.name)), options)
+        target = plan.new_names[0]
+        self._write(target, "arrived later")
+
+        result = engine.execute_plan(plan)
+
+        self.assertEqual(self._read(target), "arrived later")
+        self.assertEqual(self._read("A001C001.mov"), "clip 1")
+        self.assertEqual(self._read(plan.new_names[1]), "clip 2")
+        self.assertEqual(result.success_count, 1)
+        self.assertEqual(result.not_renamed, ["A001C001.mov"])
+        self.assertEqual(len(result.errors), 1)
+        self.assertFalse([name for name in os.listdir(self.folder.name) if name.endswith(".renaming")])
+
+    def test_undo_leaves_the_file_at_the_taken_target(self):
+        self._write("A001C001.mov", "clip 1")
+        options = engine.NamingOptions(camera_roll="A001", clip_prefix="Clip", date="240821")
+        plan = engine.plan_renames(self.folder.name, ["A001C001.mov"], options)
+        self._write(plan.new_names[0], "arrived later")
+        engine.execute_plan(plan)
+
+        # Nothing was renamed, so there is nothing to undo
+        self.assertIsNone(engine.undo_last_batch())
+        self.assertEqual(self._read(plan.new_names[0]), "arrived later")
+
+
+class PartialUndoTest(FolderTestCase):
+    def test_partial_undo_keeps_the_batch_undoable(self):
+        self._write("A001C001.mov", "clip 1")
+        self._write("A001C002.mov", "clip 2")
+        options = engine.NamingOptions(camera_roll="A001", clip_prefix="Clip", date="240821")
+        plan = engine.plan_renames(self.folder.name, sorted(os.listdir(self.folder.name)), options)
+        self.assertEqual(engine.execute_plan(plan).success_count, 2)
+        # Something takes an original name, so that file cannot go back
+        self._write("A001C002.mov", "newcomer")
+
+        result = engine.undo_last_batch()
+
+        self.assertEqual(result.success_count, 1)
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(self._read("A001C001.mov"), "clip 1")
+        self.assertEqual(self._read("A001C002.mov"), "newcomer")
+
+        # The rest of the batch can still be undone, and only the rest
+        os.remove(os.path.join(self.folder.name, "A001C002.mov"))
+        result = engine.undo_last_batch()
+        self.assertEqual((result.success_count, result.errors), (1, []))
+        self.assertEqual(self._read("A001C002.mov"), "clip 2")
+        self.assertIsNone(engine.undo_last_batch())
+
+
+class LongRecordTest(FolderTestCase):
+    def test_final_record_longer_than_one_block_is_read(self):
+        journal_dir = os.path.join(self.home.name, "journal")
+        os.makedirs(journal_dir)
+        moves = [(f"C{i:05d}.mov", f"D{i:05d}.mov") for i in range(3000)]
+        batch = journal.Journal.create(self.folder.name, moves, journal_dir)
+        # A big batch whose phase 2 failed for most files ends with a long committed record
+        batch._append({"type": journal.STATE_STAGED, "unstaged": [], "rollback": []})
+        batch._append({"type": journal.STATE_COMMITTED, "failed": list(range(2999))})
+
+        self.assertEqual(journal.last_batch(journal_dir).batch_id, batch.batch_id)
+        journal.prune(journal_dir, keep=0)
+        self.assertEqual(os.listdir(journal_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Header metadata: QuickTime mvhd and tmcd, Broadcast WAV bext and iXML."""
+import os
+import struct
+import tempfile
+import unittest
+from datetime import datetime
+
+from renamer.metadata import format_timecode, read_media_info
+
+
+def _atom(kind: bytes, *children: bytes) -> bytes:
+    payload = b"".join(children)
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack("<4sI", kind, len(payload)) + payload + b"\0" * (len(payload) & 1)
+
+
+def _quicktime(created: datetime, frames: int, fps: int, reel: str) -> bytes:
+    """A movie with a 60 s mvhd and a timecode track starting at ``frames``."""
+    # The first timecode sample sits in mdat, right after its 8-byte header
+    mdat = _atom(b"mdat", struct.pack(">I", frames))
+    mvhd = _atom(b"mvhd", struct.pack(">IIIII", 0, int((created - datetime(1904, 1, 1)).total_seconds()),
+                                      0, 1000, 60000), bytes(80))
+    hdlr = _atom(b"hdlr", bytes(8), b"tmcd", bytes(13))
+    name = _atom(b"name", struct.pack(">HH", len(reel), 0) + reel.encode())
+    entry = struct.pack(">I4s6sHIIIIBB", 34 + len(name), b"tmcd", bytes(6), 1, 0, 0, fps, 1, fps, 0) + name
+    stsd = _atom(b"stsd", struct.pack(">II", 0, 1), entry)
+    stco = _atom(b"stco", struct.pack(">III", 0, 1, 8))
+    trak = _atom(b"trak", _atom(b"mdia", hdlr, _atom(b"minf", _atom(b"stbl", stsd, stco))))
+    return mdat + _atom(b"moov", mvhd, trak)
+
+
+def _wave(date: str, time_reference: int, ixml: str, description: str = "") -> bytes:
+    """A two-second 48 kHz, 24-bit stereo Broadcast WAV."""
+    fmt = struct.pack("<HHIIHH", 1, 2, 48000, 288000, 6, 24)
+    bext = (description.encode("latin-1").ljust(256, b"\0") + bytes(64) + date.encode() + b"10:00:00"
+            + struct.pack("<Q", time_reference)).ljust(602, b"\0")
+    body = (b"WAVE" + _chunk(b"fmt ", fmt) + _chunk(b"bext", bext) + _chunk(b"iXML", ixml.encode())
+            + _chunk(b"data", bytes(576000)))
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+class HeaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def _read(self, name: str, data: bytes):
+        path = os.path.join(self.folder.name, name)
+        with open(path, "wb") as fh:
+            fh.write(data)
+        return read_media_info(path)
+
+
+class QuickTimeTest(HeaderTestCase):
+    def test_date_duration_reel_and_start_timecode(self):
+        info = self._read("A001C001.mov", _quicktime(datetime(2024, 8, 21, 9, 30), 10 * 3600 * 25, 25, "A001"))
+
+        self.assertEqual(info.creation_date, datetime(2024, 8, 21, 9, 30))
+        self.assertEqual(info.shoot_date, "240821")
+        self.assertEqual(info.duration, 60.0)
+        self.assertEqual(info.camera_roll, "A001")
+        self.assertEqual(info.timecode, "10:00:00:00")
+        self.assertEqual(info.start_seconds, 36000.0)
+        self.assertEqual(info.frame_rate, 25.0)
+
+    def test_file_without_a_movie_header_has_no_metadata(self):
+        info = self._read("A001C001.mov", _atom(b"mdat", bytes(64)))
+        self.assertEqual((info.creation_date, info.timecode, info.duration), (None, None, None))
+
+
+class WaveTest(HeaderTestCase):
+    def test_bext_and_ixml(self):
+        ixml = ("<BWFXML><TAPE>R07</TAPE><SCENE>12A</SCENE><TAKE>3</TAKE>"
+                "<TIMECODE_RATE>25/1</TIMECODE_RATE><TIMECODE_FLAG>NDF</TIMECODE_FLAG></BWFXML>")
+        info = self._read("T001.wav", _wave("2024-08-21", 36000 * 48000, ixml))
+
+        self.assertEqual(info.shoot_date, "240821")
+        self.assertEqual(info.duration, 2.0)
+        self.assertEqual((info.reel, info.scene, info.take), ("R07", "12A", "3"))
+        self.assertEqual(info.start_seconds, 36000.0)
+        self.assertEqual(info.frame_rate, 25.0)
+        self.assertEqual(info.timecode, "10:00:00:00")
+
+    def test_reel_from_the_description_without_ixml(self):
+        info = self._read("T001.wav", _wave("2024-08-21", 0, "", "sTAPE=R09\r\nsSCENE=4\r\n"))
+        self.assertEqual(info.reel, "R09")
+        self.assertIsNone(info.timecode)
+
+    def test_other_files_are_not_read(self):
+        self.assertIsNone(self._read("notes.txt", b"RIFF"))
+
+
+class TimecodeTest(unittest.TestCase):
+    def test_drop_frame_skips_two_frame_numbers_a_minute(self):
+        self.assertEqual(format_timecode(1800, 30, drop_frame=True), "00:01:00;02")
+        self.assertEqual(format_timecode(17982, 30, drop_frame=True), "00:10:00;00")
+        self.assertEqual(format_timecode(1800, 30), "00:01:00:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+"""Grouping frames into sequences, and leaving folders of stills alone."""
+import unittest
+
+from renamer.sequences import FrameSequence, group_sequences
+
+
+class GroupTest(unittest.TestCase):
+    def test_frames_of_one_clip_form_a_sequence(self):
+        files = [f"A001C003_{frame:07d}.dpx" for frame in range(86400, 86410)] + ["A001C004.mov"]
+
+        items = group_sequences(files)
+
+        self.assertEqual(len(items), 2)
+        self.assertIsInstance(items[0], FrameSequence)
+        self.assertEqual(items[0].label(), "A001C003_[0086400-0086409].dpx")
+        self.assertEqual(items[1], "A001C004.mov")
+
+    def test_folder_of_stills_stays_file_by_file(self):
+        files = [f"IMG_{number:04d}.JPG" for number in range(1, 201)] + ["DSC0001.png", "DSC0002.png",
+                                                                           "scan_0001.tif", "scan_0002.tif"]
+        self.assertEqual(group_sequences(files), files)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Pairing sound takes with camera clips: long takes and the UTC and local shoot dates."""
+import unittest
+from datetime import datetime
+
+from renamer.metadata import MediaInfo
+from renamer.sync import IntervalIndex, match_takes
+
+
+def _info(date: datetime, start: float, duration: float) -> MediaInfo:
+    return MediaInfo(creation_date=date, start_seconds=start, duration=duration)
+
+
+class MidnightTest(unittest.TestCase):
+    def test_take_pairs_with_a_clip_dated_the_next_day_in_utc(self):
+        # 23:50 local on the 21st; the camera header dates the clip in UTC, on the 22nd
+        metadata = {
+            "A001C001_240822_R1AB.mov": _info(datetime(2024, 8, 22, 1, 50), 85800.0, 300.0),
+            "T001.wav": _info(datetime(2024, 8, 21), 85790.0, 320.0),
+        }
+        self.assertEqual(match_takes(metadata), {"T001.wav": "A001C001_240822_R1AB.mov"})
+
+    def test_clip_of_the_same_date_is_preferred(self):
+        metadata = {
+            "A001C001_240821_R1AB.mov": _info(datetime(2024, 8, 21), 36000.0, 60.0),
+            "A002C001_240822_R1AB.mov": _info(datetime(2024, 8, 22), 36000.0, 120.0),
+            "T001.wav": _info(datetime(2024, 8, 21), 36000.0, 120.0),
+            "T002.wav": _info(datetime(2024, 8, 22), 36000.0, 120.0),
+        }
+        self.assertEqual(match_takes(metadata), {"T001.wav": "A001C001_240821_R1AB.mov",
+                                                 "T002.wav": "A002C001_240822_R1AB.mov"})
+
+
+class LongTakeTest(unittest.TestCase):
+    def test_long_take_does_not_hide_or_add_overlaps(self):
+        # Room tone runs all day alongside one-minute takes
+        takes = [(0.0, 86400.0, "ROOMTONE.wav")] + [(60.0 * i, 60.0 * i + 50, f"T{i:04d}.wav")
+                                                      for i in range(1, 1000)]
+        index = IntervalIndex(takes)
+
+        self.assertEqual(len(index), 1000)
+        self.assertEqual(sorted(name for _, _, name in index.overlapping(30000.0, 30100.0)),
+                         ["ROOMTONE.wav", "T0500.wav", "T0501.wav"])
+        self.assertEqual([name for _, _, name in index.overlapping(90000.0, 90100.0)], [])
+
+    def test_clips_pair_with_their_own_takes_next_to_a_long_one(self):
+        day = datetime(2024, 8, 21)
+        metadata = {"ROOMTONE.wav": _info(day, 0.0, 86400.0)}
+        for i in range(1, 50):
+            metadata[f"T{i:03d}.wav"] = _info(day, 600.0 * i, 300.0)
+            metadata[f"A001C{i:03d}_240821_R1AB.mov"] = _info(day, 600.0 * i + 10, 280.0)
+
+        matches = match_takes(metadata)
+
+        for i in range(1, 50):
+            self.assertEqual(matches[f"T{i:03d}.wav"], f"A001C{i:03d}_240821_R1AB.mov")
+        self.assertEqual(matches["ROOMTONE.wav"], "A001C001_240821_R1AB.mov")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+"""Naming templates: new names never leave the file's folder."""
+import os
+import unittest
+
+from renamer.template import TemplateError, compile_template
+
+
+class PathTest(unittest.TestCase):
+    def test_separators_and_parent_links_in_the_text_are_refused(self):
+        for text in (f"..{os.sep}[clipName]", f"[cameraRoll]{os.sep}[clipName]", "[clipName]..x",
+                     f"[shootDate-YY{os.sep}MM{os.sep}DD]_[clipName]"):
+            with self.subTest(text=text), self.assertRaises(TemplateError):
+                compile_template(text)
+
+    def test_fields_cannot_name_a_folder(self):
+        template = compile_template("[cameraRoll]_[clipName]_[shootDate-YYMMDD]")
+        names = template.render(["A001C001_240821_R1AB.mov"], f"..{os.sep}A001", f"x{os.sep}Clip",
+                                f"24{os.sep}08", start=1)
+        self.assertEqual(len(names), 1)
+        self.assertNotIn(os.sep, names[0])
+        self.assertNotIn("..", names[0])
+        self.assertEqual(names[0], "A001_x_Clip001_24_08.mov")
+
+
+if __name__ == "__main__":
+    unittest.main()
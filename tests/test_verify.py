@@ -0,0 +1,90 @@
+"""Verified renames: files whose checksum disagrees with the offload's MHL."""
+import hashlib
+import os
+import unittest
+from unittest import mock
+
+from renamer import engine, verify
+
+from test_journal import FolderTestCase
+
+
+class MismatchTest(FolderTestCase):
+    def test_swap_with_one_mismatched_file_keeps_both(self):
+        self._write("A.mov", "clip a")
+        self._write("B.mov", "clip b")
+        digest = hashlib.md5(b"clip a").hexdigest()
+        verify.write_manifest(self.folder.name, [("A.mov", "A.mov", 6, 0.0, digest, "original"),
+                                                 ("B.mov", "B.mov", 6, 0.0, "0" * 32, "original")], "md5")
+        plan = engine.RenamePlan(self.folder.name, [engine.PlanEntry("A.mov", "B.mov"),
+                                                   engine.PlanEntry("B.mov", "A.mov")])
+
+        result = verify.execute_verified(plan, "md5")
+
+        # B.mov failed, so it keeps its name and A.mov cannot take it
+        self.assertEqual(self._read("A.mov"), "clip a")
+        self.assertEqual(self._read("B.mov"), "clip b")
+        self.assertEqual(result.success_count, 0)
+        self.assertEqual(sorted(result.not_renamed), ["A.mov", "B.mov"])
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn("Checksum mismatch for 'B.mov'", result.errors[0])
+        self.assertFalse([name for name in os.listdir(self.folder.name) if name.endswith(".renaming")])
+
+    def test_recovery_keeps_the_mismatched_file_in_place(self):
+        self._write("A.mov", "clip a")
+        self._write("B.mov", "clip b")
+        self._write("C.mov", "clip c")
+        records = [(name, name, 6, 0.0, hashlib.md5(text.encode()).hexdigest(), "original")
+                   for name, text in (("A.mov", "clip a"), ("C.mov", "clip c"))]
+        verify.write_manifest(self.folder.name, records + [("B.mov", "B.mov", 6, 0.0, "0" * 32, "original")],
+                              "md5")
+        plan = engine.RenamePlan(self.folder.name, [engine.PlanEntry("A.mov", "B.mov"),
+                                                   engine.PlanEntry("B.mov", "A.mov"),
+                                                   engine.PlanEntry("C.mov", "D.mov")])
+
+        # Killed once the journal is written, before phase 1 renames anything
+        with mock.patch("renamer.journal.rename_all", side_effect=KeyboardInterrupt), \
+                self.assertRaises(KeyboardInterrupt):
+            verify.execute_verified(plan, "md5")
+        results = engine.recover_interrupted()
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(self._read("A.mov"), "clip a")
+        self.assertEqual(self._read("B.mov"), "clip b")
+        self.assertEqual(self._read("D.mov"), "clip c")
+        self.assertEqual(results[0].renamed, [("C.mov", "D.mov")])
+        self.assertFalse([name for name in os.listdir(self.folder.name) if name.endswith(".renaming")])
+
+
+class AlgorithmTest(FolderTestCase):
+    def test_files_are_checked_with_the_algorithm_the_offload_recorded(self):
+        self._write("A.mov", "clip a")
+        self._write("B.mov", "clip b")
+        verify.write_manifest(self.folder.name, [("A.mov", "A.mov", 6, 0.0, hashlib.md5(b"clip a").hexdigest(),
+                                                  "original"),
+                                                 ("B.mov", "B.mov", 6, 0.0, "0" * 32, "original")], "md5")
+        plan = engine.RenamePlan(self.folder.name, [engine.PlanEntry("A.mov", "C.mov"),
+                                                   engine.PlanEntry("B.mov", "D.mov")])
+
+        result = verify.execute_verified(plan, "xxh64")
+
+        self.assertEqual(result.renamed, [("A.mov", "C.mov")])
+        self.assertEqual(result.not_renamed, ["B.mov"])
+        self.assertIn("Checksum mismatch for 'B.mov'", result.errors[0])
+
+    def test_file_recorded_only_under_an_unavailable_algorithm_is_not_renamed(self):
+        self._write("A.mov", "clip a")
+        verify.write_manifest(self.folder.name, [("A.mov", "A.mov", 6, 0.0, "0" * 16, "original")], "xxh64")
+        plan = engine.RenamePlan(self.folder.name, [engine.PlanEntry("A.mov", "C.mov")])
+
+        with mock.patch.object(verify, "xxhash", None):
+            result = verify.execute_verified(plan, "md5")
+
+        self.assertEqual(self._read("A.mov"), "clip a")
+        self.assertEqual(result.success_count, 0)
+        self.assertEqual(result.not_renamed, ["A.mov"])
+        self.assertIn("Cannot verify 'A.mov'", result.errors[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
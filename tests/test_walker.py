@@ -0,0 +1,31 @@
+"""Card scans: what is listed as footage and what is left alone."""
+import os
+import tempfile
+import unittest
+
+from renamer.cache import scan_folder
+from renamer.walker import scan_tree
+
+
+class OffloadManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        root = self.folder.name
+        os.makedirs(os.path.join(root, "ascmhl"))
+        for name in ("A001C001.mov", "A001.mhl", "ascmhl/0001_card_2024-08-21.mhl",
+                     "ascmhl/ascmhl_chain.xml"):
+            with open(os.path.join(root, name), "w", encoding="utf-8") as fh:
+                fh.write(name)
+
+    def test_tree_scan_skips_the_mhl_history(self):
+        scan = scan_tree([self.folder.name])
+        self.assertEqual(scan.files, ["A001C001.mov"])
+
+    def test_folder_scan_skips_mhl_files(self):
+        scan = scan_folder(self.folder.name)
+        self.assertEqual(scan.files, ["A001C001.mov"])
+
+
+if __name__ == "__main__":
+    unittest.main()
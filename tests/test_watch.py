@@ -0,0 +1,40 @@
+"""Watch mode: files that arrive under a name the plan already gave away."""
+import os
+import unittest
+
+from renamer import engine
+
+from test_journal import FolderTestCase
+
+
+class ArrivalTest(FolderTestCase):
+    def setUp(self):
+        super().setUp()
+        self._write("A001C001.mov", "clip 1")
+        names = os.listdir(self.folder.name)
+        options = engine.NamingOptions(camera_roll="A001", clip_prefix="Clip", date="240821")
+        self.builder = engine.PlanBuilder(self.folder.name, options, names, names)
+        self.builder.add(["A001C001.mov"])
+        self.target = self.builder.plan.new_names[0]
+
+    def test_pending_entry_moves_aside_for_an_arrival(self):
+        self._write(self.target, "arrived later")
+
+        first = self.builder.add([self.target])
+
+        plan = self.builder.plan
+        self.assertEqual(self.builder.retargeted, [0])
+        self.assertNotEqual(plan.new_names[0], self.target)
+        self.assertEqual(plan.entry(0).status, engine.STATUS_SUFFIXED)
+        # The newcomer keeps the name, and the pending entry no longer targets it
+        self.assertEqual(plan.new_names[first], self.target)
+
+        result = engine.execute_plan(plan)
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(self._read(plan.new_names[0]), "clip 1")
+        self.assertEqual(self._read(plan.new_names[first]), "arrived later")
+
+
+if __name__ == "__main__":
+    unittest.main()